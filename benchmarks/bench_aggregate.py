@@ -0,0 +1,80 @@
+"""
+Compare an order summary of several statistics over the order lines,
+computed with a `Reduce` pass per statistic against the aggregation benders
+and a single `Aggregate`.
+
+Usage: python benchmarks/bench_aggregate.py [number]
+"""
+import os
+import sys
+import timeit
+
+# run from a checkout without installing jsonbender
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from jsonbender import (Aggregate, Count, Forall, Max, Mean, Min, Reduce, S,
+                        Sum, bend)
+
+
+LINES = 100
+
+
+def reduce_mapping():
+    def values(field):
+        return S('lines') >> Forall(lambda line: line[field])
+
+    def total(field):
+        return values(field) >> Reduce(lambda acc, v: acc + v)
+
+    count = (S('lines') >> Forall(lambda line: 1) >>
+             Reduce(lambda acc, v: acc + v))
+    return {
+        'lines': count,
+        'total': total('price'),
+        'lowest': values('price') >> Reduce(min),
+        'highest': values('price') >> Reduce(max),
+        'average': total('price') / count,
+        'quantity': total('quantity'),
+        'max_quantity': values('quantity') >> Reduce(max),
+        'discount': total('discount'),
+    }
+
+
+def aggregation_mapping():
+    return {
+        'lines': S('lines') >> Count(),
+        'total': S('lines') >> Sum(S('price')),
+        'lowest': S('lines') >> Min(S('price')),
+        'highest': S('lines') >> Max(S('price')),
+        'average': S('lines') >> Mean(S('price')),
+        'quantity': S('lines') >> Sum(S('quantity')),
+        'max_quantity': S('lines') >> Max(S('quantity')),
+        'discount': S('lines') >> Sum(S('discount')),
+    }
+
+
+def aggregate_mapping():
+    return S('lines') >> Aggregate(
+        lines=Count(), total=Sum(S('price')), lowest=Min(S('price')),
+        highest=Max(S('price')), average=Mean(S('price')),
+        quantity=Sum(S('quantity')), max_quantity=Max(S('quantity')),
+        discount=Sum(S('discount')))
+
+
+def run(number):
+    source = {'lines': [{'price': (i * 7) % 13, 'quantity': i % 5,
+                         'discount': i % 3}
+                        for i in range(LINES)]}
+    expected = bend(reduce_mapping(), source)
+    for name, mapping in [('Reduce', reduce_mapping()),
+                          ('aggregations', aggregation_mapping()),
+                          ('Aggregate', aggregate_mapping())]:
+        assert bend(mapping, source) == expected
+        elapsed = timeit.timeit(lambda: bend(mapping, source), number=number)
+        print('{:<13} {:8.2f} us/order'.format(name,
+                                               elapsed / number * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,71 @@
+"""
+Report how many `Transport` objects `bend()` allocates per record, along with
+the peak memory traced while bending a record and the time it takes.
+
+Usage: python benchmarks/bench_alloc.py [number]
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+# run from a checkout without installing jsonbender
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from jsonbender import F, Format, If, K, S, bend
+from jsonbender.core import Transport
+
+
+def operators_case(width=50):
+    mapping = {}
+    for i in range(width):
+        value = S('values', i)
+        mapping['field_{}'.format(i)] = If(S('flags', i % 4) & (value != K(0)),
+                                           value * K(2) + K(1),
+                                           -value)
+    mapping['label'] = Format('{} ({})', S('name'), S('values') >> F(len))
+    source = {'flags': [True, False, True, True],
+              'values': list(range(-10, width)),
+              'name': 'record'}
+    return mapping, source
+
+
+def count_transports(mapping, source, number):
+    init = Transport.__init__
+    created = [0]
+
+    def counting_init(self, value, context):
+        created[0] += 1
+        init(self, value, context)
+
+    Transport.__init__ = counting_init
+    try:
+        for _ in range(number):
+            bend(mapping, source)
+    finally:
+        Transport.__init__ = init
+    return created[0] / float(number)
+
+
+def peak_memory(mapping, source):
+    tracemalloc.start()
+    try:
+        bend(mapping, source)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(number):
+    mapping, source = operators_case()
+    transports = count_transports(mapping, source, number)
+    peak = peak_memory(mapping, source)
+    elapsed = timeit.timeit(lambda: bend(mapping, source), number=number)
+    print('{:8.1f} Transport objects/record'.format(transports))
+    print('{:8d} bytes peak traced memory/record'.format(peak))
+    print('{:8.2f} us/record'.format(elapsed / number * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
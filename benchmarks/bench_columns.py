@@ -0,0 +1,85 @@
+"""
+Compare bending a batch of records into columns with `bend_columns()`
+against `bend_many()` followed by a pivot of the resulting dicts, for a flat
+mapping of selectors and for one of arithmetic and comparison operators
+(with and without NumPy, when it's installed).
+
+Usage: python benchmarks/bench_columns.py [number]
+"""
+import os
+import sys
+import timeit
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# run from a checkout without installing jsonbender
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from jsonbender import K, OptionalS, S, bend_columns, bend_many
+
+
+WIDTH = 10
+RECORDS = 10000
+
+
+def flat_case():
+    mapping = {'field_{}'.format(i): S('data', 'attrs', 'field_{}'.format(i))
+               for i in range(WIDTH)}
+    mapping['id'] = S('id')
+    mapping['optional'] = OptionalS('data', 'optional', default=0)
+    mapping['source'] = K('export')
+    sources = [{'id': n,
+                'data': {'attrs': {'field_{}'.format(i): n * i
+                                   for i in range(WIDTH)}}}
+               for n in range(RECORDS)]
+    return mapping, sources
+
+
+def operators_case():
+    price, quantity = S('line', 'price'), S('line', 'quantity')
+    discount = S('line', 'discount')
+    mapping = {'total': price * quantity,
+               'discounted': (price - discount) * quantity / K(100),
+               'free': price == K(0.0),
+               'returned': -quantity,
+               'changed': ~(discount == K(0.0))}
+    sources = [{'line': {'price': float(n % 50), 'quantity': n % 7,
+                         'discount': float(n % 3)}}
+               for n in range(RECORDS)]
+    return mapping, sources
+
+
+def without_numpy(mapping, sources):
+    sys.modules['numpy'] = None
+    try:
+        return bend_columns(mapping, sources)
+    finally:
+        sys.modules['numpy'] = numpy
+
+
+def pivot(mapping, sources):
+    rows = list(bend_many(mapping, sources))
+    return {k: [row[k] for row in rows] for k in mapping}
+
+
+def run(number):
+    funcs = [('bend_many + pivot', pivot), ('bend_columns', bend_columns)]
+    if numpy is not None:
+        funcs.append(('without numpy', without_numpy))
+    for case in [flat_case, operators_case]:
+        mapping, sources = case()
+        assert pivot(mapping, sources) == bend_columns(mapping, sources)
+        for name, func in funcs:
+            elapsed = timeit.timeit(lambda: func(mapping, sources),
+                                    number=number)
+            print('{:<15} {:<18} {:8.2f} us/record'
+                  .format(case.__name__, name,
+                          elapsed / number / RECORDS * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,70 @@
+"""
+Compare `bend()` (which walks the mapping with `_bend` on every call) against
+plans built once by `compile()` with each backend.
+
+Usage: python benchmarks/bench_compile.py [number]
+"""
+import os
+import sys
+import timeit
+
+# run from a checkout without installing jsonbender
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from jsonbender import F, K, S, bend, compile
+
+
+def wide_case(width=200):
+    mapping = {'field_{}'.format(i): S('data', 'field_{}'.format(i))
+               for i in range(width)}
+    mapping['total'] = S('data', 'field_0') + S('data', 'field_1')
+    source = {'data': {'field_{}'.format(i): i for i in range(width)}}
+    return mapping, source
+
+
+def deep_case(depth=10, width=5):
+    source = {'value': 42}
+    mapping = {'leaf_{}'.format(i): S('value') * K(i) for i in range(width)}
+    for level in range(depth):
+        mapping = {'level_{}'.format(level): mapping,
+                   'const': 'level {}'.format(level),
+                   'sibling': [S('value'), K(level)]}
+    return mapping, source
+
+
+def repeated_case(repeats=12):
+    address = S('payload', 'customer', 'address')
+    mapping = {'field_{}'.format(i): address >> F(len) for i in range(repeats)}
+    source = {'payload': {'customer': {'address': {'city': 'Florin'}}}}
+    return mapping, source
+
+
+def prefix_case(width=20):
+    mapping = {'field_{}'.format(i): S('data', 'attributes', 'field_{}'
+                                       .format(i))
+               for i in range(width)}
+    source = {'data': {'attributes': {'field_{}'.format(i): i
+                                      for i in range(width)}}}
+    return mapping, source
+
+
+def run(number):
+    for name, (mapping, source) in [('wide', wide_case()),
+                                    ('deep', deep_case()),
+                                    ('repeat', repeated_case()),
+                                    ('prefix', prefix_case())]:
+        t_bend = timeit.timeit(lambda: bend(mapping, source), number=number)
+        print('{:<6} {:<8} {:8.2f} us/record'
+              .format(name, 'bend', t_bend / number * 1e6))
+        for backend in ['closure', 'codegen']:
+            plan = compile(mapping, backend=backend)
+            assert plan(source) == bend(mapping, source)
+            t_plan = timeit.timeit(lambda: plan(source), number=number)
+            print('{:<6} {:<8} {:8.2f} us/record  speedup: {:.2f}x'
+                  .format(name, backend, t_plan / number * 1e6,
+                          t_bend / t_plan))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,51 @@
+"""
+Measure enum translations written as chains of `If`s comparing the same
+selector with literals, and as a `Switch`, for a growing number of branches,
+with `bend()` and the compiled plans. Every branch is hit equally often.
+
+Usage: python benchmarks/bench_dispatch.py [number]
+"""
+import os
+import sys
+import timeit
+
+# run from a checkout without installing jsonbender
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from jsonbender import K, S, bend, compile
+from jsonbender.control_flow import If, Switch
+
+
+def if_chain(branches):
+    mapping = K('unknown')
+    for i in reversed(range(branches)):
+        mapping = If(S('type') == K('type_{}'.format(i)),
+                     K('code_{}'.format(i)), mapping)
+    return mapping
+
+
+def switch(branches):
+    return Switch(S('type'), {'type_{}'.format(i): K('code_{}'.format(i))
+                              for i in range(branches)},
+                  default=K('unknown'))
+
+
+def run(number):
+    for branches in [4, 16, 64]:
+        sources = [{'type': 'type_{}'.format(i)} for i in range(branches)]
+        for case, mapping in [('if', if_chain(branches)),
+                              ('switch', switch(branches))]:
+            runners = [('bend', lambda s: bend(mapping, s)),
+                       ('closure', compile(mapping)),
+                       ('codegen', compile(mapping, backend='codegen'))]
+            for name, run_mapping in runners:
+                elapsed = timeit.timeit(
+                    lambda: [run_mapping(s) for s in sources], number=number)
+                print('{:3d} branches {:<7} {:<8} {:8.2f} us/record'
+                      .format(branches, case, name,
+                              elapsed / number / branches * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
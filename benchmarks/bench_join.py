@@ -0,0 +1,60 @@
+"""
+Compare attaching products to order lines by id with a `Filter` scanning the
+products for every line, against `Join` and against `Lookup` with the
+products in the context.
+
+Usage: python benchmarks/bench_join.py [number]
+"""
+import os
+import sys
+import timeit
+
+# run from a checkout without installing jsonbender
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from jsonbender import Context, F, Forall, Join, Lookup, S, bend
+
+
+def filter_mapping():
+    def product(pair):
+        line, products = pair
+        return [p for p in products if p['id'] == line['product_id']][0]
+
+    return {'names': F(lambda source: [
+        (line, source['products']) for line in source['lines']]) >>
+        Forall(lambda pair: product(pair)['name'])}
+
+
+def join_mapping():
+    return {'names': Join(S('lines'), S('products'), S('product_id'),
+                          S('id')) >> Forall(lambda pair: pair[1]['name'])}
+
+
+def lookup_mapping():
+    return {'names': S('lines') >> Forall.bend(
+        S('product_id') >> Lookup(Context() >> S('products'), S('id')) >>
+        S('name'))}
+
+
+def run(number):
+    for size in [10, 100, 1000]:
+        products = [{'id': i, 'name': 'product {}'.format(i)}
+                    for i in range(size)]
+        lines = [{'product_id': (i * 7) % size} for i in range(size)]
+        source = {'lines': lines, 'products': products}
+        context = {'products': products}
+        expected = bend(filter_mapping(), source)
+        repeat = max(1, number // size)
+        for name, mapping in [('Filter', filter_mapping()),
+                              ('Join', join_mapping()),
+                              ('Lookup', lookup_mapping())]:
+            assert bend(mapping, source, context) == expected
+            elapsed = timeit.timeit(lambda: bend(mapping, source, context),
+                                    number=repeat)
+            print('{:5d} lines {:<7} {:10.2f} us/line'
+                  .format(size, name, elapsed / repeat / size * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
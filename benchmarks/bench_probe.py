@@ -0,0 +1,56 @@
+"""
+Measure `OptionalS` and `Alternation` on sparse records, for hit ratios from
+0% (every optional field is missing) to 100%, with `bend()` and the compiled
+plans.
+
+Usage: python benchmarks/bench_probe.py [number]
+"""
+import os
+import sys
+import timeit
+
+# run from a checkout without installing jsonbender
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from jsonbender import K, OptionalS, S, bend, compile
+from jsonbender.control_flow import Alternation
+
+
+WIDTH = 20
+
+
+def mapping():
+    res = {}
+    for i in range(WIDTH):
+        res['opt_{}'.format(i)] = OptionalS('attrs', 'field_{}'.format(i))
+        res['alt_{}'.format(i)] = Alternation(S('attrs', 'alt_{}'.format(i)),
+                                              S('fallback', i),
+                                              K(None))
+    return res
+
+
+def source(hit_ratio):
+    hits = int(WIDTH * hit_ratio)
+    attrs = {}
+    for i in range(hits):
+        attrs['field_{}'.format(i)] = i
+        attrs['alt_{}'.format(i)] = i
+    return {'attrs': attrs, 'fallback': []}
+
+
+def run(number):
+    m = mapping()
+    runners = [('bend', lambda s: bend(m, s)),
+               ('closure', compile(m)),
+               ('codegen', compile(m, backend='codegen'))]
+    for hit_ratio in [0, 0.25, 0.5, 0.75, 1]:
+        src = source(hit_ratio)
+        for name, run_mapping in runners:
+            elapsed = timeit.timeit(lambda: run_mapping(src), number=number)
+            print('hits {:4.0%} {:<8} {:8.2f} us/record'
+                  .format(hit_ratio, name, elapsed / number * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,241 @@
+"""
+Measure the throughput (records per second) and the peak memory traced while
+bending, of the main hot paths, on generated payloads:
+
+- deep_select: `S` selecting the fields of the deepest level of records;
+- optional_miss: `OptionalS` missing at every level;
+- format: `Format` over a field of each level;
+- nested: a nested dict mapping, mirroring the records;
+- operators: a chain of arithmetic operators over each level;
+- forall_bend: `Forall.bend()` of the nested mapping over the list of all
+  the records, bent as a single document.
+
+Each payload is a list of records of `width` fields per level and `depth`
+levels, with as many records as needed to reach the given size in JSON (e.g.
+1k, 100k or 10m bytes). The records are bent one by one, with `bend()` or
+the compiled plans.
+
+The results can be saved as JSON with --output, and compared to those of a
+previous run with --compare: the exit status is then 1 if any throughput
+dropped, or peak memory grew, by more than --threshold.
+
+Usage: python benchmarks/suite.py [--sizes 1k,100k,1m] [--width 8]
+                                  [--depth 4] [--backends bend]
+                                  [--cases deep_select,...] [--output FILE]
+                                  [--compare FILE] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+
+# run from a checkout without installing jsonbender
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+import jsonbender
+from jsonbender import Forall, Format, K, OptionalS, S, bend, compile
+
+
+_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2}
+
+# how long each case is run for at least, and how many times
+MIN_TIME = 0.2
+REPEAT = 3
+
+
+def parse_size(size):
+    size = size.strip().lower().rstrip('b')
+    unit = size[-1] if size[-1:] in _UNITS else ''
+    return int(float(size[:len(size) - len(unit)]) * _UNITS[unit])
+
+
+def record(n, width, depth):
+    """
+    A record of `depth` levels, each with `width` int, float and str fields
+    ('f0', 'f1', ...), the deeper ones under 'child'.
+    """
+    res = {}
+    for i in range(width):
+        if i % 3 == 0:
+            res['f{}'.format(i)] = n + i
+        elif i % 3 == 1:
+            res['f{}'.format(i)] = (n + i) / 4.0
+        else:
+            res['f{}'.format(i)] = 'value-{}-{}'.format(n, i)
+    if depth > 1:
+        res['child'] = record(n + width, width, depth - 1)
+    return res
+
+
+def payload(size, width, depth):
+    """
+    A list of records weighing about `size` bytes once dumped as JSON.
+    """
+    records = []
+    weight = 2
+    while weight < size or not records:
+        records.append(record(len(records), width, depth))
+        weight += len(json.dumps(records[-1])) + 2
+    return records
+
+
+def level(d):
+    return ['child'] * d
+
+
+def nested_mapping(width, depth, d=0):
+    res = {'out_f{}'.format(i): S(*level(d) + ['f{}'.format(i)])
+           for i in range(width)}
+    if d + 1 < depth:
+        res['child'] = nested_mapping(width, depth, d + 1)
+    return res
+
+
+def cases(width, depth):
+    deepest = level(depth - 1)
+    total = K(0)
+    for d in range(depth):
+        total = total + S(*level(d) + ['f0']) * S(*level(d) + ['f1'])
+    return {
+        'deep_select': {'f{}'.format(i): S(*deepest + ['f{}'.format(i)])
+                        for i in range(width)},
+        'optional_miss': {'missing_{}'.format(d): OptionalS(
+            *level(d) + ['missing']) for d in range(depth)},
+        'format': {'label': Format(' / '.join(['{}'] * depth),
+                                   *[S(*level(d) + ['f0'])
+                                     for d in range(depth)])},
+        'nested': nested_mapping(width, depth),
+        'operators': {'total': total, 'scaled': total * K(2) - K(1)},
+        'forall_bend': {'items': S('items') >> Forall.bend(
+            nested_mapping(width, depth))},
+    }
+
+
+def runner(mapping, backend, records):
+    if backend == 'bend':
+        run = lambda source: bend(mapping, source)
+    else:
+        run = compile(mapping, backend=backend)
+    if 'items' in mapping:
+        document = {'items': records}
+        return lambda: [run(document)]
+    return lambda: [run(r) for r in records]
+
+
+def throughput(func, count):
+    best = 0
+    for _ in range(REPEAT):
+        runs = 0
+        start = timeit.default_timer()
+        elapsed = 0
+        while elapsed < MIN_TIME:
+            func()
+            runs += 1
+            elapsed = timeit.default_timer() - start
+        best = max(best, runs * count / elapsed)
+    return best
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, width, depth, backends, names):
+    results = []
+    mappings = cases(width, depth)
+    for size in sizes:
+        records = payload(size, width, depth)
+        weight = len(json.dumps(records))
+        for name in names:
+            for backend in backends:
+                func = runner(mappings[name], backend, records)
+                result = {'case': name, 'size': size, 'backend': backend,
+                          'bytes': weight, 'records': len(records),
+                          'records_per_second': throughput(func,
+                                                           len(records)),
+                          'peak_memory': peak_memory(func)}
+                print('{case:<14} {size:>9} {backend:<8} {records:>7} '
+                      'records {records_per_second:>12.0f} records/s '
+                      '{peak_memory:>11} B peak'.format(**result))
+                results.append(result)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the changes from `baseline`, and return whether any is a
+    regression beyond `threshold`.
+    """
+    previous = {(r['case'], r['size'], r['backend']): r
+                for r in baseline['results']}
+    regressed = False
+    for result in results:
+        old = previous.get((result['case'], result['size'],
+                            result['backend']))
+        if old is None:
+            continue
+        speed = result['records_per_second'] / old['records_per_second']
+        memory = (result['peak_memory'] / float(old['peak_memory'])
+                  if old['peak_memory'] else 1)
+        worse = speed < 1 - threshold or memory > 1 + threshold
+        regressed = regressed or worse
+        print('{:<14} {:>9} {:<8} speed x{:.2f} memory x{:.2f}{}'.format(
+            result['case'], result['size'], result['backend'], speed, memory,
+            '  REGRESSION' if worse else ''))
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the main hot paths of jsonbender.')
+    parser.add_argument('--sizes', default='1k,100k,1m',
+                        help='payload sizes, e.g. 1k,100k,10m')
+    parser.add_argument('--width', type=int, default=8,
+                        help='fields per level of the records')
+    parser.add_argument('--depth', type=int, default=4,
+                        help='levels of the records')
+    parser.add_argument('--backends', default='bend',
+                        help='among bend, closure and codegen')
+    parser.add_argument('--cases', default=None,
+                        help='the cases to run; defaults to all of them')
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--compare', help='results of a previous run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative change reported as a regression')
+    args = parser.parse_args(argv)
+    if args.width < 1 or args.depth < 1:
+        parser.error('width and depth must be at least 1')
+
+    names = sorted(cases(1, 1))
+    if args.cases:
+        unknown = set(args.cases.split(',')) - set(names)
+        if unknown:
+            parser.error('unknown cases: {}'.format(', '.join(unknown)))
+        names = [n for n in names if n in args.cases.split(',')]
+    results = run([parse_size(s) for s in args.sizes.split(',')],
+                  args.width, args.depth, args.backends.split(','), names)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({'version': jsonbender.__version__,
+                       'python': platform.python_version(),
+                       'width': args.width, 'depth': args.depth,
+                       'results': results}, fp, indent=2)
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,11 @@
 from jsonbender.core import Bender, Context, bend, BendingException
-from jsonbender.list_ops import FlatForall, Forall, Filter, Reduce
+from jsonbender.list_ops import (Aggregate, Count, FlatForall, Forall, Filter,
+                                 Join, Lookup, Max, Mean, Min, Reduce, Sum)
 from jsonbender.string_ops import Format
 from jsonbender.selectors import F, K, S, OptionalS
 from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.compiler import compile, Plan
+from jsonbender.batch import bend_columns, bend_many, bend_parallel
 
 
 __version__ = '0.9.3'
@@ -0,0 +1,216 @@
+# Static analysis of mappings, shared by the compile backends.
+#
+# Selector chains (S, GetItem and compositions of them, possibly starting at
+# Context()) are described by canonical paths: a root ('src' for the value
+# being bent, 'ctx' for the context) followed by the selected keys. Keys are
+# tagged with their type, so that e.g. S(1) and S(True) are kept apart even
+# though 1 == True. Bender.__eq__ can't be used to compare benders, since it
+# builds an Eq bender.
+from collections import defaultdict
+
+from jsonbender._compat import iteritems
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import (Add, And, Compose, Context, Div, Eq, GetItem,
+                             Invert, Mul, Ne, Neg, Or, Sub)
+from jsonbender.selectors import K, OptionalS, S
+from jsonbender.string_ops import Format, ProtectedFormat
+
+
+ROOT = ('src',)
+CONTEXT_ROOT = ('ctx',)
+
+
+def selector_path(bender):
+    """
+    Return `(from_context, keys)` if `bender` only selects keys from its
+    input (or from the context, when `from_context` is true), else None.
+    """
+    kind = type(bender)
+    if kind is S:
+        return _tag_keys(bender._path, False)
+    elif kind is GetItem:
+        return _tag_keys([bender._index], False)
+    elif kind is Context:
+        return True, ()
+    elif kind is Compose:
+        first = selector_path(bender._first)
+        second = first and selector_path(bender._second)
+        if not second:
+            return None
+        if second[0]:
+            # the keys selected before restarting at the context must still
+            # be looked up, since they can be missing
+            return None if first[1] else second
+        return first[0], first[1] + second[1]
+    return None
+
+
+def join(at, path):
+    """
+    Return the canonical path reached by following the relative `path`
+    (as returned by `selector_path()`) from the canonical path `at`.
+    """
+    if at is None or path is None:
+        return None
+    from_context, keys = path
+    return (CONTEXT_ROOT if from_context else at) + keys
+
+
+def untag(keys):
+    """
+    Return the plain keys of a tuple of tagged keys.
+    """
+    return [k for _, k in keys]
+
+
+def optional_path(bender):
+    """
+    Return the relative path selected by the OptionalS `bender`, in the same
+    format as `selector_path()`.
+    """
+    return _tag_keys(bender._path, False)
+
+
+def shared_paths(mapping):
+    """
+    Return a dict mapping the canonical paths worth sharing in `mapping` to
+    slot numbers, starting at 1.
+
+    All the paths selected in the mapping are merged into a prefix trie, and
+    every path of at least two keys that is selected more than once, either
+    on its own or as a prefix of longer paths, is shared.
+    Nested `ForallBend` mappings are separate scopes and aren't included.
+    """
+    counts = defaultdict(int)
+    _count_mapping(mapping, counts)
+    prefix_counts = defaultdict(int)
+    for path, n in iteritems(counts):
+        # a single lookup is as cheap as checking the memo
+        for end in range(3, len(path) + 1):
+            prefix_counts[path[:end]] += n
+    shared = sorted((path for path, n in iteritems(prefix_counts) if n > 1),
+                    key=repr)
+    return {path: slot for slot, path in enumerate(shared, 1)}
+
+
+def longest_shared_prefix(path, slots):
+    """
+    Return the longest proper prefix of `path` in `slots`, or None.
+    """
+    for end in range(len(path) - 1, 2, -1):
+        if path[:end] in slots:
+            return path[:end]
+    return None
+
+
+def if_chain(bender):
+    """
+    If `bender` is a chain of `If`s comparing the same selector with
+    literals, e.g.
+    `If(S('a') == K(1), x, If(S('a') == K(2), y, If(S('a') == K(3), z)))`,
+    return `(selector, cases, default)`, where `cases` is a list of
+    `(literal, bender)` pairs in the order they're tested and `default` is
+    the last `when_false`. Otherwise return None.
+
+    Only hashable literals equal to themselves (i.e. not NaN) are included,
+    so that the chain can be turned into a dict lookup.
+    """
+    selector, path, cases = None, None, []
+    while type(bender) is If:
+        compared = _compared_literal(bender.condition)
+        if compared is None or (cases and compared[1] != path):
+            break
+        selector, path, literal = compared
+        cases.append((literal, bender.when_true))
+        bender = bender.when_false
+    if len(cases) < 2:
+        return None
+    return selector, cases, bender
+
+
+def _compared_literal(condition):
+    """
+    Return `(selector, path, literal)` if `condition` compares a selector
+    chain with a usable `K` literal, else None.
+    """
+    if type(condition) is not Eq:
+        return None
+    selector, literal = condition._bender1, condition._bender2
+    if type(selector) is K:
+        selector, literal = literal, selector
+    path = selector_path(selector)
+    if path is None or type(literal) is not K:
+        return None
+    try:
+        hash(literal._val)
+    except TypeError:
+        return None
+    if not literal._val == literal._val:
+        return None
+    return selector, path, literal._val
+
+
+def _tag_keys(keys, from_context):
+    try:
+        tagged = tuple((type(k), k) for k in keys)
+        hash(tagged)
+    except TypeError:  # e.g. slices before Python 3.12
+        return None
+    return from_context, tagged
+
+
+def _count_mapping(mapping, counts):
+    if isinstance(mapping, list):
+        for v in mapping:
+            _count_mapping(v, counts)
+    elif isinstance(mapping, dict):
+        for v in mapping.values():
+            _count_mapping(v, counts)
+    else:
+        _count_bender(mapping, ROOT, counts)
+
+
+def _count_bender(bender, at, counts):
+    full_path = join(at, selector_path(bender))
+    if full_path is None and type(bender) is OptionalS:
+        full_path = join(at, optional_path(bender))
+    if full_path is not None:
+        counts[full_path] += 1
+        return
+    if type(bender) is Compose:
+        _count_bender(bender._first, at, counts)
+        _count_bender(bender._second,
+                      join(at, selector_path(bender._first)), counts)
+        return
+    for child in same_input_children(bender):
+        _count_bender(child, at, counts)
+
+
+def same_input_children(bender):
+    """
+    Return the benders that built-in `bender` evaluates on its own input.
+    """
+    kind = type(bender)
+    if kind in _UNARY:
+        return [bender.bender]
+    elif kind in _BINARY:
+        return [bender._bender1, bender._bender2]
+    elif kind in (And, Or):
+        return list(bender.benders)
+    elif kind is If:
+        return [bender.condition, bender.when_true, bender.when_false]
+    elif kind is Alternation:
+        return list(bender.benders)
+    elif kind is Switch and isinstance(bender.cases, dict):
+        children = [bender.key_bender] + list(bender.cases.values())
+        if bender.default:
+            children.append(bender.default)
+        return children
+    elif kind in (Format, ProtectedFormat):
+        return (list(bender._positional_benders) +
+                list(bender._named_benders.values()))
+    return []
+
+
+_UNARY = (Neg, Invert)
+_BINARY = (Add, Sub, Mul, Div, Eq, Ne)
@@ -4,5 +4,13 @@ PY2 = sys.version_info[0] == 2
 
 if not PY2:
     iteritems = lambda d: iter(d.items())
+    imap = map
+    ifilter = filter
+    literal_types = (bool, int, str, type(None))
+    text_type = str
 else:
     iteritems = lambda d: d.iteritems()
+    from itertools import imap, ifilter  # noqa
+    literal_types = (bool, int, long, str, unicode, type(None))  # noqa
+    text_type = unicode  # noqa
+
@@ -0,0 +1,412 @@
+import asyncio
+from collections import OrderedDict
+from functools import partial
+
+from jsonbender.compiler import compile
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import (Bender, BendingException, BinaryOperator,
+                             BooleanOperator, Compose, UnaryOperator, _bend,
+                             bend)
+from jsonbender.list_ops import ForallBend
+from jsonbender.string_ops import Format
+
+
+class AsyncF(Bender):
+    """
+    Like F, but `func` is a coroutine function (or any callable returning an
+    awaitable), e.g. a lookup in a cache or in a key-value service.
+    The extra positional and named parameters are passed to the function
+    after the given value.
+
+    Mappings containing AsyncF can only be bent with `abend()`.
+
+    Example:
+    ```
+    async def fetch_user(user_id): ...
+
+    mapping = {'user': S('user_id') >> AsyncF(fetch_user)}
+    await abend(mapping, {'user_id': 23})
+    ```
+    """
+    def __init__(self, func, *args, **kwargs):
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+
+    def _eval(self, value, context):
+        raise TypeError('Mappings with AsyncF must be bent with abend()')
+
+
+async def abend(mapping, source, context=None, limit=None):
+    """
+    The asyncio counterpart of `bend()`, for mappings containing `AsyncF`
+    benders.
+
+    The independent parts of the mapping (e.g. the values of a dict, the
+    operands of `+` or the arguments of `Format`) are awaited concurrently,
+    while the order of evaluation of `>>`, `If`, `Switch`, `Alternation`,
+    `&` and `|` is preserved. When a part fails, the AsyncF calls still
+    pending are cancelled.
+
+    mapping: the map of benders, as passed to `bend()`.
+    source: the value to be bent.
+    context: optional. the context, as passed to `bend()`.
+    limit: optional. the maximum number of AsyncF calls awaited at once.
+
+    Mappings without AsyncF are bent synchronously by `bend()`. Which parts
+    of a mapping contain AsyncF is only analysed the first time it's bent,
+    so mappings shouldn't be modified afterwards.
+
+    Example:
+    ```
+    result = await abend(MAPPING, source, limit=10)
+    ```
+    """
+    context = {} if context is None else context
+    analysis = _analysis(mapping)
+    if not _is_async(mapping, analysis):
+        return bend(mapping, source, context)
+    bender = _AsyncBender(limit, analysis)
+    return await bender.mapping(mapping, source, context)
+
+
+# The analyses of the mappings last bent by abend(), by id, in least
+# recently used order. The mappings are kept alive with them, so that their
+# ids aren't reused.
+_ANALYSES = OrderedDict()
+_ANALYSES_SIZE = 128
+
+
+def _analysis(mapping):
+    """
+    Return the dict caching `_is_async()` for `mapping` and its parts.
+    """
+    entry = _ANALYSES.pop(id(mapping), None)
+    if entry is None:
+        entry = (mapping, {})
+        if len(_ANALYSES) >= _ANALYSES_SIZE:
+            _ANALYSES.popitem(last=False)
+    _ANALYSES[id(mapping)] = entry
+    return entry[1]
+
+
+def _is_async(mapping, analysis):
+    """
+    Whether `mapping` contains AsyncF benders that can be reached, caching
+    the result for it and its parts in `analysis`.
+    """
+    key = id(mapping)
+    result = analysis.get(key)
+    if result is None:
+        if isinstance(mapping, AsyncF):
+            result = True
+        else:
+            result = any(_is_async(c, analysis)
+                         for c in _children(mapping))
+        analysis[key] = result
+    return result
+
+
+def abend_stream(mapping, sources, context=None, errors=None, window=64,
+                 executor=None, limit=None):
+    """
+    Bend the sources of an async iterable (e.g. records read from a socket
+    or a queue) with the same mapping, as an async iterator over the
+    results, in the same order as `sources`.
+
+    mapping: the map of benders, as passed to `abend()`, or a `Plan`
+             returned by `compile()`.
+    sources: an async iterable of sources to be bent.
+    context: optional. the context passed to every bending.
+    errors: optional. a list in which failures are collected, as in
+            `bend_many()`.
+    window: optional. the maximum number of sources read ahead of the
+            consumer. Sources are only read while there's room in the
+            window, so a slow consumer slows down the producer.
+    executor: optional. an executor (e.g. a `ThreadPoolExecutor`) in which
+              mappings without AsyncF are bent, to keep CPU-heavy mappings
+              from blocking the event loop.
+    limit: optional. the maximum number of AsyncF calls awaited at once,
+           per source.
+
+    Call `aclose()` on the returned iterator when it isn't consumed to the
+    end, to stop reading sources.
+
+    Example:
+    ```
+    async for result in abend_stream(MAPPING, read_records(socket)):
+        await publish(result)
+    ```
+    """
+    if window < 1:
+        raise ValueError('window must be at least 1')
+    return _AsyncStream(mapping, sources, context, errors, window, executor,
+                        limit)
+
+
+class _AsyncStream(object):
+    """
+    Reads sources in a background task, which bends them concurrently and
+    queues the pending results in order. Each queued result takes a slot of
+    the window until it's handed to the consumer.
+    """
+
+    def __init__(self, mapping, sources, context, errors, window, executor,
+                 limit):
+        context = {} if context is None else context
+        if _is_async(mapping, _analysis(mapping)):
+            self._bend = partial(abend, mapping, context=context, limit=limit)
+        else:
+            plan = compile(mapping)
+            self._bend = partial(self._bend_sync, plan, context, executor)
+        self._sources = sources
+        self._errors = errors
+        self._window = window
+        self._queue = None
+        self._slots = None
+        self._producer = None
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._producer is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self._window)
+            self._producer = asyncio.ensure_future(self._produce())
+        while not self._done:
+            index, future = await self._queue.get()
+            if future is None:
+                self._done = True
+                break
+            try:
+                result = await future
+            except BendingException as e:
+                if self._errors is None:
+                    await self.aclose()
+                    raise
+                self._errors.append((index, e))
+            except BaseException:
+                await self.aclose()
+                raise
+            else:
+                return result
+            finally:
+                self._slots.release()
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        """
+        Stop reading sources and cancel the pending bendings.
+        """
+        self._done = True
+        if self._producer is not None:
+            self._producer.cancel()
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if future is not None:
+                    future.cancel()
+
+    async def _produce(self):
+        loop = asyncio.get_event_loop()
+        index = 0
+        iterator = self._sources.__aiter__()
+        try:
+            while True:
+                await self._slots.acquire()
+                try:
+                    source = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                self._queue.put_nowait(
+                    (index, asyncio.ensure_future(self._bend(source))))
+                index += 1
+        except Exception as e:
+            # raised to the consumer when it reaches this point
+            failed = loop.create_future()
+            failed.set_exception(e)
+            self._queue.put_nowait((index, failed))
+        self._queue.put_nowait((index, None))
+
+    @staticmethod
+    async def _bend_sync(plan, context, executor, source):
+        if executor is None:
+            return plan(source, context)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, plan, source, context)
+
+
+class _AsyncBender(object):
+    """
+    Bends the parts of a mapping that contain AsyncF benders.
+
+    Built-in benders are recognized by their `_eval()` method, so that
+    subclasses overriding it (or `raw_execute()`) are bent synchronously,
+    as they would be by `bend()`.
+    """
+
+    def __init__(self, limit=None, analysis=None):
+        self._semaphore = asyncio.Semaphore(limit) if limit else None
+        self._async = {} if analysis is None else analysis
+
+    def is_async(self, mapping):
+        """
+        Whether `mapping` contains AsyncF benders that can be reached.
+        """
+        return _is_async(mapping, self._async)
+
+    async def mapping(self, mapping, value, context):
+        if not self.is_async(mapping):
+            return _bend_sync(mapping, value, context)
+        elif isinstance(mapping, list):
+            return list(await _gather_or_cancel(
+                *[self.mapping(v, value, context) for v in mapping]))
+        elif isinstance(mapping, dict):
+            items = list(mapping.items())
+            values = await _gather_or_cancel(
+                *[self._item(k, v, value, context) for k, v in items])
+            return {k: v for (k, _), v in zip(items, values)}
+        return await self.bender(mapping, value, context)
+
+    async def _item(self, key, mapping, value, context):
+        try:
+            return await self.mapping(mapping, value, context)
+        except Exception as e:
+            m = 'Error for key {}: {}'.format(key, str(e))
+            raise BendingException(m)
+
+    async def bender(self, bender, value, context):
+        if not self.is_async(bender):
+            return bender._eval(value, context)
+        elif isinstance(bender, AsyncF):
+            return await self._call(bender, value)
+        method = _METHODS[type(bender)._eval][1]
+        return await method(self, bender, value, context)
+
+    async def _call(self, bender, value):
+        if self._semaphore is None:
+            return await bender._func(value, *bender._args, **bender._kwargs)
+        async with self._semaphore:
+            return await bender._func(value, *bender._args, **bender._kwargs)
+
+    async def _gather(self, benders, value, context):
+        return await _gather_or_cancel(
+            *[self.bender(b, value, context) for b in benders])
+
+    async def _compose(self, bender, value, context):
+        value = await self.bender(bender._first, value, context)
+        return await self.bender(bender._second, value, context)
+
+    async def _unary(self, bender, value, context):
+        return bender.op(await self.bender(bender.bender, value, context))
+
+    async def _binary(self, bender, value, context):
+        return bender.op(*await self._gather(
+            [bender._bender1, bender._bender2], value, context))
+
+    async def _boolean(self, bender, value, context):
+        for b in bender.benders:
+            val = await self.bender(b, value, context)
+            if bender.stop(val):
+                break
+        return val
+
+    async def _if(self, bender, value, context):
+        if await self.bender(bender.condition, value, context):
+            return await self.bender(bender.when_true, value, context)
+        return await self.bender(bender.when_false, value, context)
+
+    async def _alternation(self, bender, value, context):
+        exc = ValueError()
+        for b in bender.benders:
+            try:
+                return await self.bender(b, value, context)
+            except LookupError as e:
+                exc = e
+        raise exc
+
+    async def _switch(self, bender, value, context):
+        key = await self.bender(bender.key_bender, value, context)
+        try:
+            case = bender.cases[key]
+        except LookupError:
+            if bender.default:
+                case = bender.default
+            else:
+                raise
+        return await self.bender(case, value, context)
+
+    async def _format(self, bender, value, context):
+        names = list(bender._named_benders)
+        values = await self._gather(
+            list(bender._positional_benders) +
+            [bender._named_benders[k] for k in names], value, context)
+        split = len(bender._positional_benders)
+        return bender._render(values[:split], dict(zip(names, values[split:])))
+
+    async def _forall_bend(self, bender, value, context):
+        context = bender._context or context
+        return list(await _gather_or_cancel(
+            *[self.mapping(bender._mapping, v, context) for v in value]))
+
+
+async def _gather_or_cancel(*awaitables):
+    """
+    Like `asyncio.gather()`, but cancels the other awaitables as soon as one
+    fails, so that no lookup keeps running after the bending has failed.
+    """
+    tasks = [asyncio.ensure_future(a) for a in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def _bend_sync(mapping, value, context):
+    if isinstance(mapping, (list, dict)):
+        return _bend(mapping, value, context)
+    elif isinstance(mapping, Bender):
+        return mapping._eval(value, context)
+    return mapping
+
+
+def _children(mapping):
+    if isinstance(mapping, list):
+        return mapping
+    elif isinstance(mapping, dict):
+        return list(mapping.values())
+    elif isinstance(mapping, Bender):
+        entry = _METHODS.get(type(mapping)._eval)
+        return entry[0](mapping) if entry else []
+    return []
+
+
+def _switch_children(bender):
+    cases = bender.cases
+    children = [bender.key_bender]
+    children.extend(cases.values() if isinstance(cases, dict) else cases)
+    if bender.default:
+        children.append(bender.default)
+    return children
+
+
+# the children and async evaluation of the built-in benders, by `_eval()`
+_METHODS = {
+    Compose._eval: (lambda b: [b._first, b._second],
+                    _AsyncBender._compose),
+    UnaryOperator._eval: (lambda b: [b.bender], _AsyncBender._unary),
+    BinaryOperator._eval: (lambda b: [b._bender1, b._bender2],
+                           _AsyncBender._binary),
+    BooleanOperator._eval: (lambda b: b.benders, _AsyncBender._boolean),
+    If._eval: (lambda b: [b.condition, b.when_true, b.when_false],
+               _AsyncBender._if),
+    Alternation._eval: (lambda b: list(b.benders), _AsyncBender._alternation),
+    Switch._eval: (_switch_children, _AsyncBender._switch),
+    Format._eval: (lambda b: (list(b._positional_benders) +
+                              list(b._named_benders.values())),
+                   _AsyncBender._format),
+    ForallBend._eval: (lambda b: [b._mapping], _AsyncBender._forall_bend),
+}
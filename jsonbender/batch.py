@@ -0,0 +1,444 @@
+from array import array
+from collections import deque
+from itertools import islice
+import multiprocessing
+from operator import itemgetter
+
+from jsonbender._analysis import (CONTEXT_ROOT, ROOT, join,
+                                  longest_shared_prefix, same_input_children,
+                                  selector_path, shared_paths, untag)
+from jsonbender._compat import PY2, iteritems
+from jsonbender.compiler import Plan, compile
+from jsonbender.core import (Add, Bender, BendingException, Div, Eq, Invert,
+                             Mul, Ne, Neg, Sub, _NOT_FOUND, _probe_path)
+from jsonbender.metrics import (_notify_bent, _notify_failed, _observed,
+                                _observers, _reset, _timer)
+from jsonbender.selectors import K, OptionalS
+
+
+# The plan and context used by process pool workers. They are set once per
+# worker by the pool initializer; with the 'fork' start method they're
+# inherited from the parent, so mappings don't even need to be picklable.
+_worker_plan = None
+_worker_context = None
+
+
+def bend_many(mapping, sources, context=None, errors=None):
+    """
+    Bend each source of an iterable with the same mapping.
+
+    mapping: the map of benders, as passed to `bend()`, or a `Plan` returned
+             by `compile()`.
+    sources: an iterable of sources to be bent.
+    context: optional. the context passed to every bending.
+    errors: optional. a list in which failures are collected. When given,
+            a source that raises `BendingException` is skipped and an
+            `(index, exception)` tuple is appended to `errors`, instead of
+            aborting the whole batch.
+
+    The mapping is compiled once for the whole batch, and all sources share
+    the same context.
+    Returns an iterator over the bent results, in the same order as
+    `sources`.
+
+    Example:
+    ```
+    errors = []
+    results = bend_many({'b': S('a')}, [{'a': 1}, {}, {'a': 3}],
+                        errors=errors)
+    list(results)  # -> [{'b': 1}, {'b': 3}]
+    errors  # -> [(1, BendingException("Error for key b: 'a'"))]
+    ```
+    """
+    plan = compile(mapping)
+    run = _observed(plan.mapping, plan._run)
+    context = {} if context is None else context
+    if errors is None:
+        for source in sources:
+            yield run(source, context)
+    else:
+        for i, source in enumerate(sources):
+            try:
+                result = run(source, context)
+            except BendingException as e:
+                errors.append((i, e))
+            else:
+                yield result
+
+
+def bend_parallel(mapping, sources, context=None, errors=None,
+                  workers=None, chunksize=1000):
+    """
+    Like `bend_many()`, but bends the sources in a pool of processes, so
+    CPU-bound bendings can use all cores.
+
+    mapping: the map of benders, as passed to `bend()`, or a `Plan` returned
+             by `compile()`.
+    sources: an iterable of sources to be bent.
+    context: optional. the context passed to every bending. Each worker
+             process gets its own copy.
+    errors: optional. a list in which failures are collected, as in
+            `bend_many()`.
+    workers: optional. the number of worker processes; defaults to the
+             number of CPUs.
+    chunksize: optional. how many sources are sent to a worker at a time.
+
+    The mapping and context are sent to each worker only once, when the pool
+    starts. Where the 'fork' start method is available they are inherited
+    instead of pickled, so mappings holding lambdas (e.g. in `F` or
+    `Forall`) work too.
+    Returns an iterator over the bent results, in the same order as
+    `sources`. Only a bounded number of chunks is in flight at any time.
+    Requires Python 3.
+    """
+    if PY2:
+        raise NotImplementedError('bend_parallel() requires Python 3')
+    if chunksize < 1:
+        raise ValueError('chunksize must be at least 1')
+    workers = workers or multiprocessing.cpu_count()
+    plan = compile(mapping)
+    context = {} if context is None else context
+    return _bend_parallel(plan, sources, context, errors, workers, chunksize)
+
+
+def _bend_parallel(plan, sources, context, errors, workers, chunksize):
+    from concurrent.futures import ProcessPoolExecutor
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    else:
+        mp_context = None
+    collect = errors is not None
+    sources = iter(sources)
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=mp_context,
+                             initializer=_init_worker,
+                             initargs=(plan, context)) as executor:
+        pending = deque()
+        offset = 0
+        while True:
+            while len(pending) < 2 * workers:
+                chunk = list(islice(sources, chunksize))
+                if not chunk:
+                    break
+                future = executor.submit(_bend_chunk, chunk, collect)
+                pending.append((offset, future))
+                offset += len(chunk)
+            if not pending:
+                break
+            chunk_offset, future = pending.popleft()
+            try:
+                results, chunk_errors, seconds = future.result()
+            except BendingException as e:
+                if _observers:
+                    _notify_failed(plan.mapping, e)
+                raise
+            if collect:
+                errors.extend((chunk_offset + i, e) for i, e in chunk_errors)
+            if _observers:
+                for _, e in chunk_errors or ():
+                    _notify_failed(plan.mapping, e)
+                if results:
+                    _notify_bent(plan.mapping, len(results), seconds)
+            for result in results:
+                yield result
+
+
+def bend_columns(mapping, sources, context=None, errors=None, types=None):
+    """
+    Bend a batch of sources with the same flat mapping, returning the results
+    as columns: a dict mapping each key of `mapping` to the list of its
+    values, one per source.
+
+    mapping: a dict of benders (or constants), as passed to `bend()`, or a
+             `Plan` of one. Nested dicts and lists aren't supported.
+    sources: an iterable of sources to be bent.
+    context: optional. the context passed to every bending.
+    errors: optional. a list in which failures are collected. When given,
+            a source that raises `BendingException` is left out of every
+            column and an `(index, exception)` tuple is appended to
+            `errors`, instead of aborting the whole batch.
+    types: optional. a dict mapping keys to the type of their column, which
+           is a list by default. It can be an `array.array` typecode (e.g.
+           'd' or 'q'), or a function called with the list of values, e.g.
+           `numpy.asarray`.
+
+    Selector chains (e.g. `S('data', 'price')`) are evaluated column-wise,
+    with `operator.itemgetter` over the whole batch, and the prefixes they
+    share are only selected once. Constants, the context and selections
+    from it are evaluated once per batch. Arithmetic and comparison
+    operators over such columns are applied column-wise too, with NumPy
+    when it's installed and the operands are numbers (see `_numeric()`).
+    Other benders are compiled and applied source by source. No dict is
+    built per source.
+
+    Example:
+    ```
+    columns = bend_columns({'id': S('id'), 'price': S('price') * K(100)},
+                           [{'id': 1, 'price': 2.5}, {'id': 2, 'price': 3}],
+                           types={'price': 'd'})
+    columns  # -> {'id': [1, 2], 'price': array('d', [250.0, 300.0])}
+    ```
+    """
+    if not _observers:
+        return _bend_columns(mapping, sources, context, errors, types)
+    observed = mapping.mapping if isinstance(mapping, Plan) else mapping
+    sources = sources if isinstance(sources, list) else list(sources)
+    known = 0 if errors is None else len(errors)
+    start = _timer()
+    try:
+        columns = _bend_columns(mapping, sources, context, errors, types)
+    except Exception as e:
+        _notify_failed(observed, e)
+        raise
+    seconds = _timer() - start
+    failures = [] if errors is None else errors[known:]
+    for _, e in failures:
+        _notify_failed(observed, e)
+    if len(sources) > len(failures):
+        _notify_bent(observed, len(sources) - len(failures), seconds)
+    return columns
+
+
+def _bend_columns(mapping, sources, context, errors, types):
+    if isinstance(mapping, Plan):
+        mapping = mapping.mapping
+    if not isinstance(mapping, dict):
+        raise ValueError('bend_columns() takes a dict mapping')
+    sources = sources if isinstance(sources, list) else list(sources)
+    context = {} if context is None else context
+    types = types or {}
+    selector = _ColumnSelector(mapping, sources)
+    columns, failed = {}, {}
+    for key, value in iteritems(mapping):
+        if isinstance(value, (dict, list)):
+            raise ValueError('bend_columns() takes a flat mapping, but the '
+                             'value for key {} is nested'.format(key))
+        try:
+            column = _fast_column(value, sources, context, selector)
+        except Exception:
+            # selections are repeated source by source to find the failures
+            column = None
+        if column is None:
+            column = _column(key, value, sources, context, failed, errors)
+        columns[key] = column
+    if failed:
+        errors.extend(sorted(failed.items()))
+        keep = [i not in failed for i in range(len(sources))]
+        columns = {k: [v for v, ok in zip(column, keep) if ok]
+                   for k, column in iteritems(columns)}
+    return {k: _convert(k, column, types.get(k))
+            for k, column in iteritems(columns)}
+
+
+class _ColumnSelector(object):
+    """
+    Selects canonical source paths column-wise, keeping the columns of the
+    prefixes shared by several paths (see `_analysis.shared_paths()`).
+    """
+
+    def __init__(self, mapping, sources):
+        self._sources = sources
+        self._slots = shared_paths(mapping)
+        self._columns = {}
+
+    def select(self, path):
+        column = self._columns.get(path)
+        if column is not None:
+            return column
+        prefix = longest_shared_prefix(path, self._slots)
+        if prefix is None:
+            column, keys = self._sources, untag(path[len(ROOT):])
+        else:
+            column, keys = self.select(prefix), untag(path[len(prefix):])
+        for key in keys:
+            column = map(itemgetter(key), column)
+        column = list(column)
+        if path in self._slots:
+            self._columns[path] = column
+        return column
+
+
+def _fast_column(value, sources, context, selector):
+    """
+    Return the column of `value` if it can be computed for the whole batch
+    at once, else None.
+    """
+    if not isinstance(value, Bender):
+        return [value] * len(sources)
+    elif type(value) is K:
+        return [value._val] * len(sources)
+    elif type(value) is OptionalS:
+        path, default = value._path, value.default
+        return [default if v is _NOT_FOUND else v
+                for v in (_probe_path(s, path) for s in sources)]
+    elif type(value) in _VECTORIZED:
+        column = _operator_column(value, sources, context, selector)
+        if column is not None and type(column) is not list:
+            column = column.tolist()  # a NumPy array
+        return column
+    path = join(ROOT, selector_path(value))
+    if path is None:
+        return None
+    elif path[:1] == CONTEXT_ROOT:
+        # the same for every source
+        selected = _probe_path(context, untag(path[len(CONTEXT_ROOT):]))
+        if selected is _NOT_FOUND:
+            return None
+        return [selected] * len(sources)
+    return selector.select(path)
+
+
+def _operator_column(value, sources, context, selector):
+    """
+    Return the column of the operator `value` (one of `_VECTORIZED`), or
+    None if one of its operands can't be computed for the whole batch at
+    once. Numeric columns are kept as NumPy arrays between nested operators.
+    """
+    operands = []
+    for bender in same_input_children(value):
+        if type(bender) in _VECTORIZED:
+            column = _operator_column(bender, sources, context, selector)
+        else:
+            column = _fast_column(bender, sources, context, selector)
+        if column is None:
+            return None
+        operands.append(column)
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None:
+        arrays = [_numeric(numpy, column) for column in operands]
+        if all(a is not None for a in arrays):
+            with numpy.errstate(all='ignore'):
+                result = _VECTORIZED[type(value)](numpy, *arrays)
+            if result is not None:
+                return result
+        operands = [c.tolist() if isinstance(c, numpy.ndarray) else c
+                    for c in operands]
+    # e.g. strings, or numbers NumPy wouldn't compute exactly as Python
+    return list(map(value.op, *operands))
+
+
+# Python ints whose magnitude is at most 2 ** 53 are exactly representable
+# as floats, so mixing them with floats gives the same results in NumPy.
+# Integer results are kept within the bound, so int64 never overflows.
+_EXACT = 2 ** 53
+
+
+def _numeric(numpy, column):
+    """
+    Return `column` as a NumPy array if it only holds floats, or only ints
+    and bools, that NumPy computes exactly as Python does, else None.
+    Columns mixing ints and floats aren't converted, since the type of the
+    results would vary from one source to the other.
+    """
+    if isinstance(column, numpy.ndarray):
+        return column
+    kinds = set(map(type, column))
+    if kinds == {float}:
+        dtype = numpy.float64
+    elif not kinds or not kinds <= {bool, int}:
+        return None
+    elif kinds == {bool}:
+        dtype = numpy.bool_
+    else:
+        dtype = numpy.int64
+    try:
+        result = numpy.array(column, dtype)
+    except OverflowError:
+        return None
+    if dtype is not numpy.bool_ and _magnitude(numpy, result) > _EXACT:
+        return None
+    return result
+
+
+def _magnitude(numpy, array):
+    # NaN isn't greater than anything, so it doesn't count
+    return numpy.abs(array).max() if array.size else 0
+
+
+def _as_number(numpy, array):
+    # bools take part in arithmetic as ints, as in Python
+    return array.astype(numpy.int64) if array.dtype == numpy.bool_ else array
+
+
+def _arithmetic(ufunc, bound):
+    """
+    Vectorize an arithmetic operator, given the NumPy ufunc computing it and
+    a function bounding the magnitude of its integer results, given the
+    maximum magnitude of the operands.
+    """
+    def vectorized(numpy, a, b):
+        a, b = _as_number(numpy, a), _as_number(numpy, b)
+        if a.dtype == numpy.int64 and b.dtype == numpy.int64 and bound(
+                int(_magnitude(numpy, a)), int(_magnitude(numpy, b))) > _EXACT:
+            return None
+        return getattr(numpy, ufunc)(a, b)
+    return vectorized
+
+
+def _div(numpy, a, b):
+    if not b.all():
+        # dividing by zero raises ZeroDivisionError, source by source
+        return None
+    return numpy.true_divide(a.astype(numpy.float64), b.astype(numpy.float64))
+
+
+# the vectorized operators, taking the numpy module and the operand arrays
+# and returning the result array, or None if it must be computed in Python
+_VECTORIZED = {
+    Add: _arithmetic('add', lambda a, b: a + b),
+    Sub: _arithmetic('subtract', lambda a, b: a + b),
+    Mul: _arithmetic('multiply', lambda a, b: a * b),
+    Div: _div,
+    Eq: lambda numpy, a, b: numpy.equal(a, b),
+    Ne: lambda numpy, a, b: numpy.not_equal(a, b),
+    Neg: lambda numpy, a: numpy.negative(_as_number(numpy, a)),
+    Invert: lambda numpy, a: numpy.logical_not(a),
+}
+
+
+def _column(key, value, sources, context, failed, errors):
+    run = compile(value)._run
+    column = []
+    for i, source in enumerate(sources):
+        try:
+            column.append(run(source, context))
+        except Exception as e:
+            m = 'Error for key {}: {}'.format(key, str(e))
+            if errors is None:
+                raise BendingException(m)
+            failed.setdefault(i, BendingException(m))
+            column.append(None)
+    return column
+
+
+def _convert(key, column, kind):
+    if kind is None:
+        return column
+    try:
+        if callable(kind):
+            return kind(column)
+        return array(kind, column)
+    except Exception as e:
+        m = 'Error for key {}: {}'.format(key, str(e))
+        raise BendingException(m)
+
+
+def _init_worker(plan, context):
+    global _worker_plan, _worker_context
+    # observers inherited from the parent would never be read: the parent
+    # notifies its own of each chunk
+    _reset()
+    _worker_plan = plan
+    _worker_context = context
+
+
+def _bend_chunk(chunk, collect):
+    errors = [] if collect else None
+    start = _timer()
+    results = list(bend_many(_worker_plan, chunk, _worker_context, errors))
+    return results, errors, _timer() - start
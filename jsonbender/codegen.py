@@ -0,0 +1,601 @@
+from ast import literal_eval
+import itertools
+import linecache
+
+from jsonbender._analysis import (CONTEXT_ROOT, ROOT, if_chain, join,
+                                  longest_shared_prefix, optional_path,
+                                  same_input_children, selector_path,
+                                  shared_paths, untag)
+from jsonbender._compat import iteritems, literal_types
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import (Add, And, Bender, BendingException, Compose,
+                             Context, Div, Eq, GetItem, Invert, Mul, Ne, Neg,
+                             Or, Sub, _NOT_FOUND, _Sentinel, _probe_path)
+from jsonbender.list_ops import ForallBend
+from jsonbender.selectors import F, K, OptionalS, ProtectedF, S
+from jsonbender.string_ops import Format, ProtectedFormat
+
+
+# CPython refuses to compile more than 20 statically nested blocks (and 100
+# indentation levels), so deeper mappings are split into helper functions.
+_MAX_BLOCKS = 10
+_MAX_INDENT = 40
+
+_filename_counter = itertools.count()
+
+
+def generate(mapping):
+    """
+    Generate Python source for `mapping`.
+
+    Returns a `(function, source)` tuple, where `function` takes the source
+    and the context and returns the same as `bend()` would.
+    """
+    generator = _CodeGenerator()
+    entry = generator.scope(mapping, 'bend_mapping')
+    source = generator.source()
+    filename = '<jsonbender-codegen-{}>'.format(next(_filename_counter))
+    # make tracebacks show the generated lines
+    linecache.cache[filename] = (len(source), None,
+                                 source.splitlines(True), filename)
+    namespace = dict(generator.namespace)
+    exec(compile(source, filename, 'exec'), namespace)
+    for container, key, name in generator.late_bindings:
+        container[key] = namespace[name]
+    return namespace[entry], source
+
+
+class _Function(object):
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+        self.lines = []
+        self.indent = 1
+        self.blocks = 0
+
+
+class _CodeGenerator(object):
+    """
+    Translates mappings and benders into straight-line Python statements.
+
+    Each bender is compiled by emitting the statements that compute its value
+    and returning an expression (a temporary's name or a literal) holding
+    the result. Benders the generator doesn't know about are called through
+    their normal interface.
+
+    As in the closure backend, the source of the current scope and the
+    values of the selector paths shared in it are kept in a `memo` list, and
+    `at` is the canonical path of the value a bender is applied to (see
+    `_analysis`).
+    """
+
+    def __init__(self):
+        self.namespace = {'BendingException': BendingException,
+                          '_MISSING': _MISSING,
+                          '_FAILED': _FAILED,
+                          '_probe_path': _probe_path}
+        self.functions = []
+        # (container, key, function name) to fill once the source is executed
+        self.late_bindings = []
+        self._counter = itertools.count()
+        self._fn = None
+        self._slots = None
+
+    def source(self):
+        chunks = []
+        for fn in self.functions:
+            chunks.append('def {}({}):\n'.format(fn.name, fn.params))
+            chunks.extend(line + '\n' for line in fn.lines)
+            chunks.append('\n')
+        return ''.join(chunks)
+
+    def scope(self, mapping, prefix='_scope'):
+        """
+        Emit a function taking the source and the context that bends them
+        with `mapping`, in a new scope. Returns the function's name.
+        """
+        outer, self._slots = self._slots, shared_paths(mapping)
+        try:
+            if self._slots:
+                preamble = ['memo = [_MISSING] * {}'
+                            .format(len(self._slots) + 1),
+                            'memo[0] = src']
+            else:
+                preamble = ['memo = None']
+            return self.function(lambda src: self.mapping(mapping, src),
+                                 prefix, 'src, ctx', preamble)
+        finally:
+            self._slots = outer
+
+    def function(self, compile_body, prefix='_g', params='src, ctx, memo',
+                 preamble=()):
+        """
+        Emit a new function whose body is generated by `compile_body`,
+        which is called with the name of the function's source argument.
+        Returns the function's name.
+        """
+        fn = _Function(self._name(prefix), params)
+        outer, self._fn = self._fn, fn
+        try:
+            for line in preamble:
+                self._emit(line)
+            self._emit('return ' + compile_body('src'))
+        finally:
+            self._fn = outer
+        self.functions.append(fn)
+        return fn.name
+
+    # emitting helpers
+
+    def _name(self, prefix):
+        return '{}{}'.format(prefix, next(self._counter))
+
+    def _emit(self, line):
+        self._fn.lines.append('    ' * self._fn.indent + line)
+
+    def _indent(self, block=False):
+        self._fn.indent += 1
+        self._fn.blocks += block
+
+    def _dedent(self, block=False):
+        self._fn.indent -= 1
+        self._fn.blocks -= block
+
+    def _too_deep(self):
+        return (self._fn.blocks >= _MAX_BLOCKS or
+                self._fn.indent >= _MAX_INDENT)
+
+    def _temp(self, expr):
+        name = self._name('t')
+        self._emit('{} = {}'.format(name, expr))
+        return name
+
+    def _operand(self, value):
+        """
+        Return `value`, assigned to a temporary if it's a literal, e.g.
+        `None` or `1` as returned by `_const()`, which can't be subscripted
+        in the generated code.
+        """
+        try:
+            literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+        return self._temp(value)
+
+    def _bind(self, value, prefix='_c'):
+        name = self._name(prefix)
+        self.namespace[name] = value
+        return name
+
+    def _const(self, value):
+        if type(value) in literal_types or (
+                type(value) is tuple and
+                all(type(v) in literal_types for v in value)):
+            return repr(value)
+        return self._bind(value)
+
+    def _spill(self, compile_body, value):
+        name = self.function(compile_body)
+        return self._temp('{}({}, ctx, memo)'.format(name, value))
+
+    def _branch(self, header, compile_body, value, result, block=False):
+        """
+        Emit `header` followed by an indented suite that stores the result
+        of `compile_body(value)` in `result`.
+        """
+        self._emit(header)
+        self._indent(block)
+        self._emit('{} = {}'.format(result, compile_body(value)))
+        self._dedent(block)
+
+    # mappings
+
+    def mapping(self, mapping, value):
+        if isinstance(mapping, list):
+            return self._temp('[{}]'.format(
+                ', '.join([self.mapping(v, value) for v in mapping])))
+        elif isinstance(mapping, dict):
+            if self._too_deep():
+                return self._spill(lambda src: self.mapping(mapping, src),
+                                   value)
+            return self._dict(mapping, value)
+        elif isinstance(mapping, Bender):
+            return self.bender(mapping, value, ROOT)
+        else:
+            return self._const(mapping)
+
+    def _dict(self, mapping, value):
+        result = self._temp('{}')
+        for k, v in iteritems(mapping):
+            prefix = 'Error for key {}: '.format(k)
+            self._emit('try:')
+            self._indent(block=True)
+            self._emit('{}[{}] = {}'.format(result, self._const(k),
+                                            self.mapping(v, value)))
+            self._dedent(block=True)
+            self._emit('except Exception as e:')
+            self._indent()
+            self._emit('raise BendingException({} + str(e))'
+                       .format(self._const(prefix)))
+            self._dedent()
+        return result
+
+    # benders
+
+    def bender(self, bender, value, at=None):
+        method = self._dispatch.get(type(bender))
+        if method is None:
+            return self._fallback(bender, value)
+        if self._too_deep():
+            return self._spill(lambda src: self.bender(bender, src, at),
+                               value)
+        path = selector_path(bender)
+        full_path = join(at, path)
+        if self._is_shared(full_path):
+            from_context, keys = path
+            result = self._path(full_path)
+            # select again to raise the original error
+            self._branch('if {} is _FAILED:'.format(result),
+                         lambda v: self._temp(self._subscripts(
+                             'ctx' if from_context else v, untag(keys))),
+                         value, result)
+            return result
+        return method(self, bender, value, at)
+
+    def _is_shared(self, path):
+        return path is not None and (
+            path in self._slots or
+            longest_shared_prefix(path, self._slots) is not None)
+
+    def _path(self, path):
+        """
+        Emit the statements resolving the canonical `path` from the scope's
+        source (kept in memo[0]) or the context, starting from its longest
+        shared prefix. Failed lookups result in `_FAILED`.
+        Shared paths are kept in the memo once resolved.
+        """
+        slot = self._slots.get(path)
+        if slot is None:
+            return self._compute_path(path)
+        result = self._temp('memo[{}]'.format(slot))
+        self._emit('if {} is _MISSING:'.format(result))
+        self._indent()
+        self._emit('{} = memo[{}] = {}'.format(result, slot,
+                                               self._compute_path(path)))
+        self._dedent()
+        return result
+
+    def _compute_path(self, path):
+        prefix = longest_shared_prefix(path, self._slots)
+        result = self._name('t')
+        if prefix is None:
+            base = 'ctx' if path[:1] == CONTEXT_ROOT else 'memo[0]'
+            return self._probe_path(base, untag(path[1:]))
+        base = self._path(prefix)
+        keys = untag(path[len(prefix):])
+        self._branch('if {} is _FAILED:'.format(base),
+                     lambda v: '_FAILED', None, result)
+        self._branch('else:', lambda v: self._probe_path(base, keys), None,
+                     result)
+        return result
+
+    def _probe_path(self, value, path):
+        """
+        Emit the statements selecting `path` from `value` without raising,
+        and return the name holding the result (`_FAILED` if a key is
+        missing). Dicts are probed inline.
+        """
+        result = self._name('t')
+        if not path:
+            self._emit('{} = {}'.format(result, value))
+        else:
+            value = self._operand(value)
+        for i, key in enumerate(path):
+            line = ('{r} = {v}.get({k}, _FAILED) if type({v}) is dict '
+                    'else _probe_path({v}, ({k},))'
+                    .format(r=result, v=value if i == 0 else result,
+                            k=self._const(key)))
+            self._emit(line if i == 0
+                       else 'if {} is not _FAILED: {}'.format(result, line))
+        return result
+
+    def _probe(self, bender, value, at):
+        """
+        If `bender` is a selector chain, emit the statements probing it
+        without raising, and return the name holding the result (`_FAILED`
+        if a key is missing). Otherwise return None.
+        """
+        path = selector_path(bender)
+        full_path = join(at, path)
+        if path is None:
+            return None
+        elif self._is_shared(full_path):
+            return self._path(full_path)
+        from_context, keys = path
+        return self._probe_path('ctx' if from_context else value,
+                                untag(keys))
+
+    def _fallback(self, bender, value):
+        return self._temp('{}._eval({}, ctx)'
+                          .format(self._bind(bender, '_b'), value))
+
+    def _children(self, bender, value, at):
+        return [self.bender(b, value, at)
+                for b in same_input_children(bender)]
+
+    def _subscripts(self, value, path):
+        return self._operand(value) + ''.join('[{}]'.format(self._const(k)) for k in path)
+
+    def _k(self, bender, value, at):
+        return self._const(bender._val)
+
+    def _s(self, bender, value, at):
+        return self._temp(self._subscripts(value, bender._path))
+
+    def _optional_s(self, bender, value, at):
+        full_path = join(at, optional_path(bender))
+        default = lambda v: self._const(bender.default)
+        if self._is_shared(full_path):
+            result = self._path(full_path)
+            self._branch('if {} is _FAILED:'.format(result), default,
+                         value, result)
+            return result
+        result = self._probe_path(value, bender._path)
+        self._branch('if {} is _FAILED:'.format(result), default, value,
+                     result)
+        return result
+
+    def _call_f(self, bender, value):
+        args = [value]
+        if bender._args:
+            args.append('*' + self._bind(bender._args, '_a'))
+        if bender._kwargs:
+            args.append('**' + self._bind(bender._kwargs, '_kw'))
+        return '{}({})'.format(self._bind(bender._func, '_f'),
+                               ', '.join(args))
+
+    def _f(self, bender, value, at):
+        return self._temp(self._call_f(bender, value))
+
+    def _protected_f(self, bender, value, at):
+        result = self._name('t')
+        self._branch('if {} == {}:'.format(
+                         value, self._const(bender._protect_against)),
+                     lambda v: v, value, result)
+        self._branch('else:', lambda v: self._call_f(bender, v),
+                     value, result)
+        return result
+
+    def _getitem(self, bender, value, at):
+        return self._temp(self._subscripts(value, [bender._index]))
+
+    def _compose(self, bender, value, at):
+        first = self.bender(bender._first, value, at)
+        return self.bender(bender._second, first,
+                           join(at, selector_path(bender._first)))
+
+    def _context(self, bender, value, at):
+        return 'ctx'
+
+    def _unary(template):
+        def generate_unary(self, bender, value, at):
+            return self._temp(template.format(
+                *self._children(bender, value, at)))
+        return generate_unary
+
+    def _binary(template):
+        def generate_binary(self, bender, value, at):
+            return self._temp(template.format(
+                *self._children(bender, value, at)))
+        return generate_binary
+
+    def _short_circuit(test):
+        def generate_short_circuit(self, bender, value, at):
+            # a single pass loop, so that the operands after the one deciding
+            # the result are skipped with a break, without nesting blocks
+            result = self._name('t')
+            self._emit('while True:')
+            self._indent(block=True)
+            for operand in bender.benders[:-1]:
+                self._emit('{} = {}'.format(result,
+                                            self.bender(operand, value, at)))
+                self._emit(test.format(result))
+                self._indent()
+                self._emit('break')
+                self._dedent()
+            self._emit('{} = {}'.format(
+                result, self.bender(bender.benders[-1], value, at)))
+            self._emit('break')
+            self._dedent(block=True)
+            return result
+        return generate_short_circuit
+
+    def _if(self, bender, value, at):
+        chain = if_chain(bender)
+        if chain is not None:
+            return self._if_chain(chain, value, at)
+        result = self._name('t')
+        condition = self.bender(bender.condition, value, at)
+        self._branch('if {}:'.format(condition),
+                     lambda v: self.bender(bender.when_true, v, at),
+                     value, result)
+        self._branch('else:',
+                     lambda v: self.bender(bender.when_false, v, at),
+                     value, result)
+        return result
+
+    def _if_chain(self, chain, value, at):
+        selector, cases, default = chain
+        branches = [b for _, b in cases] + [default]
+        constant = all(type(b) is K for b in branches)
+        if constant:
+            # e.g. translating enums, so the results are selected directly
+            results = [b._val for b in branches]
+        else:
+            # the cases are compiled into functions, as in Switch
+            results = [None] * len(branches)
+            for i, branch in enumerate(branches):
+                self.late_bindings.append((results, i, self.function(
+                    lambda src: self.bender(branch, src, at))))
+        # map each literal to the index of the first case testing it
+        table = {}
+        for i, (literal, _) in enumerate(cases):
+            table.setdefault(literal, i)
+        key = self.bender(selector, value, at)
+        index = self._name('t')
+        self._emit('try:')
+        self._indent(block=True)
+        self._emit('{} = {}.get({}, {})'.format(
+            index, self._bind(table, '_table'), key, len(cases)))
+        self._dedent(block=True)
+        # unhashable keys are compared one by one
+        self._emit('except TypeError:')
+        self._indent()
+        self._emit('{} = {}'.format(index, len(cases)))
+        position, literal = self._name('t'), self._name('t')
+        self._emit('for {}, {} in enumerate({}):'.format(
+            position, literal, self._bind([l for l, _ in cases])))
+        self._indent(block=True)
+        self._emit('if {} == {}:'.format(key, literal))
+        self._indent(block=True)
+        self._emit('{} = {}'.format(index, position))
+        self._emit('break')
+        self._dedent(block=True)
+        self._dedent(block=True)
+        self._dedent()
+        selected = '{}[{}]'.format(self._bind(results, '_results'), index)
+        if constant:
+            return self._temp(selected)
+        return self._temp('{}({}, ctx, memo)'.format(selected, value))
+
+    def _alternation(self, bender, value, at):
+        if not bender.benders:
+            self._emit('raise ValueError()')
+            return 'None'
+        result = self._temp('_MISSING')
+        for i, alternative in enumerate(bender.benders[:-1]):
+            if i:
+                self._emit('if {} is _MISSING:'.format(result))
+                self._indent()
+            probed = self._probe(alternative, value, at)
+            if probed is not None:
+                self._branch('if {} is not _FAILED:'.format(probed),
+                             lambda v: probed, value, result)
+            else:
+                self._branch('try:',
+                             lambda v: self.bender(alternative, v, at),
+                             value, result, block=True)
+                self._emit('except LookupError:')
+                self._indent()
+                self._emit('pass')
+                self._dedent()
+            if i:
+                self._dedent()
+        self._branch('if {} is _MISSING:'.format(result),
+                     lambda v: self.bender(bender.benders[-1], v, at),
+                     value, result)
+        return result
+
+    def _switch(self, bender, value, at):
+        if not isinstance(bender.cases, dict):
+            return self._fallback(bender, value)
+        cases = {}
+        for k, case in iteritems(bender.cases):
+            self.late_bindings.append((cases, k, self.function(
+                lambda src: self.bender(case, src, at))))
+        key = self.bender(bender.key_bender, value, at)
+        func = self._name('t')
+        cases_name = self._bind(cases, '_cases')
+        self._emit('try:')
+        self._indent(block=True)
+        self._emit('{} = {}[{}]'.format(func, cases_name, key))
+        self._dedent(block=True)
+        self._emit('except LookupError:')
+        self._indent()
+        if bender.default:
+            self._emit('{} = {}'.format(func, self.function(
+                lambda src: self.bender(bender.default, src, at))))
+        else:
+            self._emit('raise')
+        self._dedent()
+        return self._temp('{}({}, ctx, memo)'.format(func, value))
+
+    def _format_args(self, bender, value, at):
+        args = [self.bender(b, value, at)
+                for b in bender._positional_benders]
+        kwargs = [(k, self.bender(b, value, at))
+                  for k, b in iteritems(bender._named_benders)]
+        return args, kwargs
+
+    def _format_call(self, bender, args, kwargs):
+        params = list(args)
+        if kwargs:
+            params.append('**{{{}}}'.format(', '.join(
+                '{}: {}'.format(self._const(k), v) for k, v in kwargs)))
+        return '{}.format({})'.format(self._const(bender._format_str),
+                                      ', '.join(params))
+
+    def _format(self, bender, value, at):
+        args, kwargs = self._format_args(bender, value, at)
+        return self._temp(self._format_call(bender, args, kwargs))
+
+    def _protected_format(self, bender, value, at):
+        args, kwargs = self._format_args(bender, value, at)
+        benders = (list(bender._positional_benders) +
+                   list(bender._named_benders.values()))
+        # constants are checked now, so that no `is` comparison with a
+        # literal is generated
+        if any(type(b) is K and b._val is None for b in benders):
+            return self._const(None)
+        checks = [v for b, v in zip(benders, args + [v for _, v in kwargs])
+                  if type(b) is not K]
+        if not checks:
+            return self._temp(self._format_call(bender, args, kwargs))
+        result = self._name('t')
+        self._branch('if {}:'.format(' or '.join(v + ' is None'
+                                                 for v in checks)),
+                     lambda v: 'None', value, result)
+        self._branch('else:',
+                     lambda v: self._format_call(bender, args, kwargs),
+                     value, result)
+        return result
+
+    def _forall_bend(self, bender, value, at):
+        func = self.scope(bender._mapping)
+        context = self._bind(bender._context) if bender._context else 'ctx'
+        return self._temp('[{}(item, {}) for item in {}]'
+                          .format(func, context, value))
+
+    _dispatch = {
+        K: _k,
+        S: _s,
+        OptionalS: _optional_s,
+        F: _f,
+        ProtectedF: _protected_f,
+        GetItem: _getitem,
+        Compose: _compose,
+        Context: _context,
+        Neg: _unary('-{}'),
+        Invert: _unary('not {}'),
+        Add: _binary('{} + {}'),
+        Sub: _binary('{} - {}'),
+        Mul: _binary('{} * {}'),
+        Div: _binary('float({}) / float({})'),
+        Eq: _binary('{} == {}'),
+        Ne: _binary('{} != {}'),
+        And: _short_circuit('if not {}:'),
+        Or: _short_circuit('if {}:'),
+        If: _if,
+        Alternation: _alternation,
+        Switch: _switch,
+        Format: _format,
+        ProtectedFormat: _protected_format,
+        ForallBend: _forall_bend,
+    }
+    del _unary, _binary, _short_circuit
+
+
+# the memo value of a shared selector that wasn't evaluated yet
+_MISSING = _Sentinel('missing')
+# the memo value of a shared selector whose lookup failed
+_FAILED = _NOT_FOUND
@@ -0,0 +1,489 @@
+import operator
+
+from jsonbender._analysis import (CONTEXT_ROOT, ROOT, if_chain, join,
+                                  longest_shared_prefix, optional_path,
+                                  same_input_children, selector_path,
+                                  shared_paths, untag)
+from jsonbender._compat import iteritems
+from jsonbender.codegen import _FAILED, _MISSING, generate
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import (Add, And, Bender, BendingException, Compose,
+                             Context, Div, Eq, GetItem, Invert, Mul, Ne, Neg,
+                             Or, Sub, _probe_path)
+from jsonbender.list_ops import ForallBend
+from jsonbender.selectors import F, K, OptionalS, ProtectedF, S
+from jsonbender.string_ops import Format, ProtectedFormat
+
+
+class Plan(object):
+    """
+    A mapping compiled by `compile()`.
+
+    Calling a plan is equivalent to calling `bend()` with the original
+    mapping: it returns the same result and raises the same errors, but the
+    mapping is analysed only once, when the plan is built.
+    For plans built by the 'codegen' backend, `source` holds the generated
+    Python source (it's None otherwise).
+
+    Example:
+    ```
+    plan = compile({'name': S('first') + K(' ') + S('last')})
+    plan({'first': 'Alan', 'last': 'Turing'})  # -> {'name': 'Alan Turing'}
+    ```
+    """
+
+    def __init__(self, mapping, run, backend, source=None):
+        self.mapping = mapping
+        self.backend = backend
+        self.source = source
+        self._run = run
+
+    def __call__(self, source, context=None):
+        context = {} if context is None else context
+        return self._run(source, context)
+
+    def __reduce__(self):
+        # the compiled functions can't be pickled, so rebuild them instead
+        return (compile, (self.mapping, self.backend))
+
+
+def compile(mapping, backend='closure'):
+    """
+    Analyse `mapping` once and return a reusable `Plan`.
+
+    mapping: the map of benders, as passed to `bend()`.
+    backend: optional. how the plan is built:
+             - 'closure' (the default) translates built-in benders into plain
+               closures, so applying the plan skips the per-record type
+               checks and method dispatch done by `bend()`.
+             - 'codegen' generates the source of a single Python function
+               for the whole mapping (e.g. `S('a', 0)` becomes
+               `src['a'][0]`). The source is available as `plan.source`.
+
+    Selector paths that appear more than once in the mapping, either on
+    their own or as a common prefix (e.g. `S('data', 'attributes', 'x')` and
+    `S('data', 'attributes', 'y')`), are evaluated only once per source, and
+    the result is reused.
+    Benders the compiler doesn't know about (e.g. custom subclasses) are
+    called as usual.
+    If `mapping` already is a `Plan`, it is returned unchanged.
+    """
+    if isinstance(mapping, Plan):
+        return mapping
+    if backend == 'closure':
+        return Plan(mapping, _Compiler().scope(mapping), backend)
+    elif backend == 'codegen':
+        run, source = generate(mapping)
+        return Plan(mapping, run, backend, source)
+    else:
+        raise ValueError('Unknown backend: {!r}'.format(backend))
+
+
+class _Compiler(object):
+    """
+    Translates mappings and benders into functions taking the value being
+    bent, the context and the memo of the current scope.
+
+    The memo is a list holding the source of the current scope followed by
+    the values of the selector paths shared in it (see
+    `_analysis.shared_paths()`), filled on first use.
+    `at` is the canonical path of the value a bender is applied to, or None
+    if it isn't a selection from the scope's source.
+    """
+
+    def scope(self, mapping):
+        """
+        Compile `mapping` in a new scope, returning a function that takes
+        the value being bent and the context.
+        """
+        outer, self._slots = getattr(self, '_slots', None), \
+            shared_paths(mapping)
+        try:
+            run = self.mapping(mapping)
+        finally:
+            slots, self._slots = self._slots, outer
+        if not slots:
+            return lambda value, context: run(value, context, None)
+        size = len(slots) + 1
+
+        def run_scope(value, context):
+            memo = [_MISSING] * size
+            memo[0] = value
+            return run(value, context, memo)
+        return run_scope
+
+    def mapping(self, mapping):
+        if isinstance(mapping, list):
+            return self._list(mapping)
+        elif isinstance(mapping, dict):
+            return self._dict(mapping)
+        elif isinstance(mapping, Bender):
+            return self.bender(mapping, ROOT)
+        else:
+            return self._constant(mapping)
+
+    def bender(self, bender, at=None):
+        method = self._dispatch.get(type(bender))
+        if method is None:
+            return self._fallback(bender)
+        path = selector_path(bender)
+        full_path = join(at, path)
+        if self._is_shared(full_path):
+            resolve = self._path(full_path)
+            from_context, keys = path
+            walk = self._walk(untag(keys), from_context)
+
+            def run_shared(value, context, memo):
+                result = resolve(value, context, memo)
+                if result is _FAILED:
+                    # select again to raise the original error
+                    return walk(value, context, memo)
+                return result
+            return run_shared
+        return method(self, bender, at)
+
+    def _is_shared(self, path):
+        return path is not None and (
+            path in self._slots or
+            longest_shared_prefix(path, self._slots) is not None)
+
+    def _path(self, path):
+        """
+        Return a function that resolves the canonical `path` from the scope's
+        source (kept in memo[0]) or the context, starting from its longest
+        shared prefix. Failed lookups result in `_FAILED`.
+        Shared paths are kept in the memo once resolved.
+        """
+        prefix = longest_shared_prefix(path, self._slots)
+        if prefix is None:
+            base = None
+            from_context = path[:1] == CONTEXT_ROOT
+            keys = untag(path[1:])
+        else:
+            base = self._path(prefix)
+            keys = untag(path[len(prefix):])
+
+        def compute(value, context, memo):
+            if base is None:
+                current = context if from_context else memo[0]
+            else:
+                current = base(value, context, memo)
+                if current is _FAILED:
+                    return _FAILED
+            return _probe_path(current, keys)
+
+        slot = self._slots.get(path)
+        if slot is None:
+            return compute
+
+        def resolve(value, context, memo):
+            result = memo[slot]
+            if result is _MISSING:
+                result = memo[slot] = compute(value, context, memo)
+            return result
+        return resolve
+
+    def _probe(self, bender, at):
+        """
+        If `bender` is a selector chain, return a function that probes it
+        without raising, returning `_FAILED` if a key is missing.
+        Otherwise return None.
+        """
+        path = selector_path(bender)
+        full_path = join(at, path)
+        if path is None:
+            return None
+        elif self._is_shared(full_path):
+            return self._path(full_path)
+        from_context, keys = path
+        keys = untag(keys)
+        if from_context:
+            return lambda value, context, memo: _probe_path(context, keys)
+        return lambda value, context, memo: _probe_path(value, keys)
+
+    def _walk(self, keys, from_context=False):
+        if from_context:
+            walk = self._walk(keys)
+            return lambda value, context, memo: walk(context, context, memo)
+        if len(keys) == 1:
+            key = keys[0]
+            return lambda value, context, memo: value[key]
+
+        def run_walk(value, context, memo):
+            for key in keys:
+                value = value[key]
+            return value
+        return run_walk
+
+    def _list(self, mapping):
+        funcs = [self.mapping(v) for v in mapping]
+
+        def run_list(value, context, memo):
+            return [func(value, context, memo) for func in funcs]
+        return run_list
+
+    def _dict(self, mapping):
+        items = [(k, self.mapping(v)) for k, v in iteritems(mapping)]
+
+        def run_dict(value, context, memo):
+            res = {}
+            for k, func in items:
+                try:
+                    res[k] = func(value, context, memo)
+                except Exception as e:
+                    m = 'Error for key {}: {}'.format(k, str(e))
+                    raise BendingException(m)
+            return res
+        return run_dict
+
+    def _constant(self, constant):
+        return lambda value, context, memo: constant
+
+    def _fallback(self, bender):
+        return lambda value, context, memo: bender._eval(value, context)
+
+    def _children(self, bender, at):
+        return [self.bender(b, at) for b in same_input_children(bender)]
+
+    def _k(self, bender, at):
+        return self._constant(bender._val)
+
+    def _s(self, bender, at):
+        return self._walk(bender._path)
+
+    def _optional_s(self, bender, at):
+        default = bender.default
+        full_path = join(at, optional_path(bender))
+        if self._is_shared(full_path):
+            resolve = self._path(full_path)
+
+            def run_shared_optional_s(value, context, memo):
+                result = resolve(value, context, memo)
+                return default if result is _FAILED else result
+            return run_shared_optional_s
+
+        path = bender._path
+
+        def run_optional_s(value, context, memo):
+            for key in path:
+                # probe dicts inline, saving a call
+                if type(value) is dict:
+                    value = value.get(key, _FAILED)
+                else:
+                    value = _probe_path(value, (key,))
+                if value is _FAILED:
+                    return default
+            return value
+        return run_optional_s
+
+    def _f(self, bender, at):
+        func, args, kwargs = bender._func, bender._args, bender._kwargs
+        if not args and not kwargs:
+            return lambda value, context, memo: func(value)
+        return lambda value, context, memo: func(value, *args, **kwargs)
+
+    def _protected_f(self, bender, at):
+        run_f = self._f(bender, at)
+        protect_against = bender._protect_against
+
+        def run_protected_f(value, context, memo):
+            if value == protect_against:
+                return value
+            return run_f(value, context, memo)
+        return run_protected_f
+
+    def _getitem(self, bender, at):
+        index = bender._index
+        return lambda value, context, memo: value[index]
+
+    def _compose(self, bender, at):
+        first = self.bender(bender._first, at)
+        second = self.bender(bender._second,
+                             join(at, selector_path(bender._first)))
+
+        def run_compose(value, context, memo):
+            return second(first(value, context, memo), context, memo)
+        return run_compose
+
+    def _context(self, bender, at):
+        return lambda value, context, memo: context
+
+    def _unary(op):
+        def compile_unary(self, bender, at):
+            operand, = self._children(bender, at)
+            return lambda value, context, memo: op(operand(value, context,
+                                                           memo))
+        return compile_unary
+
+    def _binary(op):
+        def compile_binary(self, bender, at):
+            left, right = self._children(bender, at)
+            return lambda value, context, memo: op(left(value, context, memo),
+                                                   right(value, context, memo))
+        return compile_binary
+
+    def _and(self, bender, at):
+        funcs = self._children(bender, at)
+
+        def run_and(value, context, memo):
+            for func in funcs:
+                result = func(value, context, memo)
+                if not result:
+                    break
+            return result
+        return run_and
+
+    def _or(self, bender, at):
+        funcs = self._children(bender, at)
+
+        def run_or(value, context, memo):
+            for func in funcs:
+                result = func(value, context, memo)
+                if result:
+                    break
+            return result
+        return run_or
+
+    def _if(self, bender, at):
+        chain = if_chain(bender)
+        if chain is not None:
+            return self._if_chain(chain, at)
+        condition, when_true, when_false = self._children(bender, at)
+
+        def run_if(value, context, memo):
+            if condition(value, context, memo):
+                return when_true(value, context, memo)
+            return when_false(value, context, memo)
+        return run_if
+
+    def _if_chain(self, chain, at):
+        selector, cases, default = chain
+        key_func = self.bender(selector, at)
+        cases = [(literal, self.bender(b, at)) for literal, b in cases]
+        default = self.bender(default, at)
+        table = {}
+        for literal, func in cases:
+            # the first equal literal is the one tested first
+            table.setdefault(literal, func)
+
+        def run_if_chain(value, context, memo):
+            key = key_func(value, context, memo)
+            try:
+                func = table.get(key, default)
+            except TypeError:  # unhashable, so compare one by one
+                func = default
+                for literal, case in cases:
+                    if key == literal:
+                        func = case
+                        break
+            return func(value, context, memo)
+        return run_if_chain
+
+    def _alternation(self, bender, at):
+        alternatives = [(self._probe(b, at), self.bender(b, at))
+                        for b in bender.benders]
+
+        def run_alternation(value, context, memo):
+            exc, missed = ValueError(), None
+            for probe, func in alternatives:
+                if probe is None:
+                    try:
+                        return func(value, context, memo)
+                    except LookupError as e:
+                        exc, missed = e, None
+                else:
+                    result = probe(value, context, memo)
+                    if result is not _FAILED:
+                        return result
+                    missed = func
+            if missed is not None:
+                # the missing keys were probed, so bend again to raise
+                missed(value, context, memo)
+            raise exc
+        return run_alternation
+
+    def _switch(self, bender, at):
+        if not isinstance(bender.cases, dict):
+            return self._fallback(bender)
+        key_func = self.bender(bender.key_bender, at)
+        cases = {k: self.bender(b, at) for k, b in iteritems(bender.cases)}
+        default = self.bender(bender.default, at) if bender.default else None
+
+        def run_switch(value, context, memo):
+            key = key_func(value, context, memo)
+            try:
+                func = cases[key]
+            except LookupError:
+                if default is None:
+                    raise
+                func = default
+            return func(value, context, memo)
+        return run_switch
+
+    def _format_args(self, bender, at):
+        args = [self.bender(b, at) for b in bender._positional_benders]
+        kwargs = [(k, self.bender(b, at))
+                  for k, b in iteritems(bender._named_benders)]
+        return args, kwargs
+
+    def _format(self, bender, at):
+        format_string = bender._format_str
+        args, kwargs = self._format_args(bender, at)
+
+        def run_format(value, context, memo):
+            return format_string.format(
+                *[func(value, context, memo) for func in args],
+                **{k: func(value, context, memo) for k, func in kwargs})
+        return run_format
+
+    def _protected_format(self, bender, at):
+        format_string = bender._format_str
+        args, kwargs = self._format_args(bender, at)
+
+        def run_protected_format(value, context, memo):
+            arg_values = [func(value, context, memo) for func in args]
+            kwarg_values = {k: func(value, context, memo)
+                            for k, func in kwargs}
+            if (any(v is None for v in arg_values) or
+                    any(v is None for v in kwarg_values.values())):
+                return None
+            return format_string.format(*arg_values, **kwarg_values)
+        return run_protected_format
+
+    def _forall_bend(self, bender, at):
+        run_mapping = self.scope(bender._mapping)
+        own_context = bender._context
+
+        def run_forall_bend(value, context, memo):
+            context = own_context or context
+            context = {} if context is None else context
+            return [run_mapping(v, context) for v in value]
+        return run_forall_bend
+
+    _dispatch = {
+        K: _k,
+        S: _s,
+        OptionalS: _optional_s,
+        F: _f,
+        ProtectedF: _protected_f,
+        GetItem: _getitem,
+        Compose: _compose,
+        Context: _context,
+        Neg: _unary(operator.neg),
+        Invert: _unary(operator.not_),
+        Add: _binary(operator.add),
+        Sub: _binary(operator.sub),
+        Mul: _binary(operator.mul),
+        Div: _binary(lambda v1, v2: float(v1) / float(v2)),
+        Eq: _binary(operator.eq),
+        Ne: _binary(operator.ne),
+        And: _and,
+        Or: _or,
+        If: _if,
+        Alternation: _alternation,
+        Switch: _switch,
+        Format: _format,
+        ProtectedFormat: _protected_format,
+        ForallBend: _forall_bend,
+    }
+    del _unary, _binary
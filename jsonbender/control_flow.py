@@ -1,4 +1,4 @@
-from jsonbender.core import Bender
+from jsonbender.core import Bender, _NOT_FOUND
 from jsonbender.selectors import K
 
 
@@ -26,10 +26,10 @@ class If(Bender):
         self.when_true = when_true
         self.when_false = when_false
 
-    def execute(self, val):
-        return (self.when_true(val)
-                if self.condition(val)
-                else self.when_false(val))
+    def _eval(self, value, context):
+        if self.condition._eval(value, context):
+            return self.when_true._eval(value, context)
+        return self.when_false._eval(value, context)
 
 
 class Alternation(Bender):
@@ -52,17 +52,21 @@ class Alternation(Bender):
     def __init__(self, *benders):
         self.benders = benders
 
-    def execute(self, source):
-        exc = ValueError()
+    def _eval(self, value, context):
+        exc, missed = ValueError(), None
         for bender in self.benders:
             try:
-                result = bender(source)
+                result = bender._probe(value, context)
             except LookupError as e:
-                exc = e
+                exc, missed = e, None
             else:
-                return result
-        else:
-            raise exc
+                if result is not _NOT_FOUND:
+                    return result
+                missed = bender
+        if missed is not None:
+            # the missing keys were probed, so bend again to raise the error
+            missed._eval(value, context)
+        raise exc
 
 
 class Switch(Bender):
@@ -94,8 +98,8 @@ class Switch(Bender):
         self.cases = cases
         self.default = default
 
-    def execute(self, source):
-        key = self.key_bender(source)
+    def _eval(self, value, context):
+        key = self.key_bender._eval(value, context)
         try:
             bender = self.cases[key]
         except LookupError:
@@ -104,5 +108,5 @@ class Switch(Bender):
             else:
                 raise
 
-        return bender(source)
+        return bender._eval(value, context)
 
@@ -1,6 +1,86 @@
 from jsonbender._compat import iteritems
 
 
+def _resolve(cls):
+    """
+    Keep the ways of executing a bender consistent in `cls` and its bases.
+
+    Benders call each other with the internal `_eval(value, context)` method,
+    which doesn't wrap values in a `Transport`. Built-in benders implement
+    `_eval()`, and get a matching `raw_execute()` (and `execute()`).
+    Subclasses that override `raw_execute()` or `execute()` instead get an
+    `_eval()` that calls it, so they keep working unchanged.
+
+    It's done once per class, when it's first instantiated, rather than by a
+    metaclass, so that subclasses can still use their own metaclass.
+    """
+    for klass in reversed(cls.__mro__):
+        if (issubclass(klass, Bender) and
+                '_Bender__resolved' not in vars(klass)):
+            _resolve_class(klass)
+
+
+def _resolve_class(cls):
+    defined = {name for name in ('execute', 'raw_execute', '_eval',
+                                 '_probe')
+               if name in vars(cls) and
+               not getattr(vars(cls)[name], '_generated', False)}
+    if '_eval' in defined:
+        eval_ = vars(cls)['_eval']
+        if 'raw_execute' not in defined:
+            cls.raw_execute = _generated(_raw_execute(eval_))
+        if 'execute' not in defined:
+            cls.execute = _generated(_execute(eval_))
+    elif 'raw_execute' in defined:
+        cls._eval = _generated(_eval_raw_execute)
+    elif 'execute' in defined:
+        cls._eval = _generated(_eval_execute)
+        cls.raw_execute = _generated(_raw_execute_execute)
+    # an inherited _probe() would bypass the overridden methods
+    if '_probe' not in defined and defined:
+        cls._probe = _generated(_probe_eval)
+    cls._Bender__resolved = True
+
+
+def _generated(func):
+    func._generated = True
+    return func
+
+
+def _raw_execute(eval_):
+    # bound to the class' own _eval(), so that calling raw_execute() through
+    # super() from an overriding subclass doesn't recurse into it
+    def raw_execute(self, source):
+        transport = Transport.from_source(source)
+        return Transport(eval_(self, transport.value, transport.context),
+                         transport.context)
+    return raw_execute
+
+
+def _execute(eval_):
+    # bound to the class' own _eval(), as above
+    def execute(self, source):
+        return eval_(self, source, {})
+    return execute
+
+
+def _eval_raw_execute(self, value, context):
+    return self.raw_execute(Transport(value, context)).value
+
+
+def _eval_execute(self, value, context):
+    return self.execute(value)
+
+
+def _raw_execute_execute(self, source):
+    transport = Transport.from_source(source)
+    return Transport(self.execute(transport.value), transport.context)
+
+
+def _probe_eval(self, value, context):
+    return self._eval(value, context)
+
+
 class Bender(object):
 
     """
@@ -14,16 +94,35 @@ class Bender(object):
     Subclasses must implement __init__() and execute() methods.
     """
 
+    __resolved = True
+
+    def __new__(cls, *args, **kwargs):
+        if '_Bender__resolved' not in vars(cls):
+            _resolve(cls)
+        return super(Bender, cls).__new__(cls)
+
     def __init__(self, *args, **kwargs):
         pass
 
     def __call__(self, source):
-        return self.raw_execute(source).value
+        if isinstance(source, Transport):
+            return self._eval(source.value, source.context)
+        return self._eval(source, {})
 
     def raw_execute(self, source):
         transport = Transport.from_source(source)
         return Transport(self.execute(transport.value), transport.context)
 
+    def _eval(self, value, context):
+        return self.execute(value)
+
+    def _probe(self, value, context):
+        """
+        Like _eval(), but selectors return _NOT_FOUND instead of raising
+        LookupError for missing keys. Other benders may still raise it.
+        """
+        return self._eval(value, context)
+
     def execute(self, source):
         raise NotImplementedError()
 
@@ -64,10 +163,17 @@ class Bender(object):
         return Div(self, other)
 
     def __rshift__(self, other):
-        return Compose(self, other)
+        return compose(self, other)
 
     def __lshift__(self, other):
-        return Compose(other, self)
+        return compose(other, self)
+
+    def _fuse(self, other):
+        """
+        Return a single bender equivalent to `self >> other` that is cheaper
+        to execute, or None if they can't be fused.
+        """
+        return None
 
     def __getitem__(self, index):
         return self >> GetItem(index)
@@ -80,14 +186,41 @@ class GetItem(Bender):
     def execute(self, value):
         return value[self._index]
 
+    def _probe(self, value, context):
+        return _probe_path(value, (self._index,))
+
 
 class Compose(Bender):
     def __init__(self, first, second):
         self._first = first
         self._second = second
 
-    def raw_execute(self, source):
-        return self._second.raw_execute(self._first.raw_execute(source))
+    def _eval(self, value, context):
+        return self._second._eval(self._first._eval(value, context), context)
+
+    def _probe(self, value, context):
+        value = self._first._probe(value, context)
+        if value is _NOT_FOUND:
+            return _NOT_FOUND
+        return self._second._probe(value, context)
+
+    def _fuse(self, other):
+        fused = self._second._fuse(other)
+        if fused is None:
+            return None
+        return Compose(self._first, fused)
+
+
+def compose(first, second):
+    """
+    Return a bender that passes the value of `first` to `second`, fusing
+    them when possible (e.g. chains of list operations).
+    """
+    if isinstance(first, Bender):
+        fused = first._fuse(second)
+        if fused is not None:
+            return fused
+    return Compose(first, second)
 
 
 class UnaryOperator(Bender):
@@ -108,10 +241,8 @@ class UnaryOperator(Bender):
     def op(self, v):
         raise NotImplementedError()
 
-    def raw_execute(self, source):
-        source = Transport.from_source(source)
-        val = self.op(self.bender(source))
-        return Transport(val, source.context)
+    def _eval(self, value, context):
+        return self.op(self.bender._eval(value, context))
 
 
 class Neg(UnaryOperator):
@@ -143,11 +274,9 @@ class BinaryOperator(Bender):
     def op(self, v1, v2):
         raise NotImplementedError()
 
-    def raw_execute(self, source):
-        source = Transport.from_source(source)
-        val = self.op(self._bender1(source),
-                      self._bender2(source))
-        return Transport(val, source.context)
+    def _eval(self, value, context):
+        return self.op(self._bender1._eval(value, context),
+                       self._bender2._eval(value, context))
 
 
 class Add(BinaryOperator):
@@ -180,27 +309,105 @@ class Ne(BinaryOperator):
         return v1 != v2
 
 
-class And(BinaryOperator):
-    def op(self, v1, v2):
-        return v1 and v2
+class BooleanOperator(Bender):
+    """
+    Base class for short-circuiting boolean operators. Should not be directly
+    instantiated.
 
+    Whenever a boolean op is activated, its benders are activated in order
+    until the stop() method returns true for a value, which is the result
+    (like Python's `and` and `or`). Otherwise, the value of the last bender
+    is the result.
+    Operands of the same operator are flattened, so long chains such as
+    `a & b & c` are evaluated in a single loop.
+
+    Subclasses must implement the stop() method.
+    """
+
+    def __init__(self, *benders):
+        if not benders:
+            raise TypeError('At least one bender is required')
+        self.benders = []
+        for bender in benders:
+            if type(bender) is type(self):
+                self.benders.extend(bender.benders)
+            else:
+                self.benders.append(bender)
+
+    def stop(self, v):
+        raise NotImplementedError()
+
+    def _eval(self, value, context):
+        for bender in self.benders:
+            val = bender._eval(value, context)
+            if self.stop(val):
+                break
+        return val
+
+
+class And(BooleanOperator):
+    def stop(self, v):
+        return not v
 
-class Or(BinaryOperator):
-    def op(self, v1, v2):
-        return v1 or v2
+
+class Or(BooleanOperator):
+    def stop(self, v):
+        return bool(v)
 
 
 class Context(Bender):
-    def raw_execute(self, source):
-        transport = Transport.from_source(source)
-        return Transport(transport.context, transport.context)
+    def _eval(self, value, context):
+        return context
 
 
 class BendingException(Exception):
     pass
 
 
+class _Sentinel(object):
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return '<{}>'.format(self._name)
+
+
+# returned by _probe() when a key is missing
+_NOT_FOUND = _Sentinel('not found')
+
+
+def _probe_path(source, path):
+    """
+    Select the keys of `path` from `source`, like S, but return _NOT_FOUND
+    instead of raising LookupError when one of them is missing.
+    Lists, tuples and dicts are probed without raising.
+    """
+    for key in path:
+        kind = type(source)
+        if kind is dict:
+            source = source.get(key, _NOT_FOUND)
+            if source is _NOT_FOUND:
+                return _NOT_FOUND
+        elif (kind is list or kind is tuple) and type(key) is int:
+            if not -len(source) <= key < len(source):
+                return _NOT_FOUND
+            source = source[key]
+        else:
+            try:
+                source = source[key]
+            except LookupError:
+                return _NOT_FOUND
+    return source
+
+
+# Set by `jsonbender.metrics` while observers are registered: called instead
+# of `_bend()` by `bend()`, so that bendings cost a single check otherwise.
+_observe = None
+
+
 class Transport(object):
+    __slots__ = ('value', 'context')
+
     def __init__(self, value, context):
         self.value = value
         self.context = context
@@ -223,26 +430,27 @@ def bend(mapping, source, context=None):
     returns a new dict according to the provided map.
     """
     context = {} if context is None else context
-    transport = Transport(source, context)
-    return _bend(mapping, transport)
+    if _observe is not None:
+        return _observe(mapping, source, context)
+    return _bend(mapping, source, context)
 
 
-def _bend(mapping, transport):
+def _bend(mapping, source, context):
     if isinstance(mapping, list):
-        return [_bend(v, transport) for v in mapping]
+        return [_bend(v, source, context) for v in mapping]
 
     elif isinstance(mapping, dict):
         res = {}
         for k, v in iteritems(mapping):
             try:
-                res[k] = _bend(v, transport)
+                res[k] = _bend(v, source, context)
             except Exception as e:
                 m = 'Error for key {}: {}'.format(k, str(e))
                 raise BendingException(m)
         return res
 
     elif isinstance(mapping, Bender):
-        return mapping(transport)
+        return mapping._eval(source, context)
 
     else:
         return mapping
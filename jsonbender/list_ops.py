@@ -1,8 +1,12 @@
 from functools import reduce
 from itertools import chain
+from operator import itemgetter
 from warnings import warn
 
-from jsonbender.core import Bender, bend, Transport
+from jsonbender._compat import ifilter, imap
+from jsonbender._analysis import selector_path
+from jsonbender.core import Bender, _bend
+from jsonbender.selectors import K, S
 
 
 class ListOp(Bender):
@@ -32,12 +36,24 @@ class ListOp(Bender):
     def op(self, func, vals):
         raise NotImplementedError()
 
+    def lazy_op(self, func, vals):
+        """
+        Like op(), but return an iterator instead of building a list.
+        List operations implementing this are fused when composed.
+        """
+        raise NotImplementedError()
+
     def execute(self, source):
         # TODO: this is here for compatibility reasons
         if self._bender:
             source = self._bender(source)
         return self.op(self._func, source)
 
+    def _fuse(self, other):
+        if _is_lazy(self) and _can_follow(other):
+            return FusedListOp(self, other)
+        return None
+
 
 class Forall(ListOp):
     """
@@ -54,6 +70,9 @@ class Forall(ListOp):
     def op(self, func, vals):
         return list(map(func, vals))
 
+    def lazy_op(self, func, vals):
+        return imap(func, vals)
+
     @classmethod
     def bend(cls, mapping, context=None):
         """
@@ -93,12 +112,12 @@ class ForallBend(Forall):
         # remove this when ListOp also breaks retrocompatibility
         self._bender = None
 
-    def raw_execute(self, source):
-        transport = Transport.from_source(source)
-        context = self._context or transport.context
-        # ListOp.execute assumes the func is saved on self._func
-        self._func = lambda v: bend(self._mapping, v, context)
-        return Transport(self.execute(transport.value), transport.context)
+    def _eval(self, value, context):
+        context = self._context or context
+        mapping = self._mapping
+        # nothing is stored on self, so a single instance can be shared
+        # between threads
+        return self.op(lambda v: _bend(mapping, v, context), value)
 
 
 class Reduce(ListOp):
@@ -138,6 +157,9 @@ class Filter(ListOp):
     def op(self, func, vals):
         return list(filter(func, vals))
 
+    def lazy_op(self, func, vals):
+        return ifilter(func, vals)
+
 
 class FlatForall(ListOp):
     """
@@ -154,3 +176,414 @@ class FlatForall(ListOp):
     """
     def op(self, func, vals):
         return list(chain.from_iterable(map(func, vals)))
+
+    def lazy_op(self, func, vals):
+        return chain.from_iterable(imap(func, vals))
+
+
+class Aggregation(Bender):
+    """
+    Base class for aggregations of lists into a single value.
+    Subclasses must implement the aggregate() method, which takes a list of
+    values and should return the desired result, preferably with a builtin
+    like sum() or max() running in C.
+
+    select: optional. a bender or function selecting the value to aggregate
+            from each element of the list, e.g. `S('price')`. A selector of
+            a single key is applied with `operator.itemgetter`.
+    """
+    def __init__(self, select=None):
+        self._select = select
+        self._getter = _getter(select)
+
+    def aggregate(self, values):
+        raise NotImplementedError()
+
+    def _eval(self, value, context):
+        return self.aggregate(self._values(value, context))
+
+    def _values(self, vals, context):
+        if self._getter is not None:
+            return list(map(self._getter, vals))
+        elif self._select is not None:
+            select = self._select
+            return [select._eval(v, context) for v in vals]
+        return vals if isinstance(vals, list) else list(vals)
+
+    def _values_id(self):
+        """
+        Return a key identifying the values aggregated from a list, so that
+        aggregations of the same values can share them.
+        """
+        if type(self._select) is S:
+            path = self._select._path
+            try:
+                hash(path)
+            except TypeError:  # e.g. slices before Python 3.12
+                pass
+            else:
+                return path
+        return id(self._select)
+
+
+class Sum(Aggregation):
+    """
+    Sum the values of a list with the builtin sum().
+
+    Example:
+    ```
+    Sum()([1, 4, 6])  # -> 11
+    Sum(S('price'))([{'price': 2}, {'price': 3}])  # -> 5
+    ```
+    """
+    def aggregate(self, values):
+        return sum(values)
+
+
+class Count(Aggregation):
+    """
+    Count the elements of a list.
+
+    Example:
+    ```
+    Count()(['a', 'b'])  # -> 2
+    ```
+    """
+    def __init__(self):
+        super(Count, self).__init__()
+
+    def aggregate(self, values):
+        return len(values)
+
+
+class Min(Aggregation):
+    """
+    Return the smallest value of a nonempty list, with the builtin min().
+
+    Example:
+    ```
+    Min(S('price'))([{'price': 2}, {'price': 3}])  # -> 2
+    ```
+    """
+    def aggregate(self, values):
+        return min(values)
+
+
+class Max(Aggregation):
+    """
+    Return the largest value of a nonempty list, with the builtin max().
+
+    Example:
+    ```
+    Max(S('price'))([{'price': 2}, {'price': 3}])  # -> 3
+    ```
+    """
+    def aggregate(self, values):
+        return max(values)
+
+
+class Mean(Aggregation):
+    """
+    Return the arithmetic mean of the values of a nonempty list, as a float.
+
+    Example:
+    ```
+    Mean()([1, 2, 6])  # -> 3.0
+    ```
+    """
+    def aggregate(self, values):
+        if not values:
+            raise ValueError('Mean of an empty list')
+        return sum(values) / float(len(values))
+
+
+class Aggregate(Bender):
+    """
+    Compute several aggregations of a list at once, returning a dict with
+    their results.
+    The values selected from the elements (e.g. by `S('price')`) are
+    collected only once, even if several aggregations use them.
+    Benders other than aggregations are applied to the whole list.
+
+    Example:
+    ```
+    summary = S('items') >> Aggregate(lines=Count(),
+                                      total=Sum(S('price')),
+                                      highest=Max(S('price')),
+                                      average=Mean(S('price')),
+                                      first=S(0, 'name'))
+    summary({'items': [{'name': 'tea', 'price': 2},
+                       {'name': 'cake', 'price': 4}]})
+    # -> {'lines': 2, 'total': 6, 'highest': 4, 'average': 3.0,
+    #     'first': 'tea'}
+    ```
+    """
+    def __init__(self, **aggregations):
+        self._aggregations = list(aggregations.items())
+
+    def _eval(self, value, context):
+        vals = value if isinstance(value, list) else list(value)
+        values = {}
+        result = {}
+        for name, bender in self._aggregations:
+            if isinstance(bender, Aggregation):
+                values_id = bender._values_id()
+                selected = values.get(values_id)
+                if selected is None:
+                    selected = values[values_id] = bender._values(vals,
+                                                                  context)
+                result[name] = bender.aggregate(selected)
+            else:
+                result[name] = bender._eval(vals, context)
+        return result
+
+
+class Lookup(Bender):
+    """
+    Look up the value in a table: a list of elements (e.g. dicts) indexed by
+    the key selected from each of them. The index is a dict, so each lookup
+    takes constant time.
+
+    table: a bender returning the list of elements, evaluated on the same
+           value as Lookup. It's usually taken from the context, e.g.
+           `Context() >> S('products')`, or a constant `K([...])`.
+    key: a bender or function selecting the key of each element, e.g.
+         `S('id')`.
+    many: optional. if true, return the list of all the elements with the
+          given key (empty if there's none). By default, return the first
+          one, raising KeyError if there's none.
+
+    When the table comes from the context or is constant, its index is
+    built once and reused for as long as the same table object is bent,
+    i.e. while the same context is passed to `bend()`. The table must not
+    be changed in the meantime.
+
+    Example:
+    ```
+    mapping = {'lines': S('lines') >> Forall.bend({
+        'quantity': S('quantity'),
+        'product': S('product_id') >> Lookup(Context() >> S('products'),
+                                             S('id')) >> S('name'),
+    })}
+    bend(mapping, {'lines': [{'product_id': 2, 'quantity': 1}]},
+         {'products': [{'id': 1, 'name': 'tea'}, {'id': 2, 'name': 'cake'}]})
+    # -> {'lines': [{'quantity': 1, 'product': 'cake'}]}
+    ```
+    """
+    def __init__(self, table, key, many=False):
+        self._table = _Table(table, key)
+        self._many = many
+
+    def _eval(self, value, context):
+        index = self._table.index(value, context)
+        if self._many:
+            return list(index.get(value, ()))
+        return index[value][0]
+
+
+class Join(Bender):
+    """
+    Join two lists, matching the elements with equal keys. The right list
+    is indexed by key once per bend, so the join takes linear time.
+
+    Returns a list of `(left_element, right_element)` tuples, in the order
+    of the left list (and then of the right list).
+
+    left: a bender returning the left list, e.g. `S('order_lines')`.
+    right: a bender returning the right list, evaluated on the same value,
+           e.g. `S('products')` or `Context() >> S('products')`.
+    left_key: a bender or function selecting the key of the left elements.
+    right_key: optional. the same for the right elements. Defaults to
+               `left_key`.
+    how: optional. how elements without a match are handled:
+         - 'inner' (the default): left out. A left element matching several
+           right ones gets a pair for each.
+         - 'left': paired with None.
+         - 'many': every left element is paired with the list of the right
+           elements matching it, which may be empty.
+
+    As in `Lookup`, the index of a right list taken from the context or
+    constant is reused for as long as the same list is bent.
+
+    Example:
+    ```
+    join = Join(S('lines'), S('products'), S('product_id'), S('id'))
+    join({'lines': [{'product_id': 2}, {'product_id': 3}],
+          'products': [{'id': 1}, {'id': 2}]})
+    # -> [({'product_id': 2}, {'id': 2})]
+    ```
+    """
+    _HOW = ('inner', 'left', 'many')
+
+    def __init__(self, left, right, left_key, right_key=None, how='inner'):
+        if how not in self._HOW:
+            raise ValueError('how must be one of {}, got {!r}'
+                             .format(', '.join(self._HOW), how))
+        self._left = left
+        self._left_key = left_key
+        self._left_getter = _getter(left_key)
+        self._right = _Table(right,
+                             left_key if right_key is None else right_key)
+        self._how = how
+
+    def _eval(self, value, context):
+        index = self._right.index(value, context)
+        left = self._left._eval(value, context)
+        key = _key_func(self._left_key, self._left_getter, context)
+        how = self._how
+        if how == 'many':
+            return [(l, list(index.get(key(l), ()))) for l in left]
+        unmatched = (None,) if how == 'left' else ()
+        return [(l, r) for l in left for r in index.get(key(l), unmatched)]
+
+    def __getstate__(self):
+        # see _Table.__getstate__()
+        state = self.__dict__.copy()
+        del state['_left_getter']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._left_getter = _getter(self._left_key)
+
+
+class _Table(object):
+    """
+    A bender returning a list, along with the key of its elements.
+    Its index is cached when the list comes from the context or is constant,
+    as long as the same list object is bent.
+    """
+
+    def __init__(self, bender, key):
+        self.bender = bender
+        self.key = key
+        self._getter = _getter(key)
+        self._reusable = _is_constant(bender) and (
+            not isinstance(key, Bender) or _is_pure_selector(key))
+        # the last (list, index) pair, replaced as a whole so that threads
+        # sharing the bender see consistent pairs
+        self._cached = None
+
+    def index(self, value, context):
+        elements = self.bender._eval(value, context)
+        cached = self._cached
+        if cached is not None and cached[0] is elements:
+            return cached[1]
+        index = {}
+        key = _key_func(self.key, self._getter, context)
+        for element in elements:
+            index.setdefault(key(element), []).append(element)
+        if self._reusable:
+            self._cached = (elements, index)
+        return index
+
+    def __getstate__(self):
+        # the cached index is rebuilt on first use, and the getter when
+        # unpickled, since itemgetters can't be pickled on Python 2
+        state = self.__dict__.copy()
+        state['_cached'] = None
+        del state['_getter']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._getter = _getter(self.key)
+
+
+def _is_constant(bender):
+    """
+    Whether `bender` returns the same for every value bent with the same
+    context.
+    """
+    path = selector_path(bender)
+    return type(bender) is K or (path is not None and path[0])
+
+
+def _is_pure_selector(bender):
+    """
+    Whether `bender` only selects keys from its input.
+    """
+    path = selector_path(bender)
+    return path is not None and not path[0]
+
+
+def _getter(select):
+    """
+    Return a function of one argument applying `select` (a bender or a
+    function), or None if it's a bender that may use the context.
+    Selectors of a single key are applied with `operator.itemgetter`.
+    """
+    if type(select) is S and len(select._path) == 1:
+        return itemgetter(select._path[0])
+    elif isinstance(select, Bender) or select is None:
+        return None
+    return select
+
+
+def _key_func(select, getter, context):
+    if getter is not None:
+        return getter
+    return lambda v: select._eval(v, context)
+
+
+class FusedListOp(Bender):
+    """
+    Applies a chain of list operations in a single pass over the list,
+    passing iterators between them instead of building intermediate lists.
+
+    It's built automatically when Forall, Filter and FlatForall are composed
+    with each other or with a final Reduce, so there's no need to
+    instantiate it directly.
+
+    Example:
+    ```
+    b = Filter(lambda i: i % 2 == 0) >> Forall(lambda i: i * 10)
+    type(b)  # -> FusedListOp
+    b(range(5))  # -> [0, 20, 40]
+    ```
+    """
+
+    def __init__(self, *ops):
+        self._ops = tuple(chain.from_iterable(
+            op._ops if isinstance(op, FusedListOp) else [op] for op in ops))
+
+    def execute(self, vals):
+        for op in self._ops[:-1]:
+            vals = op.lazy_op(op._func, vals)
+        last = self._ops[-1]
+        if type(last) is not Reduce:
+            return list(last.lazy_op(last._func, vals))
+        vals = iter(vals)
+        for first in vals:
+            return reduce(_reducer(last._func), vals, first)
+        # raise the same error as a plain Reduce on an empty list
+        return last.op(last._func, ())
+
+    def _fuse(self, other):
+        if type(self._ops[-1]) is not Reduce and _can_follow(other):
+            return FusedListOp(self, other)
+        return None
+
+
+def _reducer(func):
+    # Reduce.op() turns the TypeErrors raised by `func` into ValueErrors,
+    # while those raised by the operations fused before it must propagate
+    # unchanged, so they're translated here instead
+    def reduce_step(acc, value):
+        try:
+            return func(acc, value)
+        except TypeError as e:
+            raise ValueError(e.args[0])
+    return reduce_step
+
+
+def _is_lazy(op):
+    return type(op) in (Forall, Filter, FlatForall) and op._bender is None
+
+
+def _can_follow(op):
+    """
+    Whether `op` can be fused after a lazy list operation.
+    """
+    return (isinstance(op, FusedListOp) or _is_lazy(op) or
+            (type(op) is Reduce and op._bender is None))
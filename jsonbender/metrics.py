@@ -0,0 +1,414 @@
+from collections import OrderedDict, deque
+from functools import partial
+import time
+
+from jsonbender import core
+from jsonbender._compat import iteritems
+from jsonbender.core import BendingException, _bend
+from jsonbender.profiling import Profiler
+
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+# the registered observers, and those asking for traces along with the
+# number of sources bent since they were registered
+_observers = []
+_tracers = []
+
+
+class Observer(object):
+    """
+    The base class of the objects notified of the bendings done by `bend()`,
+    `bend_many()`, `bend_parallel()`, `bend_columns()` and `bend_stream()`
+    once registered by `register()`. Subclasses override the methods they
+    need.
+
+    The `mapping` passed to the methods is the one passed to the bending
+    function (or the mapping of the `Plan` passed to it), so mappings should
+    be long-lived objects, e.g. module-level constants.
+
+    trace_every: when set, one bending out of `trace_every` done by `bend()`
+                 or `bend_many()` is profiled, and `traced()` is called with
+                 its statistics.
+    """
+
+    trace_every = None
+
+    def bent(self, mapping, count, seconds):
+        """
+        Called after `count` sources were bent by `mapping`, taking
+        `seconds` in total. `count` is 1, except for the sources bent as a
+        batch by `bend_columns()` and `bend_parallel()`.
+        """
+
+    def failed(self, mapping, key, exception):
+        """
+        Called when bending a source by `mapping` raised `exception`.
+        `key` is the dotted path of the output key it was raised for (e.g.
+        'items.price'), or None.
+        """
+
+    def traced(self, mapping, source, stats):
+        """
+        Called with the statistics of a profiled bending of `source` (see
+        `Profiler.stats()`), one out of `trace_every`.
+        """
+
+
+def register(observer):
+    """
+    Start notifying `observer` of bendings.
+    Until an observer is registered, bending functions only pay for a
+    single check.
+    """
+    _observers.append(observer)
+    _update()
+
+
+def unregister(observer):
+    """
+    Stop notifying `observer` of bendings.
+    """
+    _observers.remove(observer)
+    _update()
+
+
+def _update():
+    counts = {id(o): count for o, count in _tracers}
+    _tracers[:] = [[o, counts.get(id(o), 0)] for o in _observers
+                   if o.trace_every]
+    core._observe = _observe_bend if _observers else None
+
+
+def _reset():
+    del _observers[:]
+    _update()
+
+
+def _observe_bend(mapping, source, context):
+    return _observe(mapping, partial(_bend, mapping), source, context)
+
+
+def _observed(mapping, run):
+    """
+    Return `run(source, context)`, bending sources by `mapping`, wrapped so
+    that registered observers are notified, or `run` itself when there is
+    none.
+    """
+    if not _observers:
+        return run
+    return lambda source, context: _observe(mapping, run, source, context)
+
+
+def _observe(mapping, run, source, context):
+    tracers = []
+    for entry in _tracers:
+        entry[1] += 1
+        if entry[1] % entry[0].trace_every == 0:
+            tracers.append(entry[0])
+    start = _timer()
+    try:
+        if tracers:
+            profiler = Profiler()
+            result = profiler.bend(mapping, source, context)
+        else:
+            result = run(source, context)
+    except Exception as e:
+        _notify_failed(mapping, e)
+        raise
+    _notify_bent(mapping, 1, _timer() - start)
+    if tracers:
+        stats = profiler.stats()
+        for observer in tracers:
+            observer.traced(mapping, source, stats)
+    return result
+
+
+def _notify_bent(mapping, count, seconds):
+    for observer in _observers:
+        observer.bent(mapping, count, seconds)
+
+
+def _notify_failed(mapping, exception):
+    key = _error_key(exception)
+    for observer in _observers:
+        observer.failed(mapping, key, exception)
+
+
+def _error_key(exception):
+    """
+    The output key of a `BendingException`, from the 'Error for key k: '
+    prefixes added to its message by each enclosing dict.
+    """
+    if not isinstance(exception, BendingException):
+        return None
+    prefix = 'Error for key '
+    keys = []
+    message = str(exception)
+    while message.startswith(prefix):
+        key, _, message = message[len(prefix):].partition(': ')
+        keys.append(key)
+    return '.'.join(keys) or None
+
+
+class Histogram(object):
+    """
+    An HDR-style histogram: values are counted in buckets whose width grows
+    with their magnitude, so that the quantiles are known with `precision`
+    significant digits whatever the range of the values, in bounded memory.
+
+    precision: optional. the number of significant digits kept, from 1 to 5.
+    unit: optional. the smallest value told apart from 0. Values are stored
+          as integer multiples of it; the default suits latencies recorded
+          in seconds.
+
+    Example:
+    ```
+    histogram = Histogram()
+    for seconds in latencies:
+        histogram.record(seconds)
+    histogram.quantile(0.99)
+    ```
+    """
+
+    def __init__(self, precision=2, unit=1e-6):
+        if not 1 <= precision <= 5:
+            raise ValueError('precision must be between 1 and 5')
+        # sub-buckets are at most 1 / 2 ** (bits - 1) wide relative to their
+        # values
+        self._bits = (2 * 10 ** precision - 1).bit_length()
+        self.precision = precision
+        self.unit = unit
+        self.reset()
+
+    def reset(self):
+        self._counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value, count=1):
+        """
+        Count `value` (`count` times). Negative values are rejected.
+        """
+        if value < 0:
+            raise ValueError('Negative value: {!r}'.format(value))
+        index = self._index(int(value / self.unit))
+        self._counts[index] = self._counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Add the counts of `other`, a histogram with the same precision and
+        unit.
+        """
+        if (other.precision, other.unit) != (self.precision, self.unit):
+            raise ValueError('Histograms with different precisions or units')
+        for index, count in iteritems(other._counts):
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q):
+        """
+        The value below which a fraction `q` (from 0 to 1) of the recorded
+        values fall, or None if there is none.
+        It's the largest value of the bucket it falls in, capped by the
+        largest value recorded.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError('q must be between 0 and 1')
+        if not self.count:
+            return None
+        rank = max(q * self.count, 1)
+        seen = 0
+        for low, high, count in self.buckets():
+            seen += count
+            if seen >= rank:
+                return min(high, self.max)
+        return self.max
+
+    def buckets(self):
+        """
+        Iterate over the `(low, high, count)` of the non-empty buckets, in
+        increasing order, where `low` and `high` are the smallest and largest
+        values (in multiples of `unit`) counted in the bucket.
+        """
+        unit, mask = self.unit, (1 << self._bits) - 1
+        for index in sorted(self._counts):
+            shift = index >> self._bits
+            low = (index & mask) << shift
+            yield (low * unit, (low + (1 << shift) - 1) * unit,
+                   self._counts[index])
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99, 0.999)):
+        """
+        Return the count, min, max, mean and `quantiles` of the values as a
+        dict, e.g. to be exported as JSON.
+        """
+        res = {'count': self.count, 'min': self.min, 'max': self.max,
+               'mean': self.mean}
+        for q in quantiles:
+            res['p{:g}'.format(q * 100)] = self.quantile(q)
+        return res
+
+    def _index(self, value):
+        # values below 2 ** bits have a bucket each. Above, the values of
+        # each power of two share 2 ** (bits - 1) buckets, indexed by their
+        # leading bits after the number of trailing bits dropped.
+        shift = max(value.bit_length() - self._bits, 0)
+        return (shift << self._bits) | (value >> shift)
+
+
+class Metrics(Observer):
+    """
+    An observer keeping in memory, for each mapping, the number of sources
+    bent, the distribution of their latencies (as a `Histogram`, in
+    seconds), the number of errors by output key and the latest traces.
+
+    names: optional. a dict mapping names to the mappings they stand for in
+           `snapshot()`. Other mappings are named after their id.
+    trace_every: optional. profile one bending out of `trace_every` (see
+                 `Observer`).
+    traces: optional. how many traces are kept for each mapping.
+    precision: optional. the precision of the histograms.
+    unnamed: optional. how many of the mappings not in `names` are tracked
+             separately. The metrics of the least recently used ones are
+             added up under the name 'other', so that mappings built on the
+             fly (e.g. `bend({'a': S('a')}, source)`) take bounded memory.
+
+    Example:
+    ```
+    metrics = Metrics(names={'orders': ORDERS}, trace_every=1000)
+    register(metrics)
+    ...
+    export(metrics.snapshot())
+    ```
+    """
+
+    def __init__(self, names=None, trace_every=None, traces=10, precision=2,
+                 unnamed=100):
+        self.trace_every = trace_every
+        # the mappings are kept alive, so that their ids aren't reused
+        self._names = {id(m): (name, m) for name, m in iteritems(names or {})}
+        self._traces = traces
+        self._precision = precision
+        self._unnamed_limit = unnamed
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all the metrics collected so far.
+        """
+        self._named = {}
+        # by id, in least recently used order
+        self._unnamed = OrderedDict()
+        self._other = None
+        self._start = _timer()
+
+    def bent(self, mapping, count, seconds):
+        metrics = self._metrics(mapping)
+        metrics.records += count
+        metrics.latency.record(seconds / count, count)
+
+    def failed(self, mapping, key, exception):
+        errors = self._metrics(mapping).errors
+        errors[key] = errors.get(key, 0) + 1
+
+    def traced(self, mapping, source, stats):
+        self._metrics(mapping).traces.append(stats)
+
+    def snapshot(self):
+        """
+        Return the metrics of each mapping, as a list of dicts with its
+        'name', the number of 'records' bent, the 'records_per_second' since
+        the metrics were created or reset, the number of 'errors' by output
+        key, the 'latency' summary (see `Histogram.summary()`) and the
+        latest 'traces'.
+        """
+        elapsed = _timer() - self._start
+        all_metrics = list(self._named.values())
+        all_metrics.extend(m for _, m in self._unnamed.values())
+        if self._other is not None:
+            all_metrics.append(self._other)
+        res = []
+        for metrics in all_metrics:
+            res.append({'name': metrics.name,
+                        'records': metrics.records,
+                        'records_per_second': (metrics.records / elapsed
+                                               if elapsed else None),
+                        'errors': dict(metrics.errors),
+                        'latency': metrics.latency.summary(),
+                        'traces': list(metrics.traces)})
+        return res
+
+    def histogram(self, mapping):
+        """
+        Return the latency `Histogram` of `mapping`, or None if it isn't
+        tracked separately.
+        """
+        metrics = self._named.get(id(mapping))
+        if metrics is None and id(mapping) in self._unnamed:
+            metrics = self._unnamed[id(mapping)][1]
+        return metrics and metrics.latency
+
+    def _new_metrics(self, name):
+        return _MappingMetrics(name, Histogram(self._precision),
+                               deque(maxlen=self._traces))
+
+    def _metrics(self, mapping):
+        key = id(mapping)
+        metrics = self._named.get(key)
+        if metrics is not None:
+            return metrics
+        if key in self._names:
+            metrics = self._named[key] = self._new_metrics(
+                self._names[key][0])
+            return metrics
+        entry = self._unnamed.pop(key, None)
+        if entry is None:
+            # the mapping is kept alive while tracked, so that its id isn't
+            # reused
+            entry = (mapping, self._new_metrics('mapping-{:x}'.format(key)))
+            while self._unnamed and (len(self._unnamed) >=
+                                     self._unnamed_limit):
+                _, (_, evicted) = self._unnamed.popitem(last=False)
+                if self._other is None:
+                    self._other = self._new_metrics('other')
+                self._other.add(evicted)
+        if self._unnamed_limit > 0:
+            self._unnamed[key] = entry
+            return entry[1]
+        if self._other is None:
+            self._other = self._new_metrics('other')
+        return self._other
+
+
+class _MappingMetrics(object):
+    def __init__(self, name, latency, traces):
+        self.name = name
+        self.records = 0
+        self.errors = {}
+        self.latency = latency
+        self.traces = traces
+
+    def add(self, other):
+        self.records += other.records
+        for key, count in iteritems(other.errors):
+            self.errors[key] = self.errors.get(key, 0) + count
+        self.latency.merge(other.latency)
+        self.traces.extend(other.traces)
@@ -0,0 +1,176 @@
+from jsonbender._analysis import same_input_children
+from jsonbender._compat import iteritems
+from jsonbender.core import Bender, Compose, Context, GetItem
+from jsonbender.list_ops import Aggregation, ForallBend
+from jsonbender.selectors import K, OptionalS, S
+
+
+class _Any(object):
+    def __repr__(self):
+        return 'ANY'
+
+
+# stands for every element of a list in the paths returned by
+# required_paths()
+ANY = _Any()
+
+
+def required_paths(mapping):
+    """
+    Return the set of the paths of the source that bending it by `mapping`
+    can read, as tuples of keys. `ANY` stands for every element of a list,
+    e.g. in `('items', ANY, 'price')` for `S('items') >> Forall.bend({'p':
+    S('price')})`.
+
+    A path stands for the whole value found there: the selected values are
+    usually output as they are, and benders whose reads can't be known
+    statically (`F`, `Forall`, `Filter`, custom benders, ...) are assumed to
+    read the whole value they're given. When that's the source itself, the
+    set holds the empty path `()`. Selections from the result of such a
+    bender (e.g. `F(parse) >> S('a')`) or from the context don't read the
+    source. No path of the set is a prefix of another.
+
+    Example:
+    ```
+    required_paths({'name': Format('{} {}', S('user', 'first'),
+                                   S('user', 'last')),
+                    'total': S('lines') >> F(len)})
+    # -> {('user', 'first'), ('user', 'last'), ('lines',)}
+    ```
+    """
+    paths = set()
+    _read_mapping(mapping, (), paths)
+    # drop the paths whose values are already read as part of a shorter one
+    return {path for path in paths
+            if not any(path[:end] in paths for end in range(len(path)))}
+
+
+def project(source, paths):
+    """
+    Return a copy of `source` keeping only the values at `paths` (as
+    returned by `required_paths()`), so that it's bent the same way while
+    holding less data, e.g. before keeping or sending it. Dicts are copied
+    with the required keys only, and list elements that aren't required are
+    replaced by None, so that indexes are preserved. Missing keys are
+    ignored.
+
+    Example:
+    ```
+    paths = required_paths(MAPPING)
+    bend(MAPPING, project(source, paths)) == bend(MAPPING, source)  # -> True
+    ```
+    """
+    trie = {}
+    for path in paths:
+        if not path:
+            return source
+        node = trie
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+            if node is None:
+                break
+        else:
+            node[path[-1]] = None
+    return _project(source, trie)
+
+
+def _project(value, trie):
+    if trie is None:
+        return value
+    elif isinstance(value, dict):
+        if ANY in trie:
+            return value
+        return {k: _project(value[k], child) for k, child in iteritems(trie)
+                if k in value}
+    elif isinstance(value, list):
+        every = trie.get(ANY, False)
+        res = [None] * len(value) if every is False else [
+            _project(v, every) for v in value]
+        for k, child in iteritems(trie):
+            if type(k) is int and -len(value) <= k < len(value):
+                # an element both selected by index and as ANY is kept
+                res[k] = (value[k] if every is not False else
+                          _project(value[k], child))
+        return res
+    return value
+
+
+def _read_mapping(mapping, at, paths):
+    if isinstance(mapping, list):
+        for v in mapping:
+            _read_mapping(v, at, paths)
+    elif isinstance(mapping, dict):
+        for v in mapping.values():
+            _read_mapping(v, at, paths)
+    elif isinstance(mapping, Bender):
+        _consume(_read(mapping, at, paths), paths)
+
+
+def _consume(path, paths):
+    if path is not None:
+        paths.add(path)
+
+
+def _read(bender, at, paths):
+    """
+    Add to `paths` the source paths read by `bender` when applied to the
+    value at path `at` (None when it isn't a value of the source), and
+    return the path of its result if it's a value of the source, else None.
+    """
+    kind = type(bender)
+    if at is None or kind is K or kind is Context:
+        return None
+    elif kind is S or kind is OptionalS:
+        return _select(at, bender._path, paths)
+    elif kind is GetItem:
+        return _select(at, (bender._index,), paths)
+    elif kind is Compose:
+        first = _read(bender._first, at, paths)
+        read = set()
+        result = _read(bender._second, first, read)
+        if result is None and not read:
+            # e.g. S('a') >> K(1) still needs 'a' not to raise
+            _consume(first, paths)
+        paths.update(read)
+        return result
+    elif kind is ForallBend:
+        _read_elements(bender._mapping, at, paths)
+        return None
+    elif (isinstance(bender, Aggregation) and
+          kind._eval == Aggregation._eval and
+          isinstance(bender._select, Bender)):
+        _read_elements(bender._select, at, paths)
+        return None
+    children = same_input_children(bender)
+    if not children:
+        # F, custom benders, ... may read anything from their input
+        paths.add(at)
+    for child in children:
+        _consume(_read(child, at, paths), paths)
+    return None
+
+
+def _read_elements(mapping, at, paths):
+    """
+    Add to `paths` the source paths read by bending each element of the list
+    at path `at` by `mapping`.
+    """
+    found = set()
+    _read_mapping(mapping, at + (ANY,), found)
+    # the list itself is still needed when nothing is read from its elements,
+    # e.g. by Forall.bend({'kind': K('line')})
+    paths.update(found or [at + (ANY,)])
+
+
+def _select(at, keys, paths):
+    for i, key in enumerate(keys):
+        # a slice selects several elements, so the whole list is read
+        if type(key) is slice:
+            paths.add(at + tuple(keys[:i]))
+            return None
+        try:
+            hash(key)
+        except TypeError:
+            paths.add(at + tuple(keys[:i]))
+            return None
+    return at + tuple(keys)
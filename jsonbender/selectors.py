@@ -1,4 +1,7 @@
-from jsonbender.core import Bender
+from collections import namedtuple, OrderedDict
+from threading import Lock
+
+from jsonbender.core import Bender, _NOT_FOUND, _probe_path
 
 
 class K(Bender):
@@ -28,6 +31,9 @@ class S(Bender):
             source = source[key]
         return source
 
+    def _probe(self, value, context):
+        return _probe_path(value, self._path)
+
     def optional(self, default=None):
         """
         Return an OptionalS with the same path and with the given `default`.
@@ -50,12 +56,8 @@ class OptionalS(S):
         super(OptionalS, self).__init__(*path)
 
     def execute(self, source):
-        try:
-            ret = super(OptionalS, self).execute(source)
-        except LookupError:
-            return self.default
-        else:
-            return ret
+        ret = _probe_path(source, self._path)
+        return self.default if ret is _NOT_FOUND else ret
 
 
 class F(Bender):
@@ -90,6 +92,14 @@ class F(Bender):
                           protect_against=protect_against,
                           **self._kwargs)
 
+    def cached(self, maxsize=128, key=None):
+        """
+        Return a CachedF with the same parameters, memoizing up to `maxsize`
+        results (see CachedF).
+        """
+        return CachedF(self._func, *self._args, cache_size=maxsize,
+                       cache_key=key, **self._kwargs)
+
 
 class ProtectedF(F):
     """
@@ -115,4 +125,114 @@ class ProtectedF(F):
         else:
             return super(ProtectedF, self).execute(value)
 
+    def cached(self, maxsize=128, key=None):
+        return ProtectedCachedF(self._func, *self._args,
+                                protect_against=self._protect_against,
+                                cache_size=maxsize, cache_key=key,
+                                **self._kwargs)
+
+
+CacheInfo = namedtuple('CacheInfo',
+                       ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+
+class CachedF(F):
+    """
+    Similar to F, but the results are memoized in an LRU cache of at most
+    `cache_size` entries (unbounded if None, 128 by default), so the
+    function should be pure. Useful for expensive functions called with few
+    distinct values, like parsing dates or normalizing codes.
+
+    `cache_key` is an optional function returning the cache key of a value,
+    e.g. for dicts or lists, which can't be used as keys themselves. Without
+    it, unhashable values are passed to the function without caching.
+    The cache is thread-safe, and `cache_info()` reports its statistics.
+
+    Example:
+    ```
+    f = F(parse_date).cached(maxsize=1024)
+    f('2017-01-01')
+    f('2017-01-01')
+    f.cache_info()  # -> CacheInfo(hits=1, misses=1, evictions=0, ...)
+    ```
+    """
+    def __init__(self, func, *args, **kwargs):
+        self._maxsize = kwargs.pop('cache_size', 128)
+        self._key = kwargs.pop('cache_key', None)
+        super(CachedF, self).__init__(func, *args, **kwargs)
+        self._lock = Lock()
+        self._reset()
+
+    def execute(self, value):
+        try:
+            key = value if self._key is None else self._key(value)
+            hash(key)
+        except TypeError:
+            key = _UNCACHED
+        with self._lock:
+            if key is not _UNCACHED and key in self._cache:
+                # mark as most recently used
+                result = self._cache[key] = self._cache.pop(key)
+                self._hits += 1
+                return result
+            self._misses += 1
+        result = super(CachedF, self).execute(value)
+        if key is not _UNCACHED:
+            with self._lock:
+                self._cache[key] = result
+                if (self._maxsize is not None and
+                        len(self._cache) > self._maxsize):
+                    self._cache.popitem(last=False)
+                    self._evictions += 1
+        return result
+
+    def cache_info(self):
+        """
+        Return the hits, misses and evictions so far, along with the
+        maximum and current sizes of the cache.
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions,
+                             self._maxsize, len(self._cache))
+
+    def cache_clear(self):
+        """
+        Empty the cache and reset its statistics.
+        """
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._cache = OrderedDict()
+        self._hits = self._misses = self._evictions = 0
+
+    def protect(self, protect_against=None):
+        return ProtectedCachedF(self._func, *self._args,
+                                protect_against=protect_against,
+                                cache_size=self._maxsize,
+                                cache_key=self._key, **self._kwargs)
+
+    def __getstate__(self):
+        # locks can't be pickled; each copy gets its own empty cache
+        state = self.__dict__.copy()
+        for name in ('_lock', '_cache'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+        self._reset()
+
+
+class ProtectedCachedF(ProtectedF, CachedF):
+    """
+    A CachedF with the `protect_against` semantics of ProtectedF: values
+    equal to it are returned as is, without calling the function or
+    touching the cache.
+    """
+
+
+_UNCACHED = object()
+
 
@@ -0,0 +1,176 @@
+import codecs
+import json
+import re
+
+from jsonbender._compat import text_type
+from jsonbender.batch import bend_many
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DELIMITERS = frozenset(' \t\n\r,]')
+
+
+def bend_stream(mapping, infile, outfile, context=None, errors=None,
+                input_format='ndjson', output_format='ndjson',
+                chunk_size=65536):
+    """
+    Bend records read incrementally from a file object and write the results
+    to another one, so memory use is bounded by the largest single record
+    rather than by the size of the file.
+
+    mapping: the map of benders, as passed to `bend()`, or a `Plan` returned
+             by `compile()`.
+    infile: a file object (text or binary) to read the records from.
+    outfile: a text file object to write the results to.
+    context: optional. the context passed to every bending.
+    errors: optional. a list in which failures are collected, as in
+            `bend_many()`.
+    input_format: 'ndjson' (one JSON record per line, the default) or
+                  'array' (a single top-level JSON array of records).
+    output_format: 'ndjson' (the default) or 'array', as above.
+    chunk_size: optional. how many characters are read at a time from an
+                'array' input.
+
+    Returns the number of results written.
+
+    Example:
+    ```
+    with open('in.ndjson') as infile, open('out.json', 'w') as outfile:
+        bend_stream(MAPPING, infile, outfile, output_format='array')
+    ```
+    """
+    if input_format == 'ndjson':
+        sources = iter_ndjson(infile)
+    elif input_format == 'array':
+        sources = iter_json_array(infile, chunk_size)
+    else:
+        raise ValueError('Unknown input format: {!r}'.format(input_format))
+
+    if output_format == 'ndjson':
+        write = write_ndjson
+    elif output_format == 'array':
+        write = write_json_array
+    else:
+        raise ValueError('Unknown output format: {!r}'.format(output_format))
+
+    return write(bend_many(mapping, sources, context, errors), outfile)
+
+
+def iter_ndjson(fp):
+    """
+    Iterate over the records of a newline-delimited JSON file object,
+    skipping blank lines.
+    """
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_json_array(fp, chunk_size=65536):
+    """
+    Iterate over the elements of a top-level JSON array read from a file
+    object, without loading the whole array in memory.
+    """
+    return iter(_JSONArrayReader(fp, chunk_size))
+
+
+def write_ndjson(records, fp):
+    """
+    Write each record as a line of JSON. Returns the number of records.
+    """
+    count = 0
+    for record in records:
+        # json.dumps() returns bytes on Python 2, which text files reject
+        fp.write(text_type(json.dumps(record)))
+        fp.write(u'\n')
+        count += 1
+    return count
+
+
+def write_json_array(records, fp):
+    """
+    Write the records as a single JSON array, one element at a time.
+    Returns the number of records.
+    """
+    count = 0
+    fp.write(u'[')
+    for record in records:
+        if count:
+            fp.write(u', ')
+        fp.write(text_type(json.dumps(record)))
+        count += 1
+    fp.write(u']\n')
+    return count
+
+
+class _JSONArrayReader(object):
+    """
+    Incrementally decodes the elements of a JSON array.
+
+    Only the unconsumed part of the input is buffered. When an element
+    doesn't fit in the buffer, the next read is at least as big as the
+    buffer, so big elements are decoded in amortized linear time.
+    """
+
+    def __init__(self, fp, chunk_size):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._bytes_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        if self._next_char() != '[':
+            raise ValueError('Expected a JSON array')
+        self._pos += 1
+        if self._next_char() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._decode_element()
+            char = self._next_char()
+            if char == ',':
+                self._pos += 1
+            elif char == ']':
+                self._pos += 1
+                return
+            else:
+                raise ValueError("Expected ',' or ']' in JSON array, got {!r}"
+                                 .format(char))
+
+    def _read(self, size):
+        chunk = self._fp.read(size)
+        if not chunk:
+            self._eof = True
+        if isinstance(chunk, bytes) and not isinstance(chunk, str):
+            chunk = self._bytes_decoder.decode(chunk, final=self._eof)
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+
+    def _next_char(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if self._eof:
+                return ''
+            self._read(self._chunk_size)
+
+    def _decode_element(self):
+        self._next_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if self._eof:
+                    raise
+            else:
+                # a value that isn't followed by a delimiter yet (e.g. a
+                # number cut in the middle) may continue in the next chunk
+                if self._eof or self._buf[end:end + 1] in _DELIMITERS:
+                    self._pos = end
+                    return value
+            self._read(max(self._chunk_size, len(self._buf) - self._pos))
@@ -1,4 +1,6 @@
-from jsonbender.core import Bender, Transport
+from string import Formatter
+
+from jsonbender.core import Bender
 from jsonbender._compat import iteritems
 
 
@@ -8,7 +10,9 @@ class Format(Bender):
     However, the values to be formatted are given by benders as positional or
     named parameters.
 
-    `format_string` is a template with the same syntax as `str.format()`
+    `format_string` is a template with the same syntax as `str.format()`.
+    It is parsed when the bender is built, so a malformed template raises a
+    ValueError right away instead of on every bending.
 
     Example:
     ```
@@ -19,16 +23,27 @@ class Format(Bender):
     """
     def __init__(self, format_string, *args, **kwargs):
         self._format_str = format_string
+        # parse the template once, so that a malformed one fails here
+        for _ in Formatter().parse(format_string):
+            pass
         self._positional_benders = args
         self._named_benders = kwargs
 
-    def raw_execute(self, source):
-        transport = Transport.from_source(source)
-        args = [bender(source) for bender in self._positional_benders]
-        kwargs = {k: bender(source)
+    def _bend_args(self, value, context):
+        """
+        Bend each of the positional and named benders exactly once.
+        """
+        args = [bender._eval(value, context)
+                for bender in self._positional_benders]
+        kwargs = {k: bender._eval(value, context)
                   for k, bender in iteritems(self._named_benders)}
-        value = self._format_str.format(*args, **kwargs)
-        return Transport(value, transport.context)
+        return args, kwargs
+
+    def _eval(self, value, context):
+        return self._render(*self._bend_args(value, context))
+
+    def _render(self, args, kwargs):
+        return self._format_str.format(*args, **kwargs)
 
 
 class ProtectedFormat(Format):
@@ -36,21 +51,18 @@ class ProtectedFormat(Format):
     Returns a formatted String, like Python's built-in format.
     If one of the arguments is None, it evaluates to None
     Examples:
-        fmt = Format('{} {} {last}', S('first'), S('second'), last=S('last'))
+        fmt = ProtectedFormat('{} {} {last}', S('first'), S('second'),
+                              last=S('last'))
         source = {'first': 'Edsger', 'second': 'W.', 'last': 'Dijkstra'}
         fmt.execute(source)  # -> 'Edsger W. Dijkstra'
 
-        fmt = Format('{} {}', S('first'), S('second'))
+        fmt = ProtectedFormat('{} {}', S('first'), OptionalS('second'))
         source = {'first': 'Edsger'}
         fmt.execute(source)  # -> None
     """
-    def raw_execute(self, source):
+    def _render(self, args, kwargs):
         # if any of the args to print are None, return None
-        if any(
-            [bender(source) is None for bender in self._positional_benders] +
-            [bender(source) is None for bender in self._named_benders.values()]
-        ):
-            # create an object with property value=None so it can be processed
-            return type(str('none_obj'), (object,), dict(value=None))
-        # else just behave normally
-        return super(ProtectedFormat, self).raw_execute(source)
+        if (any(v is None for v in args) or
+                any(v is None for v in kwargs.values())):
+            return None
+        return self._format_str.format(*args, **kwargs)
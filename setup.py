@@ -12,6 +12,7 @@ setup(
     download_url='https://codeload.github.com/Onyo/jsonbender/tar.gz/' + __version__,
     keywords=['dsl', 'edsl', 'json'],
     packages=['jsonbender'],
+    extras_require={'numpy': ['numpy']},
     classifiers=[
         'Intended Audience :: Developers',
         'Programming Language :: Python',
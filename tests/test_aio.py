@@ -0,0 +1,241 @@
+import time
+import unittest
+
+from jsonbender import Context, F, Format, Forall, If, K, S, bend
+from jsonbender._compat import PY2
+from jsonbender.core import BendingException
+
+if not PY2:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from unittest import mock
+    from jsonbender import aio
+    from jsonbender.aio import AsyncF, abend, abend_stream
+
+
+LATENCY = 0.05
+
+
+class FakeService(object):
+    """
+    A local stand-in for an async key-value service.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(key)
+        return asyncio.sleep(LATENCY, result=self.data[key])
+
+
+@unittest.skipIf(PY2, 'asyncio is not available')
+class TestAbend(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.service = FakeService({i: i * 10 for i in range(20)})
+
+    def tearDown(self):
+        self.loop.close()
+
+    def abend(self, *args, **kwargs):
+        return self.loop.run_until_complete(abend(*args, **kwargs))
+
+    def test_sync_mapping(self):
+        mapping = {'a': S('a') + K(1), 'l': [S('a'), {'c': Context()}]}
+        self.assertEqual(self.abend(mapping, {'a': 1}, {'x': 2}),
+                         bend(mapping, {'a': 1}, {'x': 2}))
+
+    def test_async_f(self):
+        fetch = AsyncF(self.service.get)
+        mapping = {'a': S('a') >> fetch,
+                   'sum': (S('a') >> fetch) + (S('b') >> fetch),
+                   'fmt': Format('{}-{x}', S('b') >> fetch, x=S('a')),
+                   'nested': {'list': [S('b') >> fetch, K('k')]}}
+        self.assertEqual(self.abend(mapping, {'a': 1, 'b': 2}),
+                         {'a': 10, 'sum': 30, 'fmt': '20-1',
+                          'nested': {'list': [20, 'k']}})
+
+    def test_extra_arguments(self):
+        async_add = AsyncF(lambda v, n, m=0: asyncio.sleep(0, v + n + m),
+                           1, m=2)
+        self.assertEqual(self.abend(S('a') >> async_add, {'a': 1}), 4)
+
+    def test_independent_lookups_are_concurrent(self):
+        mapping = {str(i): K(i) >> AsyncF(self.service.get)
+                   for i in range(10)}
+        start = time.time()
+        result = self.abend(mapping, {})
+        elapsed = time.time() - start
+        self.assertEqual(result, {str(i): i * 10 for i in range(10)})
+        # sequential lookups would take 10 * LATENCY
+        self.assertLess(elapsed, 5 * LATENCY)
+
+    def test_concurrency_limit(self):
+        mapping = [K(i) >> AsyncF(self.service.get) for i in range(4)]
+        start = time.time()
+        self.assertEqual(self.abend(mapping, {}, limit=1), [0, 10, 20, 30])
+        self.assertGreaterEqual(time.time() - start, 4 * LATENCY * 0.9)
+
+    def test_forall_bend(self):
+        mapping = S('ids') >> Forall.bend({
+            'id': S('id'),
+            'value': S('id') >> AsyncF(self.service.get),
+            'owner': Context() >> S('owner'),
+        })
+        self.assertEqual(
+            self.abend({'items': mapping}, {'ids': [{'id': 1}, {'id': 2}]},
+                       {'owner': 'me'}),
+            {'items': [{'id': 1, 'value': 10, 'owner': 'me'},
+                       {'id': 2, 'value': 20, 'owner': 'me'}]})
+
+    def test_control_flow_is_lazy(self):
+        fetch = AsyncF(self.service.get)
+        mapping = {
+            'if': If(S('flag') >> fetch, K(1) >> fetch, K(2) >> fetch),
+            'and': (K(0) >> fetch) & (K(3) >> fetch),
+        }
+        self.assertEqual(self.abend(mapping, {'flag': 0}),
+                         {'if': 20, 'and': 0})
+        self.assertEqual(sorted(self.service.calls), [0, 0, 2])
+
+    def test_errors(self):
+        mapping = {'a': {'b': S('missing') >> AsyncF(self.service.get)}}
+        with self.assertRaises(BendingException) as ctx:
+            self.abend(mapping, {})
+        self.assertEqual(str(ctx.exception),
+                         "Error for key a: Error for key b: 'missing'")
+
+    def test_failure_cancels_pending_lookups(self):
+        finished = []
+
+        def slow(value):
+            task = asyncio.ensure_future(asyncio.sleep(LATENCY, result=value))
+            task.add_done_callback(
+                lambda t: t.cancelled() or finished.append(t.result()))
+            return task
+
+        fetch = AsyncF(self.service.get)
+        mappings = [{'slow': K(1) >> AsyncF(slow), 'bad': K(-1) >> fetch},
+                    [K(1) >> AsyncF(slow), K(-1) >> fetch],
+                    (K(1) >> AsyncF(slow)) + (K(-1) >> fetch),
+                    K([1, -1]) >> Forall.bend(
+                        If(F(lambda v: v > 0), AsyncF(slow), fetch))]
+        for mapping in mappings:
+            with self.assertRaises(Exception):
+                self.abend(mapping, {})
+            self.loop.run_until_complete(asyncio.sleep(2 * LATENCY))
+            self.assertEqual(finished, [])
+
+    def test_bend_rejects_async_f(self):
+        with self.assertRaises(BendingException):
+            bend({'a': AsyncF(self.service.get)}, {})
+
+    def test_analysis_is_cached(self):
+        sync = {'a': S('a') + K(1), 'b': [S('a')]}
+        fetch = {'a': S('a') >> AsyncF(self.service.get), 'b': K(1)}
+        self.abend(sync, {'a': 1})
+        self.abend(fetch, {'a': 1})
+        with mock.patch.object(aio, '_children',
+                               side_effect=aio._children) as children:
+            self.assertEqual(self.abend(sync, {'a': 2}), {'a': 3, 'b': [2]})
+            self.assertEqual(self.abend(fetch, {'a': 2}), {'a': 20, 'b': 1})
+        self.assertEqual(children.call_count, 0)
+
+    def test_analyses_are_bounded(self):
+        for i in range(aio._ANALYSES_SIZE + 10):
+            self.abend({'a': S('a') + K(i)}, {'a': 1})
+        self.assertEqual(len(aio._ANALYSES), aio._ANALYSES_SIZE)
+
+
+class FakeSource(object):
+    """
+    An async iterable of records, counting how many were read.
+    """
+    def __init__(self, records):
+        self.records = list(records)
+        self.reads = 0
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        if self.reads == len(self.records):
+            raise StopAsyncIteration
+        record = self.records[self.reads]
+        self.reads += 1
+        return asyncio.sleep(0, result=record)
+
+
+@unittest.skipIf(PY2, 'asyncio is not available')
+class TestAbendStream(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def next(self, stream):
+        return self.loop.run_until_complete(stream.__anext__())
+
+    def collect(self, stream):
+        results = []
+        while True:
+            try:
+                results.append(self.next(stream))
+            except StopAsyncIteration:
+                return results
+
+    def test_sync_mapping(self):
+        stream = abend_stream({'b': S('a')}, FakeSource({'a': i}
+                                                        for i in range(5)))
+        self.assertEqual(self.collect(stream), [{'b': i} for i in range(5)])
+
+    def test_executor(self):
+        sources = FakeSource({'a': i} for i in range(5))
+        with ThreadPoolExecutor(2) as executor:
+            stream = abend_stream({'b': S('a') * K(2)}, sources,
+                                  executor=executor)
+            self.assertEqual(self.collect(stream),
+                             [{'b': i * 2} for i in range(5)])
+
+    def test_async_mapping_keeps_order(self):
+        # later sources are faster, so they finish first
+        delay = AsyncF(lambda i: asyncio.sleep(0.01 * (5 - i), result=i))
+        stream = abend_stream({'b': S('a') >> delay},
+                              FakeSource({'a': i} for i in range(5)))
+        self.assertEqual(self.collect(stream), [{'b': i} for i in range(5)])
+
+    def test_window_limits_reads(self):
+        source = FakeSource({'a': i} for i in range(10))
+        stream = abend_stream({'b': S('a')}, source, window=2)
+        self.assertEqual(self.next(stream), {'b': 0})
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        # one source was handed to the consumer, two fill the window
+        self.assertEqual(source.reads, 3)
+        self.assertEqual(self.collect(stream), [{'b': i}
+                                                for i in range(1, 10)])
+
+    def test_errors(self):
+        sources = FakeSource([{'a': 1}, {}, {'a': 3}])
+        errors = []
+        stream = abend_stream({'b': S('a')}, sources, errors=errors)
+        self.assertEqual(self.collect(stream), [{'b': 1}, {'b': 3}])
+        self.assertEqual([(i, str(e)) for i, e in errors],
+                         [(1, "Error for key b: 'a'")])
+
+    def test_error_aborts(self):
+        stream = abend_stream({'b': S('a')}, FakeSource([{'a': 1}, {}]))
+        self.assertEqual(self.next(stream), {'b': 1})
+        with self.assertRaises(BendingException):
+            self.next(stream)
+        with self.assertRaises(StopAsyncIteration):
+            self.next(stream)
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            abend_stream({}, FakeSource([]), window=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
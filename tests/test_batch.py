@@ -0,0 +1,279 @@
+from array import array
+import sys
+import unittest
+
+from jsonbender import (Context, F, Forall, K, OptionalS, S, bend,
+                        bend_columns, bend_many, bend_parallel, compile)
+from jsonbender._compat import PY2, iteritems
+from jsonbender.core import BendingException
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestBendMany(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(list(bend_many({'b': S('a')}, [])), [])
+
+    def test_preserves_order(self):
+        sources = [{'a': i} for i in range(10)]
+        got = list(bend_many({'b': S('a')}, sources))
+        self.assertEqual(got, [{'b': i} for i in range(10)])
+
+    def test_accepts_iterators_and_plans(self):
+        plan = compile({'b': S('a')}, backend='codegen')
+        sources = ({'a': i} for i in range(3))
+        self.assertEqual(list(bend_many(plan, sources)),
+                         [{'b': 0}, {'b': 1}, {'b': 2}])
+
+    def test_shared_context(self):
+        got = list(bend_many({'c': Context() >> S('c')}, [{}, {}],
+                             context={'c': 23}))
+        self.assertEqual(got, [{'c': 23}, {'c': 23}])
+
+    def test_raises_by_default(self):
+        results = bend_many({'b': S('a')}, [{'a': 1}, {}])
+        self.assertEqual(next(results), {'b': 1})
+        self.assertRaises(BendingException, next, results)
+
+    def test_collect_errors(self):
+        errors = []
+        got = list(bend_many({'b': S('a')}, [{'a': 1}, {}, {'a': 3}],
+                             errors=errors))
+        self.assertEqual(got, [{'b': 1}, {'b': 3}])
+        self.assertEqual(len(errors), 1)
+        index, exc = errors[0]
+        self.assertEqual(index, 1)
+        self.assertIsInstance(exc, BendingException)
+
+
+@unittest.skipIf(PY2, 'concurrent.futures is not available')
+class TestBendParallel(unittest.TestCase):
+    def test_preserves_order(self):
+        sources = [{'a': i} for i in range(100)]
+        got = list(bend_parallel({'b': S('a')}, sources,
+                                 workers=2, chunksize=7))
+        self.assertEqual(got, [{'b': i} for i in range(100)])
+
+    def test_unpicklable_mapping(self):
+        mapping = {'b': S('a') >> F(lambda i: i * 2),
+                   'l': K([1, 2]) >> Forall(lambda i: -i)}
+        got = list(bend_parallel(mapping, [{'a': 1}, {'a': 2}], workers=2))
+        self.assertEqual(got, [{'b': 2, 'l': [-1, -2]},
+                               {'b': 4, 'l': [-1, -2]}])
+
+    def test_context(self):
+        got = list(bend_parallel({'c': Context()}, [{}], context=23,
+                                 workers=1))
+        self.assertEqual(got, [{'c': 23}])
+
+    def test_collect_errors(self):
+        errors = []
+        sources = [{'a': 1}, {}, {'a': 3}, {}, {'a': 5}]
+        got = list(bend_parallel({'b': S('a')}, sources, errors=errors,
+                                 workers=2, chunksize=2))
+        self.assertEqual(got, [{'b': 1}, {'b': 3}, {'b': 5}])
+        self.assertEqual([i for i, e in errors], [1, 3])
+        self.assertTrue(all(isinstance(e, BendingException)
+                            for i, e in errors))
+
+    def test_raises(self):
+        results = bend_parallel({'b': S('a')}, [{}], workers=1)
+        self.assertRaises(BendingException, list, results)
+
+    def test_invalid_chunksize(self):
+        self.assertRaises(ValueError, bend_parallel, {}, [{}], chunksize=0)
+
+
+class CountingDict(dict):
+    def __init__(self, *args, **kwargs):
+        super(CountingDict, self).__init__(*args, **kwargs)
+        self.lookups = 0
+
+    def __getitem__(self, key):
+        self.lookups += 1
+        return super(CountingDict, self).__getitem__(key)
+
+
+class TestBendColumns(unittest.TestCase):
+    def assert_same_as_bend(self, mapping, sources, context=None):
+        rows = [bend(mapping, s, context) for s in sources]
+        expected = {k: [row[k] for row in rows] for k in mapping}
+        self.assertEqual(bend_columns(mapping, sources, context), expected)
+
+    def test_empty(self):
+        self.assertEqual(bend_columns({'b': S('a')}, []), {'b': []})
+        self.assertEqual(bend_columns({}, [{}]), {})
+
+    def test_same_as_bend(self):
+        mapping = {
+            'deep': S('data', 'attrs', 'x'),
+            'other': S('data', 'attrs', 'y'),
+            'index': S('data', 'list', 1),
+            'opt': OptionalS('data', 'opt', default=-1),
+            'const': K('k'),
+            'raw': 27,
+            'ctx': Context() >> S('c'),
+            'whole_ctx': Context(),
+            'expr': S('data', 'attrs', 'x') * K(2) >> F(str),
+        }
+        sources = [{'data': {'attrs': {'x': i, 'y': -i}, 'list': [i, i + 1],
+                             'opt': i}}
+                   for i in range(3)]
+        sources.append({'data': {'attrs': {'x': 3, 'y': -3},
+                                 'list': [3, 4]}})
+        self.assert_same_as_bend(mapping, sources, {'c': 23})
+
+    def test_accepts_iterators_and_plans(self):
+        plan = compile({'b': S('a')})
+        sources = ({'a': i} for i in range(3))
+        self.assertEqual(bend_columns(plan, sources), {'b': [0, 1, 2]})
+
+    def test_shared_prefix_is_selected_once(self):
+        attrs = [CountingDict(x=i, y=i) for i in range(3)]
+        sources = [{'data': CountingDict(attrs=a)} for a in attrs]
+        got = bend_columns({'x': S('data', 'attrs', 'x'),
+                            'y': S('data', 'attrs', 'y')}, sources)
+        self.assertEqual(got, {'x': [0, 1, 2], 'y': [0, 1, 2]})
+        self.assertEqual([s['data'].lookups for s in sources], [1, 1, 1])
+
+    def test_column_types(self):
+        got = bend_columns({'a': S('a'), 'b': S('a') * K(0.5), 'c': S('a')},
+                           [{'a': 1}, {'a': 2}],
+                           types={'a': 'l', 'b': 'd', 'c': tuple})
+        self.assertEqual(got, {'a': array('l', [1, 2]),
+                               'b': array('d', [0.5, 1.0]),
+                               'c': (1, 2)})
+
+    def test_invalid_column_type(self):
+        with self.assertRaises(BendingException) as ctx:
+            bend_columns({'a': S('a')}, [{'a': 'x'}], types={'a': 'd'})
+        self.assertTrue(str(ctx.exception).startswith('Error for key a: '))
+
+    def test_raises_by_default(self):
+        with self.assertRaises(BendingException) as ctx:
+            bend_columns({'b': S('a', 'b')}, [{'a': {'b': 1}}, {'a': {}}])
+        self.assertEqual(str(ctx.exception), "Error for key b: 'b'")
+        with self.assertRaises(BendingException) as ctx:
+            bend_columns({'c': Context() >> S('c')}, [{}])
+        self.assertEqual(str(ctx.exception), "Error for key c: 'c'")
+
+    def test_collect_errors(self):
+        errors = []
+        mapping = {'b': S('a'), 'c': S('a') >> F(lambda a: 1.0 / a)}
+        got = bend_columns(mapping, [{'a': 1}, {}, {'a': 0}, {'a': 4}],
+                           errors=errors)
+        self.assertEqual(got, {'b': [1, 4], 'c': [1.0, 0.25]})
+        self.assertEqual([i for i, e in errors], [1, 2])
+        self.assertTrue(all(isinstance(e, BendingException)
+                            for i, e in errors))
+
+    def test_flat_mappings_only(self):
+        self.assertRaises(ValueError, bend_columns, {'a': {'b': S('b')}},
+                          [{}])
+        self.assertRaises(ValueError, bend_columns, {'a': [S('b')]}, [{}])
+        self.assertRaises(ValueError, bend_columns, S('a'), [{}])
+
+
+class TestVectorizedOperators(unittest.TestCase):
+    a, b = S('data', 'a'), S('data', 'b')
+    mapping = {
+        'add': a + b, 'sub': a - b, 'mul': a * b, 'div': a / b,
+        'eq': a == b, 'ne': a != b, 'neg': -a, 'invert': ~a,
+        'nested': -(a * K(2) + b) / K(3) == a,
+        'mixed': ~(a == b) + a * K(0.5),
+    }
+
+    def assert_same_as_bend(self, columns):
+        sources = [{'data': {'a': a, 'b': b}}
+                   for a, b in zip(columns['a'], columns['b'])]
+        errors = []
+        got = bend_columns(self.mapping, sources, errors=errors)
+        for k, m in iteritems(self.mapping):
+            expected = []
+            for i, source in enumerate(sources):
+                try:
+                    expected.append(bend(m, source))
+                except Exception:
+                    self.assertIn(i, [j for j, _ in errors])
+            if not errors:
+                self.assert_same_values(got[k], expected)
+
+    def assert_same_values(self, got, expected):
+        self.assertEqual(len(got), len(expected))
+        for x, y in zip(got, expected):
+            self.assertIs(type(x), type(y))
+            if isinstance(x, float):
+                # tell NaN and signed zeros apart
+                self.assertEqual(repr(x), repr(y))
+            else:
+                self.assertEqual(x, y)
+
+    def test_numbers(self):
+        nan, inf = float('nan'), float('inf')
+        cases = [
+            {'a': [1, -2, 3, 0], 'b': [4, 5, -6, 7]},
+            {'a': [1.5, -0.0, nan, inf], 'b': [0.5, 2.0, 1.0, inf]},
+            {'a': [1, 2, 3, 4], 'b': [0.5, -0.0, 1e308, nan]},
+            {'a': [True, False, True, False], 'b': [True, True, 2, 3]},
+            {'a': [2 ** 53, -2 ** 52, 3, 4], 'b': [2 ** 53, 1, 2 ** 30, 5]},
+            {'a': [2 ** 70, 2, 3, 4], 'b': [1.0, 2.0, 3.0, 4.0]},
+        ]
+        for columns in cases:
+            self.assert_same_as_bend(columns)
+
+    def test_mixed_values(self):
+        # each source gets the type Python would give it
+        self.assert_same_as_bend({'a': [1, 2.5, True, 0],
+                                  'b': [2, 1, 0.5, -0.0]})
+        self.assert_same_as_bend({'a': [1, 'x', None, 4],
+                                  'b': [2, 'y', None, 5]})
+
+    def test_division_by_zero(self):
+        errors = []
+        got = bend_columns({'div': S('a') / S('b')},
+                           [{'a': 1, 'b': 2}, {'a': 1, 'b': 0},
+                            {'a': 1.0, 'b': -0.0}], errors=errors)
+        self.assertEqual(got, {'div': [0.5]})
+        self.assertEqual([i for i, e in errors], [1, 2])
+
+    def test_strings(self):
+        got = bend_columns({'s': S('a') + K('!'), 'eq': S('a') == K('x')},
+                           [{'a': 'x'}, {'a': 'y'}])
+        self.assertEqual(got, {'s': ['x!', 'y!'], 'eq': [True, False]})
+
+    def test_without_numpy(self):
+        saved = sys.modules.get('numpy')
+        sys.modules['numpy'] = None  # makes importing it fail
+        try:
+            self.test_numbers()
+            self.test_division_by_zero()
+        finally:
+            if saved is None:
+                del sys.modules['numpy']
+            else:
+                sys.modules['numpy'] = saved
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy_is_used(self):
+        original, calls = numpy.multiply, []
+
+        def multiply(*args):
+            calls.append(args)
+            return original(*args)
+
+        numpy.multiply = multiply
+        try:
+            columns = bend_columns({'x': S('a') * K(2.0) + S('b')},
+                                   [{'a': 1.0, 'b': 2}, {'a': 3.0, 'b': 4}])
+        finally:
+            numpy.multiply = original
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(columns, {'x': [4.0, 10.0]})
+        self.assertIs(type(columns['x'][0]), float)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import warnings
+
+from jsonbender import Context, F, K, OptionalS, S, bend, compile
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import Bender, BendingException
+from jsonbender.list_ops import Forall
+from jsonbender.string_ops import Format, ProtectedFormat
+
+
+class Double(Bender):
+    def execute(self, value):
+        return value * 2
+
+
+class TestCodegen(unittest.TestCase):
+    def assert_same_as_bend(self, mapping, source, context=None):
+        expected = bend(mapping, source, context)
+        plan = compile(mapping, backend='codegen')
+        self.assertEqual(plan(source, context), expected)
+
+    def test_source_is_straight_line_python(self):
+        plan = compile({'a': S('a', 0, 'b') + K(1)}, backend='codegen')
+        self.assertIn("src['a'][0]['b']", plan.source)
+        self.assertIsNone(compile({}).source)
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, compile, {}, backend='nope')
+
+    def test_selectors_and_operators(self):
+        a, b = S('a'), S('b')
+        mapping = {
+            'opt': OptionalS('x', 'y', default=27),
+            'ops': [a + b, a - b, a * b, a / b, -a, ~a, a == b, a != b,
+                    a & b, a | b],
+            'slice': S('l')[1:],
+            'const': K({'not': 'a literal'}),
+            'raw': [1, 'two', None],
+        }
+        self.assert_same_as_bend(mapping, {'a': 10, 'b': 4, 'l': [1, 2]})
+
+    def test_functions(self):
+        mapping = {
+            'f': S('l') >> F(sorted, reverse=True),
+            'protected': S('n') >> F(int).protect(),
+            'list_op': S('l') >> Forall(lambda i: i + 1),
+            'custom': S('n') >> F(lambda n: 3) >> Double(),
+        }
+        self.assert_same_as_bend(mapping, {'l': [1, 3, 2], 'n': None})
+
+    def test_control_flow(self):
+        mapping = {
+            'if': If(S('c') == K('yes'), S('a'), S('b')),
+            'alt': Alternation(S('missing'), S('x', 0), S('a')),
+            'switch': Switch(S('c'), {'yes': S('b')}, default=S('a')),
+        }
+        for c in ['yes', 'no']:
+            self.assert_same_as_bend(mapping, {'c': c, 'a': 1, 'b': 2,
+                                               'x': []})
+
+    def test_alternation_errors(self):
+        plan = compile(Alternation(S('a'), S(0)), backend='codegen')
+        self.assertRaises(KeyError, plan, {})
+        self.assertRaises(ValueError,
+                          compile(Alternation(), backend='codegen'), {})
+
+    def test_alternation_of_context(self):
+        mapping = {'x': Alternation(Context(), K(1)),
+                   'y': Alternation(S('missing'), Context() >> S('c'))}
+        self.assert_same_as_bend(mapping, {}, {'c': 1})
+
+    def test_switch_without_default(self):
+        plan = compile(Switch(S('c'), {}), backend='codegen')
+        self.assertRaises(KeyError, plan, {'c': 1})
+
+    def test_format(self):
+        mapping = {
+            'fmt': Format('{} {last}', S('first'), last=S('last')),
+            'protected': ProtectedFormat('{} {}', S('first'), K(None)),
+        }
+        self.assert_same_as_bend(mapping, {'first': 'Ada', 'last': 'L.'})
+
+    def test_protected_format_constants(self):
+        mapping = {'a': ProtectedFormat('{} {}', K(1), S('a')),
+                   'b': ProtectedFormat('{} {x}', K(1), x=K('y')),
+                   'c': ProtectedFormat('{}', OptionalS('a') >> F(str))}
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            plan = compile(mapping, backend='codegen')
+        self.assertNotIn('1 is None', plan.source)
+        self.assertEqual(plan({'a': None}), bend(mapping, {'a': None}))
+        self.assertEqual(plan({'a': 2}), bend(mapping, {'a': 2}))
+
+    def test_selections_from_constants(self):
+        mappings = [{'a': K({'x': 1}) >> S('x'), 'b': K('ab') >> S(0),
+                     'c': K([1]) >> OptionalS(0), 'd': K(None) >> OptionalS(0),
+                     'e': Alternation(K({'x': 2}) >> S('x'), K(1))},
+                    {'a': Alternation(K(None) >> S('x'), K(1))},
+                    {'a': K(1) >> OptionalS('b', default=3)}]
+        for mapping in mappings:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                plan = compile(mapping, backend='codegen')
+            try:
+                expected = bend(mapping, {})
+            except BendingException as e:
+                with self.assertRaises(BendingException) as ctx:
+                    plan({})
+                self.assertEqual(str(ctx.exception), str(e))
+            else:
+                self.assertEqual(plan({}), expected)
+
+    def test_context(self):
+        mapping = {'a': Context() >> S('b'),
+                   'items': S('items') >> Forall.bend({'c': Context()}),
+                   'own': S('items') >> Forall.bend({'c': Context()}, 27)}
+        self.assert_same_as_bend(mapping, {'items': [1, 2]}, {'b': 23})
+
+    def test_deeply_nested_mapping(self):
+        mapping = S('v')
+        for i in range(60):
+            mapping = {'level': mapping,
+                       'opt': OptionalS('missing', default=i)}
+        self.assert_same_as_bend(mapping, {'v': 42})
+
+    def test_long_boolean_chain(self):
+        chain = S('a')
+        for _ in range(100):
+            chain = chain & S('a') | S('b')
+        self.assert_same_as_bend({'x': chain}, {'a': 0, 'b': 7})
+        self.assert_same_as_bend({'x': chain}, {'a': 1, 'b': 7})
+
+    def test_error_is_the_same_as_bend(self):
+        mapping = {'a': {'b': S('x')}}
+        with self.assertRaises(BendingException) as ctx:
+            bend(mapping, {})
+        with self.assertRaises(BendingException) as compiled_ctx:
+            compile(mapping, backend='codegen')({})
+        self.assertEqual(str(compiled_ctx.exception), str(ctx.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
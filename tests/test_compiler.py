@@ -0,0 +1,301 @@
+import pickle
+import unittest
+
+from jsonbender import (Context, F, K, OptionalS, S, bend, bend_columns,
+                        compile)
+from jsonbender.compiler import Plan
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import Bender, BendingException
+from jsonbender.list_ops import Filter, Forall, Reduce
+from jsonbender.string_ops import Format, ProtectedFormat
+
+
+class Double(Bender):
+    def execute(self, value):
+        return value * 2
+
+
+class TestCompile(unittest.TestCase):
+    def assert_same_as_bend(self, mapping, source, context=None):
+        expected = bend(mapping, source, context)
+        self.assertEqual(compile(mapping)(source, context), expected)
+
+    def test_returns_plan(self):
+        plan = compile({'a': S('a')})
+        self.assertIsInstance(plan, Plan)
+        self.assertIs(compile(plan), plan)
+
+    def test_reusable(self):
+        plan = compile({'a': S('a')})
+        self.assertEqual(plan({'a': 1}), {'a': 1})
+        self.assertEqual(plan({'a': 2}), {'a': 2})
+
+    def test_selectors_and_constants(self):
+        mapping = {
+            'deep': S('a', 0, 'b'),
+            'opt': OptionalS('a', 5, default=27),
+            'const': K('wow'),
+            'raw_const': 123,
+            'nested': {'list': [S('c'), 'x', {'d': S('c')}]},
+        }
+        self.assert_same_as_bend(mapping, {'a': [{'b': 42}], 'c': 'c'})
+
+    def test_operators(self):
+        a, b = S('a'), S('b')
+        mapping = {
+            'add': a + b, 'sub': a - b, 'mul': a * b, 'div': a / b,
+            'neg': -a, 'eq': a == b, 'ne': a != b, 'and': a & b,
+            'or': a | b, 'invert': ~a, 'getitem': S('l')[1:],
+        }
+        self.assert_same_as_bend(mapping, {'a': 10, 'b': 4, 'l': [1, 2]})
+
+    def test_boolean_operators_short_circuit(self):
+        mapping = {
+            'and': S('flag') & S('missing'),
+            'or': S('name') | S('missing'),
+            'chain': S('name') & S('flag') | K('fallback') | S('missing'),
+        }
+        source = {'flag': False, 'name': 'x'}
+        for backend in ('closure', 'codegen'):
+            self.assertEqual(compile(mapping, backend=backend)(source),
+                             bend(mapping, source))
+
+    def test_functions_and_composition(self):
+        mapping = {
+            'len': S('l') >> F(len),
+            'sorted': S('l') >> F(sorted, reverse=True),
+            'protected': S('n') >> F(int).protect(),
+            'list_ops': (S('l') >> Filter(lambda i: i > 1) >>
+                         Forall(lambda i: i * 10) >>
+                         Reduce(lambda acc, i: acc + i)),
+        }
+        self.assert_same_as_bend(mapping, {'l': [1, 2, 3], 'n': None})
+
+    def test_control_flow(self):
+        mapping = {
+            'if': If(S('c') == K('yes'), S('a'), S('b')),
+            'alt': Alternation(S('missing'), S('a')),
+            'switch': Switch(S('c'), {'yes': S('b')}, default=S('a')),
+        }
+        self.assert_same_as_bend(mapping, {'c': 'yes', 'a': 1, 'b': 2})
+        self.assert_same_as_bend(mapping, {'c': 'no', 'a': 1, 'b': 2})
+
+    def test_format(self):
+        mapping = {
+            'fmt': Format('{} {last}', S('first'), last=S('last')),
+            'protected': ProtectedFormat('{} {}', S('first'), K(None)),
+        }
+        self.assert_same_as_bend(mapping, {'first': 'Ada', 'last': 'L.'})
+
+    def test_context(self):
+        mapping = {'a': Context() >> S('b'),
+                   'items': S('items') >> Forall.bend({'c': Context()})}
+        self.assert_same_as_bend(mapping, {'items': [1, 2]}, {'b': 23})
+
+    def test_forall_bend_own_context(self):
+        mapping = {'items': S('items') >> Forall.bend({'c': Context()}, 27)}
+        self.assert_same_as_bend(mapping, {'items': [1, 2]}, {'b': 23})
+
+    def test_custom_bender(self):
+        self.assert_same_as_bend({'a': S('a') >> Double()}, {'a': 21})
+
+    def test_error_is_the_same_as_bend(self):
+        mapping = {'a': {'b': S('x')}}
+        with self.assertRaises(BendingException) as ctx:
+            bend(mapping, {})
+        with self.assertRaises(BendingException) as compiled_ctx:
+            compile(mapping)({})
+        self.assertEqual(str(compiled_ctx.exception), str(ctx.exception))
+
+    def test_non_dict_mapping(self):
+        self.assertEqual(compile(S('a'))({'a': 1}), 1)
+        self.assertRaises(KeyError, compile(S('a')), {})
+
+    def test_pickle_roundtrip(self):
+        for backend in ['closure', 'codegen']:
+            plan = compile({'b': S('a')}, backend=backend)
+            unpickled = pickle.loads(pickle.dumps(plan))
+            self.assertEqual(unpickled.backend, backend)
+            self.assertEqual(unpickled({'a': 1}), {'b': 1})
+
+
+class CountingDict(dict):
+    def __init__(self, *args, **kwargs):
+        super(CountingDict, self).__init__(*args, **kwargs)
+        self.lookups = 0
+
+    def __getitem__(self, key):
+        self.lookups += 1
+        return super(CountingDict, self).__getitem__(key)
+
+
+class TestSharedSelectors(unittest.TestCase):
+    backends = ['closure', 'codegen']
+
+    def test_shared_selector_is_evaluated_once(self):
+        mapping = {'a': S('data', 'x'),
+                   'b': S('data', 'x') + K(1),
+                   'c': S('data') >> S('x'),
+                   'd': OptionalS('data', 'x'),
+                   'e': Format('{}', S('data', 'x'))}
+        for backend in self.backends:
+            source = CountingDict(data={'x': 1})
+            got = compile(mapping, backend=backend)(source)
+            self.assertEqual(source.lookups, 1)
+            self.assertEqual(got, bend(mapping, source))
+
+    def test_shared_prefix_is_evaluated_once(self):
+        mapping = {'x': S('data', 'attrs', 'x'),
+                   'y': OptionalS('data', 'attrs', 'y', default=0),
+                   'z': S('data', 'attrs') >> F(len),
+                   'w': Context() >> S('data', 'attrs', 'x')}
+        for backend in self.backends:
+            attrs = CountingDict(x=1)
+            data = CountingDict(attrs=attrs)
+            source = CountingDict(data=data)
+            got = compile(mapping, backend=backend)(source, source)
+            self.assertEqual(source.lookups, 2)
+            self.assertEqual(data.lookups, 2)
+            self.assertEqual(attrs.lookups, 3)
+            self.assertEqual(got, bend(mapping, source, source))
+
+    def test_missing_shared_prefix(self):
+        mapping = {'x': OptionalS('d', 'a', 'x', default=1),
+                   'y': OptionalS('d', 'a', 'y', default=2)}
+        for backend in self.backends:
+            plan = compile(mapping, backend=backend)
+            self.assertEqual(plan({'d': {}}), {'x': 1, 'y': 2})
+            self.assertEqual(plan({}), {'x': 1, 'y': 2})
+            failing = dict(mapping, z=S('d', 'a', 'z'))
+            with self.assertRaises(BendingException) as ctx:
+                compile(failing, backend=backend)({'d': {}})
+            self.assertEqual(str(ctx.exception), "Error for key z: 'a'")
+
+    def test_memo_is_per_source(self):
+        mapping = {'a': S('d', 'x'), 'b': S('d', 'x')}
+        for backend in self.backends:
+            plan = compile(mapping, backend=backend)
+            self.assertEqual(plan({'d': {'x': 1}}), {'a': 1, 'b': 1})
+            self.assertEqual(plan({'d': {'x': 2}}), {'a': 2, 'b': 2})
+
+    def test_shared_context_selector(self):
+        mapping = {'a': Context() >> S('d', 'x'),
+                   'b': Context() >> S('d') >> S('x')}
+        for backend in self.backends:
+            plan = compile(mapping, backend=backend)
+            self.assertEqual(plan({}, {'d': {'x': 1}}), {'a': 1, 'b': 1})
+
+    def test_missing_shared_path(self):
+        optional_mapping = {'a': OptionalS('d', 'x', default=27),
+                            'b': OptionalS('d', 'x')}
+        mapping = {'a': OptionalS('d', 'x', default=27), 'b': S('d', 'x')}
+        for backend in self.backends:
+            plan = compile(optional_mapping, backend=backend)
+            self.assertEqual(plan({'d': {}}), {'a': 27, 'b': None})
+            with self.assertRaises(BendingException) as ctx:
+                compile(mapping, backend=backend)({'d': {}})
+            self.assertEqual(str(ctx.exception), "Error for key b: 'x'")
+
+
+    def test_source_selection_before_context(self):
+        mapping = {'x': S('missing') >> Context() >> S('c', 'd'),
+                   'y': Context() >> S('c', 'd')}
+        probed = {'x': Alternation(S('missing') >> Context(), K(2))}
+        context = {'c': {'d': 1}}
+        self.assertRaises(BendingException, bend, mapping, {}, context)
+        self.assertRaises(BendingException, bend_columns, mapping, [{}],
+                          context)
+        self.assertEqual(bend_columns(mapping, [{'missing': 0}], context),
+                         {'x': [1], 'y': [1]})
+        for backend in self.backends:
+            plan = compile(mapping, backend=backend)
+            with self.assertRaises(BendingException) as ctx:
+                plan({}, context)
+            self.assertEqual(str(ctx.exception),
+                             "Error for key x: 'missing'")
+            self.assertEqual(plan({'missing': 0}, context), {'x': 1, 'y': 1})
+            self.assertEqual(compile(probed, backend=backend)({}, context),
+                             bend(probed, {}, context))
+
+def translate(selector, pairs, default=K(None)):
+    """
+    Build a chain of `If`s returning `value` when `selector == K(literal)`,
+    for each `(literal, value)` of `pairs`.
+    """
+    for literal, value in reversed(pairs):
+        default = If(selector == K(literal), value, default)
+    return default
+
+
+class TestIfChains(unittest.TestCase):
+    backends = ['closure', 'codegen']
+
+    def assert_same_as_bend(self, mapping, sources):
+        for backend in self.backends:
+            plan = compile(mapping, backend=backend)
+            for source in sources:
+                self.assertEqual(plan(source), bend(mapping, source))
+
+    def test_translation(self):
+        pairs = [('type_{}'.format(i), K(i)) for i in range(30)]
+        mapping = {'code': translate(S('type'), pairs, K(-1)),
+                   'nested': translate(S('a', 'type'), pairs)}
+        sources = [{'type': t, 'a': {'type': t}}
+                   for t in ['type_0', 'type_17', 'type_29', 'other']]
+        self.assert_same_as_bend(mapping, sources)
+
+    def test_selector_is_evaluated_once(self):
+        mapping = translate(S('type'), [(i, K(i * 10)) for i in range(10)])
+        for backend in self.backends:
+            source = CountingDict(type=7)
+            self.assertEqual(compile(mapping, backend=backend)(source), 70)
+            self.assertEqual(source.lookups, 1)
+
+    def test_branches_are_benders(self):
+        mapping = translate(S('t'), [('a', S('x')), ('b', S('y') + K(1)),
+                                     ('c', F(len))], S('z'))
+        sources = [{'t': 'a', 'x': 1}, {'t': 'b', 'y': 2},
+                   {'t': 'c', 'z': 3}, {'t': 'd', 'z': 4}]
+        self.assert_same_as_bend(mapping, sources)
+
+    def test_first_equal_literal_wins(self):
+        mapping = If(K(True) == S('v'), K('true'),
+                     translate(S('v'), [(1, K('one')), (1.0, K('float')),
+                                        (0, K('zero'))], K('none')))
+        sources = [{'v': v} for v in [True, 1, 1.0, False, 0, 2, 'x']]
+        self.assert_same_as_bend(mapping, sources)
+
+    def test_unhashable_values(self):
+        class AnyList(list):
+            def __eq__(self, other):
+                return True
+            __hash__ = None
+
+        mapping = translate(S('v'), [('a', K(1)), ('b', K(2))], K(3))
+        sources = [{'v': []}, {'v': {}}, {'v': AnyList()}]
+        self.assert_same_as_bend(mapping, sources)
+
+    def test_unusable_literals_end_the_chain(self):
+        nan = float('nan')
+        mapping = translate(S('v'), [(1, K('one')), (2, K('two')),
+                                     (nan, K('nan')), ([3], K('list')),
+                                     (4, K('four')), (5, K('five'))])
+        sources = [{'v': v} for v in [1, 2, nan, [3], 4, 5, 6]]
+        self.assert_same_as_bend(mapping, sources)
+
+    def test_different_selectors_end_the_chain(self):
+        mapping = translate(S('a'), [(1, K('a1')), (2, K('a2'))],
+                            translate(S('b'), [(1, K('b1')), (2, K('b2'))]))
+        sources = [{'a': 1, 'b': 2}, {'a': 3, 'b': 2}, {'a': 3, 'b': 3}]
+        self.assert_same_as_bend(mapping, sources)
+
+    def test_missing_selector(self):
+        mapping = {'x': translate(S('type'), [('a', K(1)), ('b', K(2))])}
+        for backend in self.backends:
+            with self.assertRaises(BendingException) as ctx:
+                compile(mapping, backend=backend)({})
+            self.assertEqual(str(ctx.exception), "Error for key x: 'type'")
+
+
+if __name__ == '__main__':
+    unittest.main()
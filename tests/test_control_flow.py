@@ -1,8 +1,9 @@
 from operator import add
 import unittest
 
-from jsonbender import Context, K, S, bend
+from jsonbender import Context, F, K, OptionalS, S, bend, compile
 from jsonbender.control_flow import If, Alternation, Switch
+from jsonbender.core import Bender
 from jsonbender.test import BenderTestMixin
 
 
@@ -31,6 +32,11 @@ class TestIf(BenderTestMixin, unittest.TestCase):
         if_ = If(S('country') == K('China'), S('first_name'))
         self.assert_bender(if_, self.guga, None)
 
+    def test_context(self):
+        if_ = If(Context() >> S('flag'), Context() >> S('a'), S('b'))
+        self.assert_bender(if_, {'b': 2}, 1, context={'flag': True, 'a': 1})
+        self.assert_bender(if_, {'b': 2}, 2, context={'flag': False})
+
 
 class TestAlternation(BenderTestMixin, unittest.TestCase):
     def test_empty_benders(self):
@@ -46,6 +52,45 @@ class TestAlternation(BenderTestMixin, unittest.TestCase):
         self.assertRaises(IndexError, Alternation(S(1)), [])
         self.assertRaises(KeyError, Alternation(S(1)), {})
 
+    def test_raises_last_error(self):
+        mapping = {'x': Alternation(S('a'), S('b', 0) >> S('c'))}
+        plans = [compile(mapping, backend=backend)
+                 for backend in ['closure', 'codegen']]
+        cases = [({}, "'b'"),
+                 ({'b': []}, 'list index out of range'),
+                 ({'b': [{}]}, "'c'")]
+        for source, error in cases:
+            for bend_func in [lambda s: bend(mapping, s)] + plans:
+                with self.assertRaises(Exception) as ctx:
+                    bend_func(source)
+                self.assertEqual(str(ctx.exception),
+                                 'Error for key x: ' + error)
+
+    def test_custom_benders_raising_lookup_error(self):
+        class Missing(Bender):
+            def execute(self, source):
+                raise KeyError('custom')
+
+        class Upper(S):
+            def execute(self, source):
+                return super(Upper, self).execute(source).upper()
+
+        bender = Alternation(Missing(), Upper('a'), K('default'))
+        self.assert_bender(bender, {'a': 'x'}, 'X')
+        self.assert_bender(bender, {}, 'default')
+        self.assertRaises(KeyError, Alternation(S('a'), Missing()), {})
+
+    def test_composed_selectors(self):
+        bender = Alternation(S('a') >> S('b'), S('c')[0], OptionalS('d'),
+                             S('e'))
+        self.assert_bender(bender, {'a': {'b': 1}}, 1)
+        self.assert_bender(bender, {'a': {}, 'c': [2]}, 2)
+        self.assert_bender(bender, {'c': []}, None)
+
+    def test_functions_are_not_probed(self):
+        bender = Alternation(S('a') >> F(lambda v: v['b']), K(3))
+        self.assert_bender(bender, {'a': {}}, 3)
+
 
 class TestSwitch(BenderTestMixin, unittest.TestCase):
     def test_match(self):
@@ -1,9 +1,12 @@
+import abc
 import unittest
 
 import sys
 
-from jsonbender import S, K
-from jsonbender.core import bend, BendingException, Context
+from jsonbender import Forall, S, K
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import (Bender, bend, BendingException, Context,
+                             Transport)
 from jsonbender.test import BenderTestMixin
 
 
@@ -133,6 +136,29 @@ class TestOperators(unittest.TestCase, BenderTestMixin):
         self.assert_bender(K(False) | K(True), None, True)
         self.assert_bender(K(False) | K(False), None, False)
 
+    def test_and_short_circuits(self):
+        self.assert_bender(K(0) & S('missing'), {}, 0)
+        self.assert_bender(K(1) & K('') & S('missing'), {}, '')
+        self.assert_bender(K(1) & K(2) & K(3), None, 3)
+
+    def test_or_short_circuits(self):
+        self.assert_bender(K('x') | S('missing'), {}, 'x')
+        self.assert_bender(K(0) | K([]) | K(None), None, None)
+
+    def test_boolean_chains_are_flattened(self):
+        a, b, c, d = K(1), K(2), K(3), K(4)
+        self.assertEqual((a & b & c & d).benders, [a, b, c, d])
+        self.assertEqual((a | (b | c)).benders, [a, b, c])
+        mixed = (a & b) | c
+        self.assertEqual(len(mixed.benders), 2)
+        self.assertEqual(mixed.benders[0].benders, [a, b])
+
+    def test_long_boolean_chain(self):
+        chain = K(True)
+        for _ in range(5000):
+            chain = chain & K(True)
+        self.assert_bender(chain, None, True)
+
     def test_invert(self):
         self.assert_bender(~K(True), None, False)
         self.assert_bender(~K(False), None, True)
@@ -148,5 +174,114 @@ class TestGetItem(unittest.TestCase, BenderTestMixin):
         self.assert_bender(bender, {'val': val}, [2, 4, 6])
 
 
+class Double(Bender):
+    def execute(self, value):
+        return value * 2
+
+
+class Legacy(Bender):
+    """
+    A bender written against the old `raw_execute()` interface.
+    """
+    def raw_execute(self, source):
+        transport = Transport.from_source(source)
+        return Transport((transport.value, transport.context['x']),
+                         transport.context)
+
+
+class LoggedS(S):
+    calls = 0
+
+    def raw_execute(self, source):
+        LoggedS.calls += 1
+        return super(LoggedS, self).raw_execute(source)
+
+
+class HalfS(S):
+    def execute(self, source):
+        return super(HalfS, self).execute(source) / 2
+
+
+class WrappedIf(If):
+    def execute(self, value):
+        return ('wrapped', super(WrappedIf, self).execute(value))
+
+
+class CustomSwitch(Switch):
+    def execute(self, value):
+        return 'custom'
+
+
+class FirstOrNone(Alternation):
+    def execute(self, value):
+        try:
+            return super(FirstOrNone, self).execute(value)
+        except LookupError:
+            return None
+
+
+class CountingForallBend(type(Forall.bend({}))):
+    def execute(self, value):
+        return len(super(CountingForallBend, self).execute(value))
+
+
+class Abstract(Bender, abc.ABCMeta('ABC', (object,), {})):
+    @abc.abstractmethod
+    def execute(self, value):
+        pass
+
+
+class Concrete(Abstract):
+    def execute(self, value):
+        return -value
+
+
+class TestSubclasses(unittest.TestCase, BenderTestMixin):
+    def test_execute_override(self):
+        self.assert_bender(S('a') >> Double() + K(1), {'a': 2}, 5)
+        self.assert_bender(HalfS('a') + K(1), {'a': 2}, 2)
+
+    def test_raw_execute_override(self):
+        bender = S('a') >> Legacy()
+        self.assert_bender(bender, {'a': 1}, (1, 2), context={'x': 2})
+        self.assertEqual(bend({'b': [bender]}, {'a': 1}, {'x': 2}),
+                         {'b': [(1, 2)]})
+
+    def test_raw_execute_override_calling_super(self):
+        LoggedS.calls = 0
+        self.assert_bender(LoggedS('a') + LoggedS('b'), {'a': 1, 'b': 2}, 3)
+        self.assertEqual(LoggedS.calls, 2)
+
+    def test_builtin_execute_override(self):
+        self.assert_bender(WrappedIf(S('a'), K(1), K(2)), {'a': True},
+                           ('wrapped', 1))
+        self.assert_bender(CustomSwitch(S('a'), {1: K('one')}), {'a': 1},
+                           'custom')
+        self.assert_bender(FirstOrNone(S('a'), S('b')), {}, None)
+        self.assert_bender(FirstOrNone(S('a'), S('b')), {'b': 2}, 2)
+        self.assert_bender(
+            S('a') >> CountingForallBend({'b': S('c')}), {'a': [{'c': 1}]}, 1)
+        self.assertEqual(bend({'x': WrappedIf(S('a'), K(1))}, {'a': True}),
+                         {'x': ('wrapped', 1)})
+
+    def test_builtin_execute(self):
+        self.assertEqual(If(S('a'), K(1), K(2)).execute({'a': False}), 2)
+        self.assertEqual(Switch(S('a'), {1: K('one')}).execute({'a': 1}),
+                         'one')
+        self.assertEqual(Alternation(S('a'), K(3)).execute({}), 3)
+        self.assertEqual(Forall.bend({'b': S('a')}).execute([{'a': 1}]),
+                         [{'b': 1}])
+
+    def test_own_metaclass(self):
+        self.assertIsInstance(Abstract, abc.ABCMeta)
+        with self.assertRaises(TypeError):
+            Abstract()
+        self.assert_bender(S('a') >> Concrete(), {'a': 2}, -2)
+
+    def test_builtin_raw_execute(self):
+        got = (S('a') + K(1)).raw_execute(Transport({'a': 1}, {'c': 2}))
+        self.assertEqual((got.value, got.context), (2, {'c': 2}))
+
+
 if __name__ == '__main__':
     unittest.main()
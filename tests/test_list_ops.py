@@ -1,8 +1,12 @@
 from operator import add
+import pickle
 import unittest
 
-from jsonbender import Context, K, S, bend
-from jsonbender.list_ops import Forall, FlatForall, Filter, ListOp, Reduce
+from jsonbender import Context, F, K, S, bend
+from jsonbender.core import Compose
+from jsonbender.list_ops import (Aggregate, Count, Forall, FlatForall,
+                                 Filter, FusedListOp, Join, ListOp, Lookup,
+                                 Max, Mean, Min, Reduce, Sum)
 from jsonbender.test import BenderTestMixin
 
 
@@ -102,6 +106,253 @@ class TestFlatForall(ListOpTestCase):
         self.assert_bender(bender, {}, [1])
 
 
+class TestFusion(unittest.TestCase, BenderTestMixin):
+    def test_chain_is_fused(self):
+        bender = (S('items') >> Filter(lambda i: i % 2 == 0) >>
+                  Forall(lambda i: i * 10) >> Reduce(add))
+        self.assertIsInstance(bender, Compose)
+        self.assertIsInstance(bender._second, FusedListOp)
+        self.assertEqual(len(bender._second._ops), 3)
+        self.assert_bender(bender, {'items': range(5)}, 60)
+
+    def test_lshift_is_fused(self):
+        bender = Forall(lambda i: [i, i]) << Filter(bool)
+        self.assertIsInstance(bender, FusedListOp)
+
+    def test_fused_results(self):
+        bender = (FlatForall(lambda i: [i, -i]) >> Filter(bool) >>
+                  Forall(abs))
+        self.assert_bender(bender, [0, 1, 2], [1, 1, 2, 2])
+        self.assert_bender(bender, [], [])
+
+    def test_single_pass(self):
+        calls = []
+
+        def f(i):
+            calls.append(('f', i))
+            return i
+
+        def p(i):
+            calls.append(('p', i))
+            return True
+
+        bender = Filter(p) >> Forall(f)
+        self.assert_bender(bender, iter([1, 2]), [1, 2])
+        self.assertEqual(calls, [('p', 1), ('f', 1), ('p', 2), ('f', 2)])
+
+    def test_fused_reduce_on_empty_list(self):
+        bender = Filter(bool) >> Reduce(add)
+        self.assertRaises(ValueError, bender, [0, 0])
+
+    def test_fused_reduce_propagates_type_errors(self):
+        bender = Forall(lambda i: i + 'a') >> Reduce(add)
+        self.assertRaises(TypeError, bender, [1])
+
+    def test_fused_reduce_translates_reducer_errors(self):
+        bender = Forall(lambda i: i) >> Reduce(add)
+        self.assertIsInstance(bender, FusedListOp)
+        # the same error as the unfused Reduce
+        self.assertRaises(ValueError, Reduce(add), [1, 'a'])
+        self.assertRaises(ValueError, bender, [1, 'a'])
+        self.assertRaises(ValueError, S('xs') >> bender, {'xs': [1, 'a']})
+
+    def test_nothing_is_fused_after_reduce(self):
+        bender = Forall(abs) >> Reduce(add) >> Forall(abs)
+        self.assertIsInstance(bender, Compose)
+
+    def test_forall_bend_is_not_fused(self):
+        self.assertIsInstance(Forall.bend({}) >> Filter(bool), Compose)
+        self.assertIsInstance(Forall(abs) >> Forall.bend({}), Compose)
+
+
+class TestAggregations(unittest.TestCase, BenderTestMixin):
+    items = [{'price': 3, 'qty': 1}, {'price': 1, 'qty': 4},
+             {'price': 2, 'qty': 2}]
+
+    def test_whole_values(self):
+        self.assert_bender(Sum(), [1, 4, 6], 11)
+        self.assert_bender(Count(), [1, 4, 6], 3)
+        self.assert_bender(Min(), [4, 1, 6], 1)
+        self.assert_bender(Max(), [4, 1, 6], 6)
+        self.assert_bender(Mean(), [1, 2, 6], 3.0)
+
+    def test_selected_values(self):
+        self.assert_bender(Sum(S('price')), self.items, 6)
+        self.assert_bender(Min(S('qty')), self.items, 1)
+        self.assert_bender(Max(lambda i: i['price'] * i['qty']),
+                           self.items, 4)
+        self.assert_bender(Sum(S('price') * S('qty')), self.items, 11)
+
+    def test_iterators(self):
+        self.assert_bender(Count(), iter([1, 2]), 2)
+        self.assert_bender(Sum(S('price')), iter(self.items), 6)
+
+    def test_empty_list(self):
+        self.assert_bender(Sum(), [], 0)
+        self.assert_bender(Count(), [], 0)
+        self.assertRaises(ValueError, Min(), [])
+        self.assertRaises(ValueError, Max(), [])
+        self.assertRaises(ValueError, Mean(), [])
+
+    def test_context(self):
+        bender = Sum(Context() >> S('bonus'))
+        self.assertEqual(bend({'a': S('a') >> bender}, {'a': [1, 2]},
+                              {'bonus': 5}),
+                         {'a': 10})
+
+    def test_aggregate(self):
+        bender = S('items') >> Aggregate(lines=Count(),
+                                         total=Sum(S('price')),
+                                         lowest=Min(S('price')),
+                                         highest=Max(S('price')),
+                                         average=Mean(S('price')),
+                                         quantity=Sum(S('qty')),
+                                         first=S(0, 'price'))
+        self.assert_bender(bender, {'items': self.items},
+                           {'lines': 3, 'total': 6, 'lowest': 1,
+                            'highest': 3, 'average': 2.0, 'quantity': 7,
+                            'first': 3})
+
+    def test_aggregate_selects_values_once(self):
+        calls = []
+
+        def price(item):
+            calls.append(item)
+            return item['price']
+
+        bender = Aggregate(total=Sum(price), highest=Max(price),
+                           total_qty=Sum(S('qty')), max_qty=Max(S('qty')))
+        self.assert_bender(bender, iter(self.items),
+                           {'total': 6, 'highest': 3, 'total_qty': 7,
+                            'max_qty': 4})
+        self.assertEqual(len(calls), len(self.items))
+
+    def test_aggregate_errors(self):
+        self.assertRaises(ValueError, Aggregate(lowest=Min()), [])
+        self.assertRaises(KeyError, Aggregate(total=Sum(S('x'))), [{}])
+
+
+class CountingKey(object):
+    def __init__(self, key):
+        self.key = key
+        self.calls = 0
+
+    def __call__(self, element):
+        self.calls += 1
+        return element[self.key]
+
+
+class TestLookup(unittest.TestCase, BenderTestMixin):
+    products = [{'id': 1, 'name': 'tea'}, {'id': 2, 'name': 'cake'},
+                {'id': 2, 'name': 'pie'}]
+
+    def test_lookup(self):
+        bender = Lookup(K(self.products), S('id'))
+        self.assert_bender(bender, 1, {'id': 1, 'name': 'tea'})
+        # the first match wins
+        self.assert_bender(bender, 2, {'id': 2, 'name': 'cake'})
+        self.assertRaises(KeyError, bender, 3)
+
+    def test_many(self):
+        bender = Lookup(K(self.products), S('id'), many=True)
+        self.assert_bender(bender, 2, self.products[1:])
+        self.assert_bender(bender, 3, [])
+
+    def test_index_is_reused_with_the_same_context(self):
+        key = CountingKey('id')
+        mapping = {'names': S('ids') >> Forall.bend(
+            Lookup(Context() >> S('products'), key) >> S('name'))}
+        context = {'products': self.products}
+        for _ in range(2):
+            self.assertEqual(bend(mapping, {'ids': [1, 2, 1]}, context),
+                             {'names': ['tea', 'cake', 'tea']})
+        self.assertEqual(key.calls, len(self.products))
+        new_context = {'products': [{'id': 1, 'name': 'coffee'}]}
+        self.assertEqual(bend(mapping, {'ids': [1]}, new_context),
+                         {'names': ['coffee']})
+        self.assertEqual(key.calls, len(self.products) + 1)
+
+    def test_index_from_source_is_not_reused(self):
+        key = CountingKey('id')
+        bender = Lookup(F(lambda i: self.products), key, many=True)
+        self.assert_bender(bender, 1, [self.products[0]])
+        self.assert_bender(bender, 1, [self.products[0]])
+        self.assertEqual(key.calls, 2 * len(self.products))
+
+    def test_key_from_context_is_not_reused(self):
+        bender = Lookup(K(self.products), Context() >> S('key'))
+        self.assertEqual(bend(bender, 'x', {'key': 'x'}), self.products[0])
+        self.assertFalse(bender._table._reusable)
+
+    def test_pickle_drops_the_index(self):
+        bender = Lookup(K(self.products), S('id'))
+        bender(1)
+        copy = pickle.loads(pickle.dumps(bender))
+        self.assertIsNone(copy._table._cached)
+        self.assert_bender(copy, 2, {'id': 2, 'name': 'cake'})
+
+
+class TestJoin(unittest.TestCase, BenderTestMixin):
+    source = {'lines': [{'product_id': 2, 'qty': 1},
+                        {'product_id': 3, 'qty': 2},
+                        {'product_id': 1, 'qty': 3}],
+              'products': [{'id': 1, 'name': 'tea'},
+                           {'id': 2, 'name': 'cake'},
+                           {'id': 2, 'name': 'pie'}]}
+
+    def join(self, how):
+        return Join(S('lines'), S('products'), S('product_id'), S('id'),
+                    how=how)
+
+    def test_inner(self):
+        lines, products = self.source['lines'], self.source['products']
+        self.assert_bender(self.join('inner'), self.source,
+                           [(lines[0], products[1]), (lines[0], products[2]),
+                            (lines[2], products[0])])
+
+    def test_left(self):
+        lines, products = self.source['lines'], self.source['products']
+        self.assert_bender(self.join('left'), self.source,
+                           [(lines[0], products[1]), (lines[0], products[2]),
+                            (lines[1], None), (lines[2], products[0])])
+
+    def test_many(self):
+        lines, products = self.source['lines'], self.source['products']
+        self.assert_bender(self.join('many'), self.source,
+                           [(lines[0], products[1:]), (lines[1], []),
+                            (lines[2], products[:1])])
+
+    def test_same_key_and_functions(self):
+        bender = Join(K([1, 2]), K([2, 3]), lambda i: i % 2) >> Forall(list)
+        self.assert_bender(bender, {}, [[1, 3], [2, 2]])
+
+    def test_right_from_context(self):
+        key = CountingKey('id')
+        bender = Join(S('lines'), Context() >> S('products'),
+                      S('product_id'), key) >> Forall(
+                          lambda pair: pair[1]['name'])
+        context = {'products': self.source['products']}
+        for _ in range(2):
+            self.assertEqual(bend(bender, self.source, context),
+                             ['cake', 'pie', 'tea'])
+        self.assertEqual(key.calls, 3)
+
+    def test_result_can_be_bent(self):
+        bender = self.join('inner') >> Forall.bend({'qty': S(0, 'qty'),
+                                                    'name': S(1, 'name')})
+        self.assert_bender(bender, self.source,
+                           [{'qty': 1, 'name': 'cake'},
+                            {'qty': 1, 'name': 'pie'},
+                            {'qty': 3, 'name': 'tea'}])
+
+    def test_invalid_how(self):
+        self.assertRaises(ValueError, Join, K([]), K([]), S('a'), how='x')
+
+    def test_pickle(self):
+        copy = pickle.loads(pickle.dumps(self.join('inner')))
+        self.assertEqual(copy(self.source), self.join('inner')(self.source))
+
+
 if __name__ == '__main__':
     unittest.main()
 
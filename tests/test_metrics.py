@@ -0,0 +1,223 @@
+import unittest
+
+from jsonbender import (F, Forall, K, S, bend, bend_columns, bend_many,
+                        bend_parallel, compile)
+from jsonbender import core
+from jsonbender._compat import PY2
+from jsonbender.core import BendingException
+from jsonbender.metrics import (Histogram, Metrics, Observer, register,
+                                unregister)
+
+
+class Recorder(Observer):
+    def __init__(self, trace_every=None):
+        self.trace_every = trace_every
+        self.calls = []
+
+    def bent(self, mapping, count, seconds):
+        self.calls.append(('bent', count))
+
+    def failed(self, mapping, key, exception):
+        self.calls.append(('failed', key))
+
+    def traced(self, mapping, source, stats):
+        self.calls.append(('traced', source, len(stats)))
+
+
+class ObserverTestCase(unittest.TestCase):
+    def register(self, observer):
+        register(observer)
+        self.addCleanup(unregister, observer)
+        return observer
+
+
+class TestObservers(ObserverTestCase):
+    def test_no_hook_without_observers(self):
+        self.assertIsNone(core._observe)
+        recorder = self.register(Recorder())
+        self.assertIsNotNone(core._observe)
+        unregister(recorder)
+        self.assertIsNone(core._observe)
+        register(recorder)
+
+    def test_bend(self):
+        recorder = self.register(Recorder())
+        self.assertEqual(bend({'b': S('a')}, {'a': 1}), {'b': 1})
+        self.assertEqual(recorder.calls, [('bent', 1)])
+
+    def test_bend_error_keys(self):
+        recorder = self.register(Recorder())
+        mapping = {'a': {'b': S('x')}, 'c': K(1)}
+        with self.assertRaises(BendingException):
+            bend(mapping, {})
+        with self.assertRaises(KeyError):
+            bend(S('x'), {})
+        self.assertEqual(recorder.calls, [('failed', 'a.b'),
+                                          ('failed', None)])
+
+    def test_nested_bendings_are_not_observed(self):
+        recorder = self.register(Recorder())
+        mapping = {'items': S('items') >> Forall.bend({'b': S('a')})}
+        bend(mapping, {'items': [{'a': 1}, {'a': 2}]})
+        self.assertEqual(recorder.calls, [('bent', 1)])
+
+    def test_bend_many(self):
+        recorder = self.register(Recorder())
+        errors = []
+        plan = compile({'b': S('a')})
+        results = list(bend_many(plan, [{'a': 1}, {}, {'a': 3}],
+                                 errors=errors))
+        self.assertEqual(results, [{'b': 1}, {'b': 3}])
+        self.assertEqual(recorder.calls, [('bent', 1), ('failed', 'b'),
+                                          ('bent', 1)])
+
+    def test_bend_columns(self):
+        recorder = self.register(Recorder())
+        errors = []
+        bend_columns({'b': S('a')}, [{'a': 1}, {}, {'a': 3}], errors=errors)
+        self.assertEqual(recorder.calls, [('failed', 'b'), ('bent', 2)])
+
+    @unittest.skipIf(PY2, 'concurrent.futures is not available')
+    def test_bend_parallel(self):
+        recorder = self.register(Recorder())
+        errors = []
+        sources = [{'a': i} if i % 3 else {} for i in range(10)]
+        results = list(bend_parallel({'b': S('a')}, sources, errors=errors,
+                                     workers=2, chunksize=5))
+        self.assertEqual(len(results), 6)
+        self.assertEqual(sorted(recorder.calls),
+                         [('bent', 3), ('bent', 3)] + [('failed', 'b')] * 4)
+
+    def test_sampled_traces(self):
+        recorder = self.register(Recorder(trace_every=2))
+        for i in range(4):
+            self.assertEqual(bend({'b': S('a') + K(1)}, {'a': i}),
+                             {'b': i + 1})
+        traces = [c for c in recorder.calls if c[0] == 'traced']
+        self.assertEqual(traces, [('traced', {'a': 1}, 3),
+                                  ('traced', {'a': 3}, 3)])
+        self.assertEqual(len(recorder.calls), 6)
+
+    def test_sampling_is_per_observer(self):
+        first = self.register(Recorder(trace_every=2))
+        bend({'b': S('a')}, {'a': 0})
+        second = self.register(Recorder(trace_every=2))
+        for i in range(1, 4):
+            bend({'b': S('a')}, {'a': i})
+        self.assertEqual([c[1] for c in first.calls if c[0] == 'traced'],
+                         [{'a': 1}, {'a': 3}])
+        self.assertEqual([c[1] for c in second.calls if c[0] == 'traced'],
+                         [{'a': 2}])
+        unregister(second)
+        register(second)
+        bend({'b': S('a')}, {'a': 4})
+        self.assertEqual(len(second.calls), 5)
+
+
+class TestMetrics(ObserverTestCase):
+    def test_snapshot(self):
+        mapping = {'b': S('a') >> F(int)}
+        metrics = self.register(Metrics(names={'ints': mapping}))
+        for source in [{'a': '1'}, {'a': 'x'}, {'a': '2'}, {}]:
+            try:
+                bend(mapping, source)
+            except BendingException:
+                pass
+        snapshot, = metrics.snapshot()
+        self.assertEqual(snapshot['name'], 'ints')
+        self.assertEqual(snapshot['records'], 2)
+        self.assertEqual(snapshot['errors'], {'b': 2})
+        self.assertEqual(snapshot['latency']['count'], 2)
+        self.assertGreater(snapshot['records_per_second'], 0)
+        self.assertEqual(metrics.histogram(mapping).count, 2)
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), [])
+
+    def test_inline_mappings_are_bounded(self):
+        named = {'a': S('a')}
+        metrics = self.register(Metrics(names={'named': named}, unnamed=3))
+        for i in range(1000):
+            bend({'a': S('a')}, {'a': i})
+            bend(named, {'a': i})
+        snapshot = {m['name']: m for m in metrics.snapshot()}
+        self.assertEqual(len(snapshot), 5)
+        self.assertEqual(len(metrics._unnamed), 3)
+        self.assertEqual(snapshot['named']['records'], 1000)
+        self.assertEqual(snapshot['other']['records'], 997)
+        self.assertEqual(snapshot['other']['latency']['count'], 997)
+        self.assertEqual(sum(m['records'] for m in snapshot.values()), 2000)
+
+    def test_unnamed_mappings_grouped(self):
+        metrics = self.register(Metrics(unnamed=0))
+        for i in range(10):
+            try:
+                bend({'a': S('a')}, {})
+            except BendingException:
+                pass
+        snapshot, = metrics.snapshot()
+        self.assertEqual((snapshot['name'], snapshot['errors']),
+                         ('other', {'a': 10}))
+
+    def test_traces(self):
+        metrics = self.register(Metrics(trace_every=1, traces=2))
+        mapping = {'b': S('a')}
+        for i in range(3):
+            bend(mapping, {'a': i})
+        snapshot, = metrics.snapshot()
+        self.assertEqual(len(snapshot['traces']), 2)
+        self.assertEqual(snapshot['traces'][0][0]['key'], 'b')
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.quantile(0.5))
+        self.assertEqual(histogram.summary()['count'], 0)
+
+    def test_small_values_are_exact(self):
+        histogram = Histogram(unit=1)
+        for value in range(100):
+            histogram.record(value)
+        self.assertEqual(histogram.quantile(0.5), 49)
+        self.assertEqual(histogram.quantile(1), 99)
+        self.assertEqual(histogram.min, 0)
+        self.assertEqual(histogram.mean, 49.5)
+
+    def test_relative_precision(self):
+        for precision in [1, 2, 3]:
+            histogram = Histogram(precision, unit=1)
+            values = [int(1.1 ** i) for i in range(200)]
+            for value in values:
+                histogram.record(value)
+            for q in [0.25, 0.5, 0.9, 0.99]:
+                exact = values[int(q * len(values)) - 1]
+                self.assertLessEqual(histogram.quantile(q), exact *
+                                     (1 + 10 ** -precision))
+                self.assertGreaterEqual(histogram.quantile(q), exact)
+
+    def test_bounded_buckets(self):
+        histogram = Histogram()
+        for i in range(100000):
+            histogram.record(i * 1e-5)
+        self.assertLess(len(list(histogram.buckets())), 2000)
+        self.assertEqual(sum(c for _, _, c in histogram.buckets()), 100000)
+
+    def test_record_count_and_merge(self):
+        histogram = Histogram(unit=1)
+        histogram.record(10, count=3)
+        other = Histogram(unit=1)
+        other.record(20)
+        histogram.merge(other)
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.quantile(0.75), 10)
+        self.assertEqual(histogram.max, 20)
+        with self.assertRaises(ValueError):
+            histogram.merge(Histogram(unit=1e-3))
+
+    def test_negative(self):
+        with self.assertRaises(ValueError):
+            Histogram().record(-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import random
+import unittest
+
+from jsonbender import (Context, F, Filter, Forall, Format, K, OptionalS, S,
+                        Sum, bend)
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import Bender
+from jsonbender.paths import ANY, project, required_paths
+
+
+class Custom(Bender):
+    def execute(self, value):
+        return value
+
+
+class TestRequiredPaths(unittest.TestCase):
+    def test_selectors(self):
+        mapping = {'a': S('x', 'y'), 'b': [OptionalS('z', 0)], 'c': K(1),
+                   'd': S('w')['v'], 'e': 3}
+        self.assertEqual(required_paths(mapping),
+                         {('x', 'y'), ('z', 0), ('w', 'v')})
+
+    def test_compose(self):
+        self.assertEqual(required_paths(S('a') >> S('b') >> S('c')),
+                         {('a', 'b', 'c')})
+        # selections from the result of a function don't read the source
+        self.assertEqual(required_paths(S('a') >> F(len) >> S('b')),
+                         {('a',)})
+        # the selection must succeed even when its value isn't used
+        self.assertEqual(required_paths({'x': S('a', 'b') >> K(1),
+                                         'y': S('c') >> Context()}),
+                         {('a', 'b'), ('c',)})
+
+    def test_unknown_reads_whole_value(self):
+        self.assertEqual(required_paths({'a': F(len)}), {()})
+        self.assertEqual(required_paths({'a': S('x') >> Custom()}),
+                         {('x',)})
+        self.assertEqual(required_paths({'a': S('x') >> Forall(str)}),
+                         {('x',)})
+        self.assertEqual(required_paths({'a': S('x') >> Filter(bool)}),
+                         {('x',)})
+
+    def test_prefixes_are_merged(self):
+        mapping = {'a': S('x', 'y'), 'b': S('x'), 'c': S('x', 'z', 0)}
+        self.assertEqual(required_paths(mapping), {('x',)})
+
+    def test_operators_and_format(self):
+        mapping = {'a': (S('a') + S('b')) * -S('c'),
+                   'b': Format('{} {x}', S('d'), x=S('e')),
+                   'c': S('f') & ~S('g')}
+        self.assertEqual(required_paths(mapping),
+                         {(k,) for k in 'abcdefg'})
+
+    def test_control_flow(self):
+        mapping = {'a': If(S('a') == K(1), S('b'), S('c')),
+                   'b': Alternation(S('d'), OptionalS('e')),
+                   'c': Switch(S('f'), {1: S('g')}, default=S('h'))}
+        self.assertEqual(required_paths(mapping),
+                         {(k,) for k in 'abcdefgh'})
+
+    def test_forall_bend(self):
+        mapping = {'items': S('order', 'lines') >> Forall.bend({
+            'price': S('price', 'amount'),
+            'tags': S('tags') >> F(sorted),
+        })}
+        self.assertEqual(required_paths(mapping),
+                         {('order', 'lines', ANY, 'price', 'amount'),
+                          ('order', 'lines', ANY, 'tags')})
+
+    def test_forall_bend_reading_no_element(self):
+        for inner in [{'kind': K('line')}, {'c': Context() >> S('c')}]:
+            mapping = {'n': S('items') >> Forall.bend(inner)}
+            self.assertEqual(required_paths(mapping), {('items', ANY)})
+        self.assertEqual(required_paths(S('lines') >> Sum(K(1))),
+                         {('lines', ANY)})
+
+    def test_aggregation(self):
+        self.assertEqual(required_paths(S('lines') >> Sum(S('price'))),
+                         {('lines', ANY, 'price')})
+        self.assertEqual(required_paths(S('lines') >> Sum()), {('lines',)})
+
+    def test_context(self):
+        self.assertEqual(required_paths({'a': Context() >> S('x'),
+                                         'b': K(1)}), set())
+
+    def test_slices(self):
+        self.assertEqual(required_paths(S('a', slice(0, 2), 'b')), {('a',)})
+
+
+class TestProject(unittest.TestCase):
+    source = {'user': {'first': 'Ada', 'last': 'Lovelace', 'bio': 'x' * 100},
+              'lines': [{'price': 1, 'sku': 'a'}, {'price': 2, 'sku': 'b'}],
+              'tags': ['a', 'b', 'c'],
+              'unused': list(range(100))}
+
+    def assert_projection(self, mapping, expected):
+        projected = project(self.source, required_paths(mapping))
+        self.assertEqual(projected, expected)
+        self.assertEqual(bend(mapping, projected),
+                         bend(mapping, self.source))
+
+    def test_dicts(self):
+        self.assert_projection(
+            {'name': Format('{} {}', S('user', 'first'), S('user', 'last'))},
+            {'user': {'first': 'Ada', 'last': 'Lovelace'}})
+
+    def test_lists(self):
+        self.assert_projection(
+            {'prices': S('lines') >> Forall.bend({'p': S('price')}),
+             'tag': S('tags', -1)},
+            {'lines': [{'price': 1}, {'price': 2}],
+             'tags': [None, None, 'c']})
+
+    def test_whole_values(self):
+        self.assert_projection({'n': S('tags') >> F(len)},
+                               {'tags': ['a', 'b', 'c']})
+        self.assertIs(project(self.source, {()}), self.source)
+
+    def test_forall_bend_reading_no_element(self):
+        self.assert_projection(
+            {'n': S('lines') >> Forall.bend({'kind': K('line')})},
+            {'lines': [{'price': 1, 'sku': 'a'}, {'price': 2, 'sku': 'b'}]})
+
+    def test_random_mappings(self):
+        rand = random.Random(42)
+        for _ in range(500):
+            mapping = {'a': random_bender(rand, 3),
+                       'b': [random_bender(rand, 2)]}
+            projected = project(self.source, required_paths(mapping))
+            self.assertEqual(bend_or_error(mapping, projected),
+                             bend_or_error(mapping, self.source))
+
+    def test_missing_keys(self):
+        self.assertEqual(project(self.source, {('nope', 'x'), ('user', 'x')}),
+                         {'user': {}})
+
+
+SELECTORS = [('user',), ('user', 'first'), ('user', 'bio'), ('lines',),
+             ('lines', 0), ('lines', -1, 'sku'), ('tags', 1), ('missing',),
+             ('unused', 5)]
+ELEMENT_SELECTORS = [('price',), ('sku',), ('missing',)]
+
+
+def random_bender(rand, depth, selectors=SELECTORS):
+    choice = rand.randrange(12 if depth else 4)
+    if choice == 0:
+        return S(*rand.choice(selectors))
+    elif choice == 1:
+        return OptionalS(*rand.choice(selectors))
+    elif choice == 2:
+        return K(rand.choice([0, 'k', None]))
+    elif choice == 3:
+        return Context() >> S('c')
+    elif choice == 4:
+        return random_bender(rand, depth - 1, selectors) >> F(repr)
+    elif choice == 5:
+        return S('lines') >> Forall.bend(
+            {'x': random_bender(rand, depth - 1, ELEMENT_SELECTORS)})
+    elif choice == 6:
+        return S('lines') >> Sum(random_bender(rand, depth - 1,
+                                               ELEMENT_SELECTORS))
+    elif choice == 7:
+        return Format('{} {}', random_bender(rand, depth - 1, selectors),
+                      random_bender(rand, depth - 1, selectors))
+    elif choice == 8:
+        return random_bender(rand, depth - 1, selectors) >> K(1)
+    elif choice == 9:
+        return random_bender(rand, depth - 1, selectors) >> Context()
+    elif choice == 10:
+        return Alternation(random_bender(rand, depth - 1, selectors),
+                           random_bender(rand, depth - 1, selectors))
+    return If(random_bender(rand, depth - 1, selectors),
+              random_bender(rand, depth - 1, selectors),
+              random_bender(rand, depth - 1, selectors))
+
+
+def bend_or_error(mapping, source):
+    try:
+        return bend(mapping, source, {'c': 1})
+    except Exception as e:
+        return type(e), str(e)
+
+
+if __name__ == '__main__':
+    unittest.main()
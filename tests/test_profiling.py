@@ -0,0 +1,112 @@
+import json
+import unittest
+
+from jsonbender import F, Forall, Format, K, OptionalS, S
+from jsonbender.control_flow import Alternation, If, Switch
+from jsonbender.core import Bender, BendingException
+from jsonbender.profiling import Profiler
+
+
+class Double(Bender):
+    def execute(self, value):
+        return value * 2
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler()
+
+    def stats_by_bender(self):
+        return {(s['key'], s['bender']): s for s in self.profiler.stats()}
+
+    def test_bends_like_bend(self):
+        mapping = {'a': S('x') + K(1),
+                   'b': [Format('{}-{}', S('x'), S('y')), 3],
+                   'c': {'d': OptionalS('z', default=0)}}
+        got = self.profiler.bend(mapping, {'x': 1, 'y': 2})
+        self.assertEqual(got, {'a': 2, 'b': ['1-2', 3], 'c': {'d': 0}})
+
+    def test_counts_calls_by_key(self):
+        mapping = {'a': S('x') + K(1), 'b': {'c': S('y')}, 'd': [S('x')]}
+        for _ in range(3):
+            self.profiler.bend(mapping, {'x': 1, 'y': 2})
+        stats = self.stats_by_bender()
+        self.assertEqual(set(stats), {('a', 'Add'), ('a', "S('x')"),
+                                      ('a', 'K(1)'), ('b.c', "S('y')"),
+                                      ('d[0]', "S('x')")})
+        self.assertTrue(all(s['calls'] == 3 for s in stats.values()))
+
+    def test_forall_bend_keys(self):
+        mapping = {'items': S('items') >> Forall.bend({'price': S('p')})}
+        self.profiler.bend(mapping, {'items': [{'p': 1}, {'p': 2}]})
+        stats = self.stats_by_bender()
+        self.assertEqual(stats['items[].price', "S('p')"]['calls'], 2)
+        self.assertEqual(stats['items', 'ForallBend']['calls'], 1)
+
+    def test_control_flow_children(self):
+        mapping = {'a': If(S('x') == K(1), K('one'), K('other')),
+                   'b': Alternation(S('missing'), K(0)),
+                   'c': Switch(S('x'), {1: K('one')}, default=K('other'))}
+        self.assertEqual(self.profiler.bend(mapping, {'x': 1}),
+                         {'a': 'one', 'b': 0, 'c': 'one'})
+        stats = self.stats_by_bender()
+        self.assertEqual(stats['a', "K('one')"]['calls'], 1)
+        self.assertNotIn(('a', "K('other')"), stats)
+        self.assertEqual(stats['b', "S('missing')"]['calls'], 1)
+        # a missing key for Alternation isn't an error
+        self.assertEqual(stats['b', "S('missing')"]['errors'], 0)
+        self.assertEqual(stats['c', 'Switch']['calls'], 1)
+
+    def test_custom_benders_are_leaves(self):
+        self.profiler.bend({'a': S('x') >> Double()}, {'x': 2})
+        self.assertIn(('a', 'Double'), self.stats_by_bender())
+
+    def test_self_time_excludes_children(self):
+        spin = F(lambda v: sum(range(20000)))
+        self.profiler.bend({'a': S('x') >> spin}, {'x': 1})
+        stats = self.stats_by_bender()
+        compose = stats['a', 'Compose']
+        self.assertGreaterEqual(compose['cumulative'],
+                                stats['a', 'F(<lambda>)']['cumulative'])
+        self.assertLess(compose['self'], compose['cumulative'])
+        self.assertEqual(self.profiler.stats(top=1)[0]['bender'],
+                         'F(<lambda>)')
+
+    def test_errors_counted_where_raised(self):
+        mapping = {'a': Format('{}', S('x') >> F(int))}
+        with self.assertRaises(BendingException):
+            self.profiler.bend(mapping, {'x': 'nope'})
+        stats = self.stats_by_bender()
+        self.assertEqual(stats['a', 'F(int)']['errors'], 1)
+        self.assertEqual(stats['a', 'Compose']['errors'], 0)
+        self.assertEqual(stats['a', "Format('{}')"]['errors'], 0)
+        self.assertEqual(self.profiler.stats(sort='errors')[0]['bender'],
+                         'F(int)')
+
+    def test_mapping_is_not_modified(self):
+        add = S('x') + K(1)
+        mapping = {'a': add}
+        self.profiler.bend(mapping, {'x': 1})
+        self.assertIs(mapping['a'], add)
+        self.assertIsInstance(add._bender1, S)
+
+    def test_report(self):
+        self.profiler.bend({'a': S('x')}, {'x': 1})
+        table = self.profiler.report().splitlines()
+        self.assertEqual(len(table), 2)
+        self.assertIn("S('x')", table[1])
+        data = json.loads(self.profiler.report(format='json'))
+        self.assertEqual([(d['key'], d['calls']) for d in data], [('a', 1)])
+        with self.assertRaises(ValueError):
+            self.profiler.report(format='xml')
+        with self.assertRaises(ValueError):
+            self.profiler.stats(sort='name')
+
+    def test_clear(self):
+        self.profiler.bend({'a': S('x')}, {'x': 1})
+        self.profiler.clear()
+        self.assertEqual(self.profiler.stats(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import pickle
 import unittest
 
-from jsonbender.selectors import F, ProtectedF, K, S, OptionalS
+from jsonbender._compat import PY2
+from jsonbender.selectors import (CachedF, F, ProtectedCachedF, ProtectedF,
+                                  K, S, OptionalS)
 from jsonbender.test import BenderTestMixin
 
 
@@ -49,6 +52,19 @@ class TestOptionalS(unittest.TestCase, STestsMixin):
         self.assert_bender(bender, {'key': {}}, default)
         self.assert_bender(bender, {}, default)
 
+    def test_missing_keys_in_sequences_and_mappings(self):
+        from collections import defaultdict
+        bender = self.selector_cls('a', -1, default=27)
+        self.assert_bender(bender, {'a': [1, 2]}, 2)
+        self.assert_bender(bender, {'a': ()}, 27)
+        self.assert_bender(bender, {'a': ''}, 27)
+        self.assert_bender(bender, {'a': 'xy'}, 'y')
+        self.assert_bender(self.selector_cls('a', 'b', default=27),
+                           {'a': defaultdict(int)}, 0)
+        self.assertRaises(TypeError, self.selector_cls('a', 'b'),
+                          {'a': [1]})
+        self.assert_bender(self.selector_cls(True, default=27), [1, 2], 2)
+
     def test_activate_on_IndexError(self):
         self.assert_bender(OptionalS(0), [], None)
 
@@ -90,6 +106,85 @@ class TestProtectedF(unittest.TestCase, FTestsMixin):
         self.assert_bender(protected, None, None)
 
 
+class TestCachedF(unittest.TestCase, FTestsMixin):
+    selector_cls = CachedF
+
+    def setUp(self):
+        self.calls = []
+
+    def record(self, value, *args):
+        self.calls.append(value)
+        return sum((value,) + args)
+
+    def test_cached(self):
+        f = F(self.record, 1).cached()
+        self.assertIsInstance(f, CachedF)
+        self.assertEqual([f(v) for v in [1, 2, 1, 1]], [2, 3, 2, 2])
+        self.assertEqual(self.calls, [1, 2])
+        self.assertEqual(f.cache_info(), (2, 2, 0, 128, 2))
+
+    def test_lru_eviction(self):
+        f = F(self.record).cached(maxsize=2)
+        for v in [1, 2, 1, 3, 2]:
+            f(v)
+        # 2 was the least recently used when 3 was added
+        self.assertEqual(self.calls, [1, 2, 3, 2])
+        self.assertEqual(f.cache_info(), (1, 4, 2, 2, 2))
+
+    def test_key(self):
+        f = F(lambda d: self.record(d['v'])).cached(key=lambda d: d['v'])
+        self.assertEqual(f({'v': 1}), 1)
+        self.assertEqual(f({'v': 1, 'other': 2}), 1)
+        self.assertEqual(self.calls, [1])
+
+    def test_unhashable_values_are_not_cached(self):
+        f = F(len).cached()
+        self.assertEqual(f([1, 2]), 2)
+        self.assertEqual(f([1, 2]), 2)
+        self.assertEqual(f.cache_info(), (0, 2, 0, 128, 0))
+
+    def test_cache_clear(self):
+        f = F(self.record).cached()
+        f(1)
+        f.cache_clear()
+        f(1)
+        self.assertEqual(self.calls, [1, 1])
+        self.assertEqual(f.cache_info(), (0, 1, 0, 128, 1))
+
+    def test_protect_then_cache(self):
+        f = F(self.record).protect(0).cached()
+        self.assertIsInstance(f, ProtectedCachedF)
+        self.assertIsInstance(f, ProtectedF)
+        self.assertEqual([f(v) for v in [0, 1, 1]], [0, 1, 1])
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(f.cache_info(), (1, 1, 0, 128, 1))
+
+    def test_cache_then_protect(self):
+        f = F(self.record).cached(maxsize=1).protect()
+        self.assertIsInstance(f, ProtectedCachedF)
+        self.assertEqual([f(v) for v in [None, 1, 1]], [None, 1, 1])
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(f.cache_info().maxsize, 1)
+
+    @unittest.skipIf(PY2, 'concurrent.futures is not available')
+    def test_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        f = F(self.record).cached(maxsize=10)
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(f, [i % 20 for i in range(2000)]))
+        self.assertEqual(results, [i % 20 for i in range(2000)])
+        info = f.cache_info()
+        self.assertEqual(info.hits + info.misses, 2000)
+        self.assertEqual(info.currsize, 10)
+
+    def test_pickle(self):
+        f = F(abs).cached()
+        f(-1)
+        copy = pickle.loads(pickle.dumps(f))
+        self.assertEqual(copy(-2), 2)
+        self.assertEqual(copy.cache_info(), (0, 1, 0, 128, 1))
+
+
 if __name__ == '__main__':
     unittest.main()
 
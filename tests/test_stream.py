@@ -0,0 +1,97 @@
+import io
+import json
+import unittest
+
+from jsonbender import S
+from jsonbender.core import BendingException
+from jsonbender.stream import bend_stream, iter_json_array, iter_ndjson
+
+
+class TestIterJSONArray(unittest.TestCase):
+    def assert_elements(self, text, chunk_size=1):
+        got = list(iter_json_array(io.StringIO(text), chunk_size))
+        self.assertEqual(got, json.loads(text))
+
+    def test_empty(self):
+        self.assert_elements(u'[]')
+        self.assert_elements(u' [ \n ] ')
+
+    def test_elements(self):
+        text = u' [ {"a": [1, 2, {"b": "]"}]} , 12345, "x,y", null,\n'\
+               u' -1.5e3, true ] '
+        for chunk_size in [1, 2, 3, 7, 1000]:
+            self.assert_elements(text, chunk_size)
+
+    def test_bytes(self):
+        data = json.dumps([{'name': u'S\xe3o Paulo'}] * 3).encode('utf-8')
+        got = list(iter_json_array(io.BytesIO(data), chunk_size=1))
+        self.assertEqual(got, [{'name': u'S\xe3o Paulo'}] * 3)
+
+    def test_not_an_array(self):
+        self.assertRaises(ValueError, list,
+                          iter_json_array(io.StringIO(u'{}')))
+
+    def test_truncated(self):
+        self.assertRaises(ValueError, list,
+                          iter_json_array(io.StringIO(u'[1, {"a": 2')))
+        self.assertRaises(ValueError, list,
+                          iter_json_array(io.StringIO(u'[1, 2')))
+
+    def test_missing_comma(self):
+        self.assertRaises(ValueError, list,
+                          iter_json_array(io.StringIO(u'[1 2]')))
+
+
+class TestIterNDJSON(unittest.TestCase):
+    def test_skips_blank_lines(self):
+        fp = io.StringIO(u'{"a": 1}\n\n{"a": 2}\n')
+        self.assertEqual(list(iter_ndjson(fp)), [{'a': 1}, {'a': 2}])
+
+
+class TestBendStream(unittest.TestCase):
+    mapping = {'b': S('a')}
+
+    def test_ndjson_to_ndjson(self):
+        infile = io.StringIO(u'{"a": 1}\n{"a": 2}\n')
+        outfile = io.StringIO()
+        self.assertEqual(bend_stream(self.mapping, infile, outfile), 2)
+        lines = outfile.getvalue().splitlines()
+        self.assertEqual([json.loads(l) for l in lines],
+                         [{'b': 1}, {'b': 2}])
+
+    def test_array_to_array(self):
+        infile = io.StringIO(u'[{"a": 1}, {"a": 2}]')
+        outfile = io.StringIO()
+        count = bend_stream(self.mapping, infile, outfile,
+                            input_format='array', output_format='array')
+        self.assertEqual(count, 2)
+        self.assertEqual(json.loads(outfile.getvalue()),
+                         [{'b': 1}, {'b': 2}])
+
+    def test_empty_array_output(self):
+        outfile = io.StringIO()
+        bend_stream(self.mapping, io.StringIO(u''), outfile,
+                    output_format='array')
+        self.assertEqual(json.loads(outfile.getvalue()), [])
+
+    def test_errors(self):
+        infile = io.StringIO(u'{"a": 1}\n{}\n')
+        self.assertRaises(BendingException, bend_stream, self.mapping,
+                          infile, io.StringIO())
+
+        errors = []
+        infile = io.StringIO(u'{"a": 1}\n{}\n')
+        outfile = io.StringIO()
+        bend_stream(self.mapping, infile, outfile, errors=errors)
+        self.assertEqual(json.loads(outfile.getvalue()), {'b': 1})
+        self.assertEqual([i for i, e in errors], [1])
+
+    def test_unknown_formats(self):
+        self.assertRaises(ValueError, bend_stream, self.mapping,
+                          io.StringIO(), io.StringIO(), input_format='csv')
+        self.assertRaises(ValueError, bend_stream, self.mapping,
+                          io.StringIO(), io.StringIO(), output_format='csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,20 @@
 import unittest
 
-from jsonbender import Context, K, S
-from jsonbender.string_ops import Format
+from jsonbender import Context, F, K, OptionalS, S
+from jsonbender.string_ops import Format, ProtectedFormat
 from jsonbender.test import BenderTestMixin
 
 
+class CountingS(S):
+    def __init__(self, *path):
+        super(CountingS, self).__init__(*path)
+        self.calls = 0
+
+    def execute(self, source):
+        self.calls += 1
+        return super(CountingS, self).execute(source)
+
+
 class TestFormat(unittest.TestCase, BenderTestMixin):
     def test_format(self):
         bender = Format('{} {} {} {noun}.',
@@ -17,6 +27,31 @@ class TestFormat(unittest.TestCase, BenderTestMixin):
         self.assert_bender(bender, None, 'value: 23',
                            context={'b': 23})
 
+    def test_malformed_format_string(self):
+        with self.assertRaises(ValueError):
+            Format('{', K(1))
+
+
+class TestProtectedFormat(unittest.TestCase, BenderTestMixin):
+    def test_format(self):
+        bender = ProtectedFormat('{} {last}', S('first'), last=S('last'))
+        self.assert_bender(bender, {'first': 'Edsger', 'last': 'Dijkstra'},
+                           'Edsger Dijkstra')
+
+    def test_none_argument(self):
+        self.assert_bender(ProtectedFormat('{}', OptionalS('a')), {}, None)
+        self.assert_bender(ProtectedFormat('{a}', a=OptionalS('a')), {}, None)
+
+    def test_none_result_can_be_composed(self):
+        bender = ProtectedFormat('{}', OptionalS('a')) >> F(lambda v: [v])
+        self.assert_bender(bender, {}, [None])
+
+    def test_arguments_are_bent_once(self):
+        first, last = CountingS('first'), CountingS('last')
+        bender = ProtectedFormat('{} {last}', first, last=last)
+        bender({'first': 'Edsger', 'last': 'Dijkstra'})
+        self.assertEqual((first.calls, last.calls), (1, 1))
+
 
 if __name__ == '__main__':
     unittest.main()
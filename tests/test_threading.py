@@ -0,0 +1,109 @@
+import sys
+import unittest
+
+from jsonbender import Context, Format, Forall, If, K, S, bend, compile
+from jsonbender._compat import PY2
+from jsonbender.core import Bender
+from jsonbender.list_ops import Filter
+
+
+THREADS = 8
+ROUNDS = 500
+
+MAPPING = {
+    'id': S('id'),
+    'owner': Context() >> S('owner'),
+    'items': S('items') >> Forall.bend({
+        'owner': Context() >> S('owner'),
+        'label': Format('{}-{}', Context() >> S('owner'), S('n')),
+    }),
+    'even': (S('items') >> Forall(lambda item: item['n']) >>
+             Filter(lambda n: n % 2 == 0)),
+    'kind': If(S('id') == K(0), K('first'), K('other')),
+}
+
+
+def expected(source, owner):
+    return {
+        'id': source['id'],
+        'owner': owner,
+        'items': [{'owner': owner, 'label': '{}-{}'.format(owner, item['n'])}
+                  for item in source['items']],
+        'even': [item['n'] for item in source['items']
+                 if item['n'] % 2 == 0],
+        'kind': 'first' if source['id'] == 0 else 'other',
+    }
+
+
+def snapshot(obj, seen=None):
+    """
+    Return the identities of the attributes of every bender reachable from
+    `obj`, keyed by the bender's identity.
+    """
+    seen = {} if seen is None else seen
+    if isinstance(obj, dict):
+        children = list(obj.values())
+    elif isinstance(obj, (list, tuple)):
+        children = list(obj)
+    elif isinstance(obj, Bender) and id(obj) not in seen:
+        seen[id(obj)] = {k: id(v) for k, v in vars(obj).items()}
+        children = list(vars(obj).values())
+    else:
+        children = []
+    for child in children:
+        snapshot(child, seen)
+    return seen
+
+
+class TestStateless(unittest.TestCase):
+    def test_bending_does_not_mutate_benders(self):
+        before = snapshot(MAPPING)
+        bend(MAPPING, {'id': 1, 'items': [{'n': 2}]}, {'owner': 'x'})
+        self.assertEqual(snapshot(MAPPING), before)
+
+
+@unittest.skipIf(PY2, 'concurrent.futures is not available')
+class TestSharedMapping(unittest.TestCase):
+    """
+    Bend with a single mapping from many threads at once, each one with its
+    own context, and check no thread sees another one's context.
+    """
+
+    def setUp(self):
+        # switch threads as often as possible to provoke interleavings
+        self._interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self._interval)
+
+    def run_threads(self, bend_func):
+        def worker(owner):
+            failures = []
+            for i in range(ROUNDS):
+                source = {'id': i, 'items': [{'n': n} for n in range(i % 5)]}
+                got = bend_func(source, {'owner': owner})
+                if got != expected(source, owner):
+                    failures.append((owner, i, got))
+            return failures
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(THREADS) as executor:
+            results = list(executor.map(worker, range(THREADS)))
+        self.assertEqual([f for failures in results for f in failures], [])
+
+    def test_bend(self):
+        self.run_threads(lambda source, context:
+                         bend(MAPPING, source, context))
+
+    def test_closure_plan(self):
+        plan = compile(MAPPING)
+        self.run_threads(plan)
+
+    def test_codegen_plan(self):
+        plan = compile(MAPPING, backend='codegen')
+        self.run_threads(plan)
+
+
+if __name__ == '__main__':
+    unittest.main()